@@ -50,15 +50,56 @@ INSTALLED_APPS = [
     'django_filters',
 ]
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels_redis.core.InMemoryChannelLayer',
-        'CONFIG': {
-            'hosts': [('127.0.0.1', 6379)],
-            "symmetric_encryption_keys": [SECRET_KEY],
+# Redis carries group messages between workers; without it messages stay in-process
+if os.getenv('REDIS_CHANNEL_URL'):
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [os.getenv('REDIS_CHANNEL_URL')],
+                "symmetric_encryption_keys": [SECRET_KEY],
+            },
         },
-    },
-}
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Shared cache for computed summaries; falls back to per-process memory without Redis
+if os.getenv('REDIS_CACHE_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_CACHE_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Store summaries and the technician workload are only cached in a shared cache: a
+# per-process cache cannot be invalidated in the other workers, which would keep serving
+# stale stock and call counts (bititec/store_summary.py, bititec/workload.py)
+STORE_SUMMARY_CACHE = bool(os.getenv('REDIS_CACHE_URL'))
+
+# Document numbers each worker reserves at a time (bititec/numbering.py)
+DOCUMENT_NUMBER_BLOCK_SIZE = int(os.getenv('DOCUMENT_NUMBER_BLOCK_SIZE', 50))
+
+# Audit entries are buffered per process and appended in batches (bititec/audit.py)
+AUDIT_WRITE_BEHIND = os.getenv('AUDIT_WRITE_BEHIND', 'True').lower() in ('true', '1')
+AUDIT_BUFFER_SIZE = int(os.getenv('AUDIT_BUFFER_SIZE', 200))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', 2))
+
+# Default billing rates (bititec/billing.py); each billing run may override them
+BILLING_COPY_RATE = os.getenv('BILLING_COPY_RATE', '0')
+BILLING_MYQ_FEE = os.getenv('BILLING_MYQ_FEE', '0')
+BILLING_VAT_RATE = os.getenv('BILLING_VAT_RATE', '0.16')
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
@@ -199,6 +240,9 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # Every list endpoint is bounded; views ordered by -created_at use KeysetPagination and
+    # chat messages use ChatMessagePagination (newest first)
+    'DEFAULT_PAGINATION_CLASS': 'bititec.pagination.StandardPagination',
 }
 
 SIMPLE_JWT = {
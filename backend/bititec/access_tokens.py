@@ -0,0 +1,50 @@
+"""
+Signed service-call access tokens for customers.
+
+The token handed out by create_access_token is the ServiceCallToken row id,
+call id, email and expiry signed with SECRET_KEY, so a customer page load is
+checked without touching the database. The row only matters at verify time,
+where one conditional UPDATE marks it used and makes the link single-use.
+Expired and used rows are removed by the purge_service_call_tokens command.
+"""
+import uuid
+
+from django.core import signing
+from django.utils import timezone
+
+SALT = 'bititec.service-call-token'
+
+
+class InvalidAccessToken(Exception):
+    """The token was tampered with, is malformed or has expired"""
+
+    def __init__(self, message, expired=False):
+        super().__init__(message)
+        self.expired = expired
+
+
+def make_access_token(token):
+    """Signed string for a ServiceCallToken row"""
+    return signing.dumps({
+        'id': str(token.id),
+        'call': str(token.service_call_id),
+        'email': token.email,
+        'exp': int(token.expires_at.timestamp()),
+    }, salt=SALT, compress=True)
+
+
+def read_access_token(value):
+    """
+    Return the token payload ({'id', 'call', 'email', 'exp'} with UUIDs for
+    'id' and 'call') or raise InvalidAccessToken.
+    """
+    try:
+        payload = signing.loads(value, salt=SALT)
+        payload['id'] = uuid.UUID(payload['id'])
+        payload['call'] = uuid.UUID(payload['call'])
+        expires = int(payload['exp'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidAccessToken('Invalid token')
+    if expires <= timezone.now().timestamp():
+        raise InvalidAccessToken('Token has expired', expired=True)
+    return payload
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Accessory, AccessoryType, Call, ChatGroup, ChatMessage, Client, ClientMachine, CustomUser, Delivery, LeaseAccInquiry, LeaseContract, LeasePartInquiry, Machine, MachineType, MeterReading, Part, PartType, ServiceCallToken, Store, Sale, SaleItem, StoreInquiry
+from .models import Accessory, AccessoryType, AuditEntry, BillingLine, BillingRun, Call, CallPartUsage, CallRollup, ChatGroup, ChatMessage, Client, ClientMachine, CustomUser, Delivery, DocumentSequence, LeaseAccInquiry, LeaseContract, LeasePartInquiry, Machine, MachineType, MeterReading, Part, PartType, ServiceCallToken, StockBalance, StockMovement, StockTransfer, StockTransferLine, Store, Sale, SaleItem, StoreInquiry
 from django.utils.html import format_html
 
 class CustomUserAdmin(UserAdmin):
@@ -137,6 +137,16 @@ class ClientAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     readonly_fields = ('created_at',)
 
+class CallPartUsageInline(admin.TabularInline):
+    model = CallPartUsage
+    extra = 0
+    raw_id_fields = ('part',)
+    readonly_fields = ('kind', 'position', 'part', 'ref_no', 'description', 'quantity')
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False  # Rows mirror the call's JSON lists
+
 @admin.register(Call)
 class CallAdmin(admin.ModelAdmin):
     list_display = ('ticket_no', 'client', 'item', 'status', 'reported_date', 'get_technicians')
@@ -144,6 +154,7 @@ class CallAdmin(admin.ModelAdmin):
     search_fields = ('ticket_no', 'client__client_name', 'item__machine_name')
     filter_horizontal = ('technician',)
     readonly_fields = ('created_at', 'updated_at', 'get_technicians')
+    inlines = [CallPartUsageInline]
     
     def get_technicians(self, obj):
         return ", ".join([f"{t.firstname} {t.lastname}" for t in obj.technician.all()]) if obj.technician.exists() else "No technicians assigned"
@@ -270,4 +281,75 @@ class MeterReadingAdmin(admin.ModelAdmin):
     list_filter = ('month', 'created_at')
     search_fields = ('lease__lease_no', 'machine__machine_name')
     raw_id_fields = ('lease', 'machine')
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'item_type', 'reason', 'delta', 'on_hand_after', 'store', 'source_type')
+    list_filter = ('item_type', 'reason', 'store')
+    search_fields = ('part__ref_no', 'accessory__ref_no', 'machine__serial_no', 'source_id')
+    raw_id_fields = ('machine', 'part', 'accessory', 'store', 'created_by')
+    date_hierarchy = 'created_at'
+
+@admin.register(StockBalance)
+class StockBalanceAdmin(admin.ModelAdmin):
+    list_display = ('item_type', 'machine', 'part', 'accessory', 'on_hand', 'leased', 'sold', 'updated_at')
+    list_filter = ('item_type',)
+    raw_id_fields = ('machine', 'part', 'accessory')
+
+class StockTransferLineInline(admin.TabularInline):
+    model = StockTransferLine
+    extra = 0
+    raw_id_fields = ('machine', 'part', 'accessory', 'target_part', 'target_accessory')
+
+@admin.register(StockTransfer)
+class StockTransferAdmin(admin.ModelAdmin):
+    list_display = ('transfer_no', 'from_store', 'to_store', 'created_by', 'created_at')
+    list_filter = ('from_store', 'to_store')
+    search_fields = ('transfer_no', 'notes')
+    raw_id_fields = ('created_by',)
+    inlines = [StockTransferLineInline]
+    date_hierarchy = 'created_at'
+
+
+@admin.register(DocumentSequence)
+class DocumentSequenceAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'period', 'last_value', 'updated_at')
+    list_filter = ('prefix',)
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(CallRollup)
+class CallRollupAdmin(admin.ModelAdmin):
+    list_display = ('month', 'department', 'client', 'machine', 'status', 'call_count', 'resolved_count')
+    list_filter = ('status', 'department', 'month')
+    raw_id_fields = ('client', 'machine')
+
+
+@admin.register(AuditEntry)
+class AuditEntryAdmin(admin.ModelAdmin):
+    list_display = ('object_type', 'object_id', 'action', 'actor', 'created_at')
+    list_filter = ('object_type', 'action')
+    search_fields = ('object_id',)
+    raw_id_fields = ('actor',)
+    date_hierarchy = 'created_at'
+
+    def has_change_permission(self, request, obj=None):
+        return False  # Append-only
+
+class BillingLineInline(admin.TabularInline):
+    model = BillingLine
+    extra = 0
+    fields = ('lease_no', 'client_name', 'previous_reading', 'current_reading', 'usage', 'flags', 'total')
+    readonly_fields = fields
+    can_delete = False
+
+@admin.register(BillingRun)
+class BillingRunAdmin(admin.ModelAdmin):
+    list_display = ('month', 'lease_count', 'flagged_count', 'total_usage', 'total_amount', 'created_by', 'created_at')
+    date_hierarchy = 'month'
+    raw_id_fields = ('created_by',)
+    inlines = [BillingLineInline]
+
+    def has_change_permission(self, request, obj=None):
+        return False  # A run is a snapshot
@@ -0,0 +1,221 @@
+"""
+Write-behind audit trail for service calls and sales.
+
+Saves record compact ``{field: [old, new]}`` diffs (see signals.py); nothing
+is written on the request path. Inside audit_batch() every change a request
+makes to one object becomes a single entry. Once the transaction commits the
+entries go to a per-process buffer, and a background thread appends them to
+AuditEntry with bulk_create every AUDIT_FLUSH_INTERVAL seconds, or sooner
+when AUDIT_BUFFER_SIZE entries are waiting. With AUDIT_WRITE_BEHIND off they
+are written at commit instead.
+
+Entries still in the buffer are lost if the process dies; reading an
+object's history flushes this process's buffer first.
+"""
+import atexit
+import copy
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import AuditEntry
+from .serializers import AuditEntrySerializer
+
+logger = logging.getLogger(__name__)
+
+# Longer text values are cut down in the diff
+VALUE_LIMIT = 500
+
+SALE_FIELDS = ['sale_type', 'local_client_name', 'client_id', 'sale_date', 'notes', 'add_vat']
+SALE_ITEM_FIELDS = [
+    'sale_type', 'machine_id', 'part_id', 'accessory_id', 'quantity', 'unit_price', 'total_price', 'custom_item',
+]
+
+_state = threading.local()
+
+
+def set_actor(user):
+    _state.actor_id = user.pk if user is not None and user.is_authenticated else None
+
+
+def current_actor_id():
+    return getattr(_state, 'actor_id', None)
+
+
+def snapshot(instance, fields):
+    """The loaded values of ``fields`` (deferred fields are skipped)"""
+    values = instance.__dict__
+    return {
+        # JSON fields may be edited in place, so keep a copy of those
+        field: copy.deepcopy(values[field]) if isinstance(values[field], (list, dict)) else values[field]
+        for field in fields if field in values
+    }
+
+
+def compact_value(value):
+    value = json.loads(json.dumps(value, cls=DjangoJSONEncoder))
+    if isinstance(value, str) and len(value) > VALUE_LIMIT:
+        return value[:VALUE_LIMIT] + '…'
+    return value
+
+
+def diff(loaded, instance, fields):
+    """{field: [old, new]} for ``fields`` that differ from ``loaded``"""
+    values = instance.__dict__
+    return {
+        field: [compact_value(loaded[field]), compact_value(values[field])]
+        for field in fields
+        if field in loaded and field in values and loaded[field] != values[field]
+    }
+
+
+def merge_changes(changes, new):
+    """Fold ``new`` into ``changes``: keep the first old value and the last new one"""
+    for field, (old, value) in new.items():
+        if field in changes:
+            old = changes[field][0]
+        if old == value:
+            changes.pop(field, None)
+        else:
+            changes[field] = [old, value]
+
+
+def record_audit(object_type, object_id, action, changes=None):
+    """Queue an audit entry for one object; it is buffered when the transaction commits"""
+    if action == 'updated' and not changes:
+        return
+    key = (object_type, str(object_id))
+    batch = getattr(_state, 'batch', None)
+    if batch is None:
+        entries = {}
+        merge_entry(entries, key, action, changes)
+        transaction.on_commit(lambda: buffer.add(entries.values()), robust=True)
+        return
+    merge_entry(batch, key, action, changes)
+
+
+def merge_entry(entries, key, action, changes):
+    pending = entries.get(key)
+    if pending is None:
+        entries[key] = AuditEntry(
+            object_type=key[0], object_id=key[1], action=action, changes=dict(changes or {}),
+            actor_id=current_actor_id(), created_at=timezone.now(),
+        )
+        return
+    if action == 'deleted' or pending.action == 'updated':
+        pending.action = action
+    merge_changes(pending.changes, changes or {})
+
+
+@contextmanager
+def audit_batch():
+    """Run the block in a transaction and buffer one merged entry per object after commit"""
+    if getattr(_state, 'batch', None) is not None:
+        yield  # Already batching; the outer block hands the entries over
+        return
+    _state.batch = {}
+    try:
+        with transaction.atomic():
+            yield
+            entries = _state.batch
+            if entries:
+                transaction.on_commit(lambda: buffer.add(entries.values()), robust=True)
+    finally:
+        _state.batch = None
+
+
+class AuditBuffer:
+    """Entries waiting to be written, shared by the threads of one process"""
+
+    def __init__(self):
+        self.entries = []
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def add(self, entries):
+        entries = [entry for entry in entries if entry.action != 'updated' or entry.changes]
+        if not entries:
+            return
+        if not getattr(settings, 'AUDIT_WRITE_BEHIND', True):
+            self.write(entries)
+            return
+        with self.lock:
+            self.entries.extend(entries)
+            full = len(self.entries) >= settings.AUDIT_BUFFER_SIZE
+            self.start()
+        if full:
+            self.wakeup.set()
+
+    def start(self):
+        # A forked worker does not inherit the parent's thread
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        self.pid = os.getpid()
+        self.thread = threading.Thread(target=self.run, name='audit-writer', daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(settings.AUDIT_FLUSH_INTERVAL)
+            self.wakeup.clear()
+            self.flush()
+            close_old_connections()
+
+    def flush(self):
+        with self.lock:
+            entries, self.entries = self.entries, []
+        if entries:
+            self.write(entries)
+
+    def write(self, entries):
+        try:
+            AuditEntry.objects.bulk_create(entries, batch_size=settings.AUDIT_BUFFER_SIZE)
+        except DatabaseError:
+            logger.exception('Could not write %s audit entries', len(entries))
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.flush)
+
+
+def flush_audit_buffer():
+    buffer.flush()
+
+
+class AuditHistoryMixin:
+    """
+    Adds a ``history`` handler listing the audit entries of one object, newest
+    first. Views set ``audit_object_type``; the view also records the request
+    user as the actor of any change it makes.
+    """
+    audit_object_type = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        set_actor(request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        set_actor(None)
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    @action(detail=True, methods=['get'])
+    def history(self, request, pk=None):
+        flush_audit_buffer()
+        entries = AuditEntry.objects.filter(
+            object_type=self.audit_object_type, object_id=pk
+        ).select_related('actor').order_by('-created_at')
+        page = self.paginate_queryset(entries)
+        if page is not None:
+            return self.get_paginated_response(AuditEntrySerializer(page, many=True).data)
+        return Response(AuditEntrySerializer(entries, many=True).data)
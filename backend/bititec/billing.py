@@ -0,0 +1,173 @@
+"""
+Monthly lease billing runs.
+
+run_billing bills every active lease running in a month. It reads the leases
+in batches of plain value rows. For each batch one MeterReading query puts
+every lease's latest reading up to the month next to the reading before it
+(a Lag window over the lease's readings), and two grouped queries total its
+unpaid part and accessory inquiries. Usage is the difference between the two
+readings, priced at the run's copy rate, plus the MyQ fee for add_myq leases
+and VAT for add_vat leases. Inquiry amounts and VAT are taken as recorded.
+
+Lines whose usage cannot be taken at face value carry FLAGS. Every line is
+stored as a BillingLine under the BillingRun, so a run can be listed and
+re-read later without recomputing it.
+"""
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum, Window
+from django.db.models.functions import Lag, RowNumber
+
+from .importers import chunked
+from .models import BillingLine, BillingRun, LeaseAccInquiry, LeaseContract, LeasePartInquiry, MeterReading
+
+BILLING_BATCH_SIZE = 500
+CENT = Decimal('0.01')
+
+FLAGS = {
+    'missing_reading': 'No reading for the month; usage not billed',
+    'first_reading': 'No earlier reading to measure from; usage not billed',
+    'negative_delta': 'Reading is below the previous one on the same machine; usage not billed',
+    'meter_reset': 'The lease machine changed since the previous reading; usage counted from zero',
+    'gap': 'The previous reading is older than last month; usage covers several months',
+}
+
+LEASE_COLUMNS = [
+    'id', 'lease_no', 'client__client_name', 'item__serial_no', 'add_vat', 'add_myq',
+]
+
+
+def billing_rates(copy_rate=None, myq_fee=None, vat_rate=None):
+    """The given rates, with the BILLING_* settings for any left out"""
+    return {
+        'copy_rate': Decimal(str(settings.BILLING_COPY_RATE if copy_rate is None else copy_rate)),
+        'myq_fee': Decimal(str(settings.BILLING_MYQ_FEE if myq_fee is None else myq_fee)),
+        'vat_rate': Decimal(str(settings.BILLING_VAT_RATE if vat_rate is None else vat_rate)),
+    }
+
+
+def billable_leases(month):
+    """Value rows for the active leases running in ``month``"""
+    return LeaseContract.objects.filter(
+        is_active=True, from_date__lt=month + relativedelta(months=1), to_date__gte=month
+    ).values(*LEASE_COLUMNS).order_by('lease_no')
+
+
+def latest_readings(lease_ids, month):
+    """
+    {lease id: row} with each lease's latest reading up to ``month`` and the
+    reading, machine and month before it, in one query
+    """
+    def previous(field):
+        return Window(Lag(field), partition_by=F('lease_id'), order_by=F('month').asc())
+
+    rows = MeterReading.objects.filter(lease_id__in=lease_ids, month__lte=month).annotate(
+        previous_reading=previous('meter_reading'),
+        previous_machine=previous('machine_id'),
+        previous_month=previous('month'),
+        recent_rank=Window(RowNumber(), partition_by=F('lease_id'), order_by=F('month').desc()),
+    ).filter(recent_rank=1).values(
+        'lease_id', 'month', 'meter_reading', 'machine_id', 'previous_reading', 'previous_machine', 'previous_month',
+    ).order_by()
+    return {row['lease_id']: row for row in rows}
+
+
+def inquiry_totals(model, lease_ids, month):
+    """{lease id: (amount, vat)} of the unpaid ``model`` inquiries dated in ``month``"""
+    rows = model.objects.filter(
+        lease_id__in=lease_ids, is_paid=False, date__gte=month, date__lt=month + relativedelta(months=1)
+    ).values('lease_id').annotate(amount=Sum('amount'), vat=Sum('vat')).order_by()
+    return {row['lease_id']: (row['amount'] or 0, row['vat'] or 0) for row in rows}
+
+
+def measure_usage(reading, month):
+    """(previous month, previous reading, current reading, usage, flags) for one lease"""
+    if reading is None:
+        return None, None, None, 0, ['missing_reading']
+    if reading['month'] != month:
+        # The latest reading is from an earlier month; show it as the previous one
+        return reading['month'], reading['meter_reading'], None, 0, ['missing_reading']
+
+    current, previous = reading['meter_reading'], reading['previous_reading']
+    if previous is None:
+        return None, None, current, 0, ['first_reading']
+
+    flags = []
+    if reading['previous_month'] < month - relativedelta(months=1):
+        flags.append('gap')
+    if reading['previous_machine'] != reading['machine_id']:
+        flags.append('meter_reset')
+        usage = current
+    elif current < previous:
+        flags.append('negative_delta')
+        usage = 0
+    else:
+        usage = current - previous
+    return reading['previous_month'], previous, current, usage, flags
+
+
+def build_line(run, lease, reading, parts, accessories):
+    previous_month, previous, current, usage, flags = measure_usage(reading, run.month)
+    usage_amount = (usage * run.copy_rate).quantize(CENT)
+    myq_amount = run.myq_fee if lease['add_myq'] else Decimal('0')
+    vat = ((usage_amount + myq_amount) * run.vat_rate).quantize(CENT) if lease['add_vat'] else Decimal('0')
+    parts_amount, parts_vat = parts
+    accessories_amount, accessories_vat = accessories
+    return BillingLine(
+        run=run,
+        lease_id=lease['id'],
+        lease_no=lease['lease_no'],
+        client_name=lease['client__client_name'],
+        serial_no=lease['item__serial_no'] or '',
+        previous_month=previous_month,
+        previous_reading=previous,
+        current_reading=current,
+        usage=usage,
+        flags=flags,
+        usage_amount=usage_amount,
+        myq_amount=myq_amount,
+        vat=vat,
+        parts_amount=parts_amount,
+        parts_vat=parts_vat,
+        accessories_amount=accessories_amount,
+        accessories_vat=accessories_vat,
+        total=usage_amount + myq_amount + vat + parts_amount + parts_vat + accessories_amount + accessories_vat,
+    )
+
+
+def run_billing(month, user=None, batch_size=BILLING_BATCH_SIZE, progress=None, **rates):
+    """
+    Bill ``month`` and store the result as a BillingRun with one BillingLine
+    per lease. ``rates`` may override copy_rate, myq_fee and vat_rate;
+    ``progress`` is called with the run after each batch.
+    """
+    month = month.replace(day=1)
+    with transaction.atomic():
+        run = BillingRun.objects.create(month=month, created_by=user, **billing_rates(**rates))
+        for leases in chunked(billable_leases(month).iterator(chunk_size=batch_size), batch_size):
+            lease_ids = [lease['id'] for lease in leases]
+            readings = latest_readings(lease_ids, month)
+            parts = inquiry_totals(LeasePartInquiry, lease_ids, month)
+            accessories = inquiry_totals(LeaseAccInquiry, lease_ids, month)
+
+            lines = [
+                build_line(
+                    run, lease, readings.get(lease['id']),
+                    parts.get(lease['id'], (Decimal('0'), Decimal('0'))),
+                    accessories.get(lease['id'], (Decimal('0'), Decimal('0'))),
+                )
+                for lease in leases
+            ]
+            BillingLine.objects.bulk_create(lines, batch_size=batch_size)
+
+            run.lease_count += len(lines)
+            run.flagged_count += sum(1 for line in lines if line.flags)
+            run.total_usage += sum(line.usage for line in lines)
+            run.total_amount += sum(line.total for line in lines)
+            if progress:
+                progress(run)
+        run.save(update_fields=['lease_count', 'flagged_count', 'total_usage', 'total_amount'])
+    return run
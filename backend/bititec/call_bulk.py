@@ -0,0 +1,135 @@
+"""
+Bulk service-call updates.
+
+bulk_update_calls changes many calls with a handful of UPDATE statements and
+through-table inserts/deletes instead of a save() per call. QuerySet.update()
+and direct through-table writes skip Call.save() and the Call signals, so
+everything those would have done is done here explicitly: completed_at,
+updated_at, change events, audit entries, analytics rollups and the workload
+cache.
+"""
+from django.utils import timezone
+
+from .audit import diff, record_audit
+from .call_events import (
+    TRACKED_FIELDS, VALUE_FIELDS, call_event_batch, changed_fields, record_call_event, snapshot_call,
+)
+from .call_rollups import update_call_rollups
+from .models import Call
+from .workload import invalidate_technician_workload
+
+# Fields a bulk request may set; every selected call gets the same value
+BULK_FIELDS = ['status', 'technician_manager_approval', 'client_verification', 'is_checked', 'director_comment']
+
+# What events, rollups and the auto-complete rule need to see
+LOADED_FIELDS = ['id', 'ticket_no', 'created_at', 'department', 'client_id', 'item_id', 'completed_at', *BULK_FIELDS]
+
+
+def auto_complete(call):
+    """Same rule as CallViewSet.update_approval: both approvals complete the call"""
+    if call.technician_manager_approval and call.client_verification and call.status != 'Complete':
+        call.status = 'Complete'
+
+
+def change_technicians(call_ids, technicians=None, add=(), remove=()):
+    """
+    Replace (``technicians``) or add/remove technicians on ``call_ids`` with
+    one delete and one insert. Returns {call_id: (before, after)} for the
+    calls whose technicians changed.
+    """
+    Through = Call.technician.through
+    current = {}
+    for call_id, user_id in Through.objects.filter(call_id__in=call_ids).values_list('call_id', 'customuser_id'):
+        current.setdefault(call_id, set()).add(user_id)
+
+    if technicians is not None:
+        stale = Through.objects.filter(call_id__in=call_ids).exclude(customuser_id__in=technicians)
+    else:
+        stale = Through.objects.filter(call_id__in=call_ids, customuser_id__in=remove)
+
+    changes = {}
+    rows = []
+    for call_id in call_ids:
+        before = current.get(call_id, set())
+        after = set(technicians) if technicians is not None else (before | set(add)) - set(remove)
+        rows.extend(Through(call_id=call_id, customuser_id=user_id) for user_id in after - before)
+        if after != before:
+            changes[call_id] = (before, after)
+
+    stale.delete()
+    Through.objects.bulk_create(rows)
+    return changes
+
+
+def bulk_update_calls(call_ids, changes, technicians=None, add_technicians=(), remove_technicians=()):
+    """
+    Apply ``changes`` (a subset of BULK_FIELDS) and the technician changes to
+    ``call_ids`` in one transaction. Returns (updated calls, per-call
+    {'changed', 'technicians_added', 'technicians_removed'}, missing ids).
+    """
+    now = timezone.now()
+    touches_technicians = technicians is not None or add_technicians or remove_technicians
+
+    with call_event_batch():
+        calls = list(
+            Call.objects.select_for_update().filter(pk__in=call_ids).only(*LOADED_FIELDS).order_by('created_at')
+        )
+        found = {call.pk for call in calls}
+        missing = [call_id for call_id in call_ids if call_id not in found]
+
+        # Work out each call's new values, then write calls ending in the same status together
+        by_status = {}
+        completed, reopened = [], []
+        for call in calls:
+            for field, value in changes.items():
+                setattr(call, field, value)
+            auto_complete(call)
+            if call.status == 'Complete' and call.completed_at is None:
+                call.completed_at = now
+                completed.append(call.pk)
+            elif call.status != 'Complete' and call.completed_at is not None:
+                call.completed_at = None
+                reopened.append(call.pk)
+            if changed_fields(call):
+                by_status.setdefault(call.status, []).append(call.pk)
+
+        for status, ids in by_status.items():
+            Call.objects.filter(pk__in=ids).update(**{**changes, 'status': status, 'updated_at': now})
+        if completed:
+            Call.objects.filter(pk__in=completed).update(completed_at=now)
+        if reopened:
+            Call.objects.filter(pk__in=reopened).update(completed_at=None)
+
+        technician_changes = {}
+        if touches_technicians and calls:
+            technician_changes = change_technicians(
+                [call.pk for call in calls], technicians, add_technicians, remove_technicians
+            )
+            untouched = [pk for pk in technician_changes if not any(pk in ids for ids in by_status.values())]
+            if untouched:
+                Call.objects.filter(pk__in=untouched).update(updated_at=now)
+
+        results = {}
+        status_changed = False
+        for call in calls:
+            changed = changed_fields(call)
+            before, after = technician_changes.get(call.pk, (set(), set()))
+            added, removed = sorted(map(str, after - before)), sorted(map(str, before - after))
+            if changed or added or removed:
+                record_call_event(call.pk, call.ticket_no, 'updated', changed=changed, changes={
+                    field: call.__dict__[field] for field in changed if field in VALUE_FIELDS
+                }, added=added, removed=removed)
+                audits = diff(call._loaded_values, call, TRACKED_FIELDS)
+                if added or removed:
+                    audits['technician'] = [sorted(map(str, before)), sorted(map(str, after))]
+                record_audit('Call', call.pk, 'updated', audits)
+            status_changed = status_changed or 'status' in changed
+            results[call.pk] = {'changed': changed, 'technicians_added': added, 'technicians_removed': removed}
+
+        update_call_rollups(calls)
+        for call in calls:
+            snapshot_call(call)
+        if status_changed or technician_changes:
+            invalidate_technician_workload()
+
+    return calls, results, missing
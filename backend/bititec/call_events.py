@@ -0,0 +1,159 @@
+"""
+Real-time service-call change events.
+
+Call saves, deletes and technician changes are turned into compact diffs and
+pushed to the ``user_notifications_<id>`` group of every technician on the
+call and every manager, as ``call_update`` messages handled by ChatConsumer.
+Clients refetch the call (or just the changed fields) instead of polling the
+whole list.
+
+Events are only sent once the transaction commits. Inside call_event_batch()
+(used by the call endpoints) every change a request makes to one call is
+merged into a single event.
+"""
+import copy
+import json
+import threading
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from .audit import audit_batch
+from .models import Call, CustomUser
+
+# Fields whose new value travels with the event; other changed fields are only named
+VALUE_FIELDS = [
+    'status', 'completed_at', 'contract_type', 'department', 'client_id', 'item_id', 'reported_by', 'reported_date',
+    'meter_reading', 'is_checked', 'technician_manager_approval', 'client_verification',
+    'client_name', 'client_location', 'walk_in_machine_name', 'walk_in_machine_type', 'walk_in_serial_no',
+]
+NAMED_FIELDS = [
+    'fault_reported', 'action_taken', 'parts_required', 'parts_used', 'comments',
+    'director_comment', 'spare_description',
+]
+TRACKED_FIELDS = VALUE_FIELDS + NAMED_FIELDS
+
+# Roles told about every call, assigned or not
+MANAGER_ROLES = ['Technician Manager', 'Director', 'Super Admin']
+
+_state = threading.local()
+
+
+def snapshot_call(instance):
+    """Remember the tracked values a Call was loaded with (deferred fields are skipped)"""
+    values = instance.__dict__
+    instance._loaded_values = {
+        # JSON fields may be edited in place, so keep a copy of those
+        field: copy.deepcopy(values[field]) if isinstance(values[field], (list, dict)) else values[field]
+        for field in TRACKED_FIELDS if field in values
+    }
+
+
+def changed_fields(instance):
+    loaded = getattr(instance, '_loaded_values', {})
+    values = instance.__dict__
+    return [
+        field for field in TRACKED_FIELDS
+        if field in loaded and field in values and loaded[field] != values[field]
+    ]
+
+
+def new_event(call_id, ticket_no, event):
+    return {
+        'call_id': str(call_id),
+        'ticket_no': ticket_no,
+        'event': event,
+        'changes': {},
+        'changed': [],
+        'technicians_added': [],
+        'technicians_removed': [],
+    }
+
+
+def merge_event(events, call_id, ticket_no, event, changes=None, changed=(), added=(), removed=()):
+    """Fold one change into the event pending for ``call_id``"""
+    pending = events.get(call_id)
+    if pending is None:
+        pending = events[call_id] = new_event(call_id, ticket_no, event)
+    elif event == 'deleted' or pending['event'] == 'updated':
+        pending['event'] = event
+    pending['ticket_no'] = ticket_no or pending['ticket_no']
+    pending['changes'].update(changes or {})
+    pending['changed'].extend(field for field in changed if field not in pending['changed'])
+
+    for user_id in added:
+        if user_id in pending['technicians_removed']:
+            pending['technicians_removed'].remove(user_id)
+        elif user_id not in pending['technicians_added']:
+            pending['technicians_added'].append(user_id)
+    for user_id in removed:
+        if user_id in pending['technicians_added']:
+            pending['technicians_added'].remove(user_id)
+        elif user_id not in pending['technicians_removed']:
+            pending['technicians_removed'].append(user_id)
+
+
+def record_call_event(call_id, ticket_no, event, **kwargs):
+    """Queue an event for ``call_id``; it goes out when the transaction commits"""
+    batch = getattr(_state, 'batch', None)
+    if batch is not None:
+        merge_event(batch, call_id, ticket_no, event, **kwargs)
+        return
+    events = {}
+    merge_event(events, call_id, ticket_no, event, **kwargs)
+    transaction.on_commit(lambda: send_call_events(events.values()), robust=True)
+
+
+@contextmanager
+def call_event_batch():
+    """
+    Run the block in a transaction and send one merged event per call after
+    commit. Audit entries are merged per call for the same block.
+    """
+    if getattr(_state, 'batch', None) is not None:
+        yield  # Already batching; the outer block sends
+        return
+    _state.batch = {}
+    try:
+        with audit_batch(), transaction.atomic():
+            yield
+            events = _state.batch
+            if events:
+                transaction.on_commit(lambda: send_call_events(events.values()), robust=True)
+    finally:
+        _state.batch = None
+
+
+def recipients(events):
+    """call id -> user ids to notify: managers plus technicians on (or just taken off) the call"""
+    managers = [str(pk) for pk in CustomUser.objects.filter(
+        role__in=MANAGER_ROLES, active=True
+    ).values_list('id', flat=True)]
+    assigned = {}
+    for call_id, user_id in Call.technician.through.objects.filter(
+        call_id__in=[event['call_id'] for event in events]
+    ).values_list('call_id', 'customuser_id'):
+        assigned.setdefault(str(call_id), set()).add(str(user_id))
+
+    result = {}
+    for event in events:
+        users = set(managers) | assigned.get(event['call_id'], set())
+        users.update(event['technicians_added'], event['technicians_removed'])
+        result[event['call_id']] = users
+    return result
+
+
+def send_call_events(events):
+    events = [json.loads(json.dumps(event, cls=DjangoJSONEncoder)) for event in events]
+    channel_layer = get_channel_layer()
+    if not events or channel_layer is None:
+        return
+    send = async_to_sync(channel_layer.group_send)
+    for_call = recipients(events)
+    for event in events:
+        message = {'type': 'call_update', **event}
+        for user_id in sorted(for_call[event['call_id']]):
+            send(f'user_notifications_{user_id}', message)
@@ -0,0 +1,125 @@
+"""
+Parts required/used on service calls as rows.
+
+Call.parts_required and Call.parts_used stay free-form JSON lists for the
+frontend; CallPartUsage mirrors every entry with the Part it names (matched on
+ref_no), so "which calls used part X" and usage per machine model are indexed
+joins. CallSerializer re-syncs a call whenever either list is written;
+sync_call_parts is also what the backfill_call_parts command runs.
+"""
+import uuid
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import ValidationError
+
+from .filters import filter_date_range
+from .models import CallPartUsage, Part
+
+# CallPartUsage.kind -> Call JSON field
+KIND_FIELDS = {'Required': 'parts_required', 'Used': 'parts_used'}
+
+# Keys the frontend has used for entries stored as objects
+REF_KEYS = ('ref_no', 'refNo', 'ref', 'part_ref', 'partRef', 'reference')
+NAME_KEYS = ('part_name', 'partName', 'name', 'description')
+QUANTITY_KEYS = ('quantity', 'qty')
+
+
+def first_value(entry, keys):
+    for key in keys:
+        value = entry.get(key)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def parse_entry(entry):
+    """(ref_no, description, quantity, ref_is_guess) for one list entry"""
+    if isinstance(entry, dict):
+        ref_no = str(first_value(entry, REF_KEYS) or '').strip()
+        description = str(first_value(entry, NAME_KEYS) or '').strip()
+        try:
+            quantity = max(int(first_value(entry, QUANTITY_KEYS) or 1), 0)
+        except (TypeError, ValueError):
+            quantity = 1
+        return ref_no[:255], description[:255], quantity, False
+    # A bare string is either a ref_no or a part description
+    text = str(entry).strip()[:255]
+    return text, text, 1, True
+
+
+def build_usages(calls):
+    """Unsaved CallPartUsage rows for ``calls``, with one Part lookup for all of them"""
+    entries = []
+    for call in calls:
+        for kind, field in KIND_FIELDS.items():
+            value = getattr(call, field) or []
+            if not isinstance(value, list):
+                value = [value]
+            for position, entry in enumerate(value):
+                if entry in (None, '', {}):
+                    continue
+                entries.append((call.pk, kind, position, *parse_entry(entry)))
+
+    refs = {entry[3] for entry in entries if entry[3]}
+    parts = {}
+    if refs:
+        # A ref_no stocked in several stores links to its original (non-transfer) row
+        for ref_no, pk in Part.objects.filter(ref_no__in=refs).order_by(
+            'ref_no', 'is_transfer', 'created_at'
+        ).values_list('ref_no', 'pk'):
+            parts.setdefault(ref_no, pk)
+
+    usages = []
+    for call_id, kind, position, ref_no, description, quantity, ref_is_guess in entries:
+        part_id = parts.get(ref_no)
+        if ref_is_guess:
+            ref_no, description = (ref_no, '') if part_id else ('', description)
+        usages.append(CallPartUsage(
+            call_id=call_id, kind=kind, position=position, part_id=part_id,
+            ref_no=ref_no, description=description, quantity=quantity,
+        ))
+    return usages
+
+
+def sync_call_parts(calls):
+    """Replace the usage rows of ``calls`` with rows built from their JSON lists"""
+    calls = list(calls)
+    with transaction.atomic():
+        CallPartUsage.objects.filter(call__in=[call.pk for call in calls]).delete()
+        usages = CallPartUsage.objects.bulk_create(build_usages(calls))
+    return len(usages)
+
+
+def usage_kind(params):
+    kind = params.get('kind', 'used').capitalize()
+    if kind not in KIND_FIELDS:
+        raise ValidationError({'kind': "Choose 'used' or 'required'"})
+    return kind
+
+
+def part_usages(params):
+    """CallPartUsage rows matching ``?kind=``, ``?part=``, ``?ref_no=`` and the call date range"""
+    usages = CallPartUsage.objects.filter(kind=usage_kind(params))
+    if params.get('part'):
+        try:
+            usages = usages.filter(part_id=uuid.UUID(params['part']))
+        except ValueError:
+            raise ValidationError({'part': 'Must be a part id'})
+    if params.get('ref_no'):
+        usages = usages.filter(ref_no=params['ref_no'])
+    return filter_date_range(usages, params, field='call__created_at')
+
+
+def usage_by_machine_model(params):
+    """Quantity and call count per (machine brand, machine model, part)"""
+    return part_usages(params).values(
+        'part_id', 'ref_no', 'description',
+        part_name=F('part__part_name'),
+        machine_brand=F('call__item__machine_brand'),
+        machine_model=Coalesce('call__item__machine_name', 'call__walk_in_machine_name'),
+    ).annotate(
+        quantity=Sum('quantity'),
+        calls=Count('call', distinct=True),
+    ).order_by('-quantity', 'machine_brand', 'machine_model', 'ref_no')
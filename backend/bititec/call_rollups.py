@@ -0,0 +1,190 @@
+"""
+Service-call analytics rollups.
+
+CallRollup holds call counts per (month opened, department, client, machine,
+status) plus resolution totals for completed calls. Every Call save/delete
+moves its contribution between buckets in the same transaction (see
+signals.py), so directors' reports read a few hundred rollup rows instead of
+the Call table. rebuild_call_rollups recomputes them from scratch.
+"""
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import CallRollup
+
+KEY_FIELDS = ('month', 'department', 'client_id', 'machine_id', 'status')
+
+# Volume breakdowns the analytics endpoint can group by
+GROUPINGS = {
+    'client': ['client_id', 'client__client_name'],
+    'machine': ['machine_id', 'machine__machine_name', 'machine__serial_no'],
+    'department': ['department'],
+}
+
+
+def month_start(value):
+    """First day of the (local) month of a datetime or date"""
+    if isinstance(value, datetime.datetime):
+        value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def bucket_name(key):
+    month, department, client_id, machine_id, status = key
+    return f"{month:%Y-%m}|{department}|{client_id or ''}|{machine_id or ''}|{status}"
+
+
+def contribution(created_at, department, client_id, machine_id, status, completed_at):
+    """(bucket key, resolution seconds or None) for one call"""
+    key = (month_start(created_at), department or '', client_id, machine_id, status)
+    resolution = None
+    if status == 'Complete' and completed_at and created_at:
+        resolution = max(int((completed_at - created_at).total_seconds()), 0)
+    return key, resolution
+
+
+def call_contribution(values, created_at):
+    return contribution(
+        created_at, values.get('department'), values.get('client_id'), values.get('item_id'),
+        values.get('status'), values.get('completed_at')
+    )
+
+
+def add_delta(deltas, key, resolution, sign):
+    count, resolved, seconds = deltas.get(key, (0, 0, 0))
+    if resolution is not None:
+        resolved += sign
+        seconds += sign * resolution
+    deltas[key] = (count + sign, resolved, seconds)
+
+
+def apply_deltas(deltas):
+    """Add (calls, resolved, seconds) deltas to their buckets, creating missing ones"""
+    with transaction.atomic():
+        for key, (count, resolved, seconds) in deltas.items():
+            if not (count or resolved or seconds):
+                continue
+            bucket = bucket_name(key)
+            changes = {
+                'call_count': F('call_count') + count,
+                'resolved_count': F('resolved_count') + resolved,
+                'resolution_seconds': F('resolution_seconds') + seconds,
+            }
+            if CallRollup.objects.filter(bucket=bucket).update(**changes) or count < 0:
+                continue  # A missing bucket is only created for calls arriving in it
+            try:
+                with transaction.atomic():
+                    CallRollup.objects.create(
+                        bucket=bucket, call_count=count, resolved_count=resolved, resolution_seconds=seconds,
+                        **dict(zip(KEY_FIELDS, key))
+                    )
+            except IntegrityError:
+                # Created concurrently; it exists now
+                CallRollup.objects.filter(bucket=bucket).update(**changes)
+
+
+def update_call_rollups(instances, created=False, deleted=False):
+    """Move each instance's contribution from the bucket it was loaded in to its current one"""
+    deltas = {}
+    for instance in instances:
+        current = instance.__dict__
+        if not created:
+            loaded = {**current, **getattr(instance, '_loaded_values', {})}
+            add_delta(deltas, *call_contribution(loaded, instance.created_at), -1)
+        if not deleted:
+            add_delta(deltas, *call_contribution(current, instance.created_at), 1)
+    apply_deltas(deltas)
+
+
+def rollup_rows(calls):
+    """Aggregate (created_at, department, client_id, item_id, status, completed_at) rows into buckets"""
+    deltas = {}
+    for row in calls:
+        add_delta(deltas, *contribution(*row), 1)
+    return [
+        CallRollup(bucket=bucket_name(key), call_count=count, resolved_count=resolved,
+                   resolution_seconds=seconds, **dict(zip(KEY_FIELDS, key)))
+        for key, (count, resolved, seconds) in deltas.items()
+    ]
+
+
+def month_range(params):
+    """(first, last) months from ``?from=YYYY-MM&to=YYYY-MM``; defaults to the last 12 months"""
+    try:
+        last = datetime.datetime.strptime(params['to'], '%Y-%m').date() if params.get('to') else month_start(timezone.now())
+        if params.get('from'):
+            first = datetime.datetime.strptime(params['from'], '%Y-%m').date()
+        else:
+            first = last - relativedelta(months=11)
+    except ValueError:
+        raise ValidationError({'error': 'Months must use YYYY-MM format'})
+    if first > last:
+        raise ValidationError({'error': "'from' must not be after 'to'"})
+    return first, last
+
+
+def call_analytics(params):
+    """MTTR, call volumes and repeat-fault machines from the rollups"""
+    first, last = month_range(params)
+    group_by = params.get('group_by', 'department')
+    if group_by not in GROUPINGS:
+        raise ValidationError({'group_by': f"Choose one of: {', '.join(GROUPINGS)}"})
+    try:
+        min_calls = int(params.get('min_calls', 3))
+    except ValueError:
+        raise ValidationError({'min_calls': 'Must be a number'})
+
+    rollups = CallRollup.objects.filter(month__gte=first, month__lte=last, call_count__gt=0)
+
+    def mttr_hours(row):
+        if not row['resolved']:
+            return None
+        return round(row['seconds'] / row['resolved'] / 3600, 2)
+
+    resolution = rollups.filter(status='Complete').aggregate(
+        resolved=Sum('resolved_count'), seconds=Sum('resolution_seconds')
+    )
+    mttr_by_month = [
+        {'month': row['month'].strftime('%Y-%m'), 'completed': row['resolved'], 'mean_hours': mttr_hours(row)}
+        for row in rollups.filter(status='Complete').values('month').annotate(
+            resolved=Sum('resolved_count'), seconds=Sum('resolution_seconds')
+        ).order_by('month')
+    ]
+    mttr_by_department = [
+        {'department': row['department'], 'completed': row['resolved'], 'mean_hours': mttr_hours(row)}
+        for row in rollups.filter(status='Complete').values('department').annotate(
+            resolved=Sum('resolved_count'), seconds=Sum('resolution_seconds')
+        ).order_by('department')
+    ]
+
+    volume = []
+    for row in rollups.values('month', *GROUPINGS[group_by]).annotate(
+        calls=Sum('call_count')
+    ).order_by('month', *GROUPINGS[group_by]):
+        row['month'] = row['month'].strftime('%Y-%m')
+        volume.append(row)
+
+    by_status = dict(rollups.values_list('status').annotate(calls=Sum('call_count')).order_by('status'))
+
+    repeat_faults = list(rollups.filter(machine__isnull=False).values(
+        'machine_id', 'machine__machine_name', 'machine__serial_no'
+    ).annotate(calls=Sum('call_count')).filter(calls__gte=min_calls).order_by('-calls'))
+
+    return {
+        'from': first.strftime('%Y-%m'),
+        'to': last.strftime('%Y-%m'),
+        'mttr': {
+            'completed': resolution['resolved'] or 0,
+            'mean_hours': mttr_hours({'resolved': resolution['resolved'], 'seconds': resolution['seconds']}),
+            'by_month': mttr_by_month,
+            'by_department': mttr_by_department,
+        },
+        'by_status': by_status,
+        'volume': {'group_by': group_by, 'rows': volume},
+        'repeat_faults': {'min_calls': min_calls, 'machines': repeat_faults},
+    }
@@ -95,4 +95,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
     async def chat_message(self, event):
         # Send chat message to WebSocket
-        await self.send(text_data=json.dumps(event))
\ No newline at end of file
+        await self.send(text_data=json.dumps(event))
+
+    async def call_update(self, event):
+        # Service-call change pushed by call_events.send_call_events()
+        await self.send(text_data=json.dumps(event))
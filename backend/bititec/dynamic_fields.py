@@ -0,0 +1,195 @@
+"""
+Sparse fieldsets and opt-in expansion.
+
+``?fields=id,item,client_name`` limits a response to the named top-level
+fields and ``?expand=item`` keeps a nested object expanded. Once either
+parameter is given, nested serializers that are not listed in ``expand`` are
+rendered as primary keys; without them responses are unchanged. The view mixin
+then drops the select_related / prefetch_related lookups the pruned fields no
+longer read.
+
+Serializers describe what their SerializerMethodFields read with
+``Meta.field_relations`` (field name -> relation names); a method field without
+an entry is assumed to read everything, so no lookups are dropped.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def requested_selection(request):
+    """(fields, expand) sets from the query string, or (None, None) when not asked for"""
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = request.query_params
+    if FIELDS_PARAM not in params and EXPAND_PARAM not in params:
+        return None, None
+    fields = parse_names(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+    return fields, parse_names(params.get(EXPAND_PARAM, ''))
+
+
+def is_expandable(field):
+    """Nested model serializers, single or many, that can collapse to primary keys"""
+    if field.write_only:
+        return False
+    if isinstance(field, serializers.ListSerializer):
+        field = field.child
+    return isinstance(field, serializers.ModelSerializer)
+
+
+def collapse(name, field):
+    kwargs = {'read_only': True, 'many': isinstance(field, serializers.ListSerializer)}
+    if field.source and field.source != name:
+        kwargs['source'] = field.source
+    return serializers.PrimaryKeyRelatedField(**kwargs)
+
+
+class DynamicFieldsMixin:
+    """
+    Applies ``?fields=`` / ``?expand=`` to the top-level serializer of a read
+    request. Code can also pass ``fields=`` and ``expand=`` to the constructor.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        self._selection = None
+        if fields is not None or expand is not None:
+            self._selection = (
+                set(fields) if fields is not None else None,
+                set(expand or ())
+            )
+        super().__init__(*args, **kwargs)
+
+    def is_root_serializer(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_field_selection(self):
+        if self._selection is not None:
+            return self._selection
+        if not self.is_root_serializer():
+            return None, None
+        return requested_selection(self.context.get('request'))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        only, expand = self.get_field_selection()
+        if only is None and expand is None:
+            return fields
+
+        if only is not None:
+            only = only | expand
+            fields = {name: field for name, field in fields.items() if name in only}
+        for name, field in fields.items():
+            if name not in expand and is_expandable(field):
+                fields[name] = collapse(name, field)
+        return fields
+
+
+class DynamicFieldsModelSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    pass
+
+
+def relation_usage(serializer):
+    """
+    Map each relation the serializer's readable fields touch to 'full' (rows
+    are read) or 'pk' (only the key is read). Returns None when that cannot
+    be worked out.
+    """
+    declared = getattr(getattr(serializer, 'Meta', None), 'field_relations', {})
+    usage = {}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in declared:
+            for relation in declared[name]:
+                usage[relation] = 'full'
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            return None
+
+        root = field.source_attrs[0]
+        related = isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField))
+        if related and len(field.source_attrs) == 1:
+            usage.setdefault(root, 'pk')
+        else:
+            usage[root] = 'full'
+    return usage
+
+
+def select_related_paths(tree, prefix=''):
+    for name, subtree in tree.items():
+        path = f'{prefix}{name}'
+        if subtree:
+            yield from select_related_paths(subtree, f'{path}__')
+        else:
+            yield path
+
+
+def is_forward_key(model, name):
+    """True for a ForeignKey / OneToOneField on ``model``, whose key is already on the row"""
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return field.concrete and field.is_relation and not field.many_to_many
+
+
+def prune_queryset(queryset, usage):
+    """Drop joins and prefetches for relations the response does not render"""
+    tree = queryset.query.select_related
+    # only()/defer() across a join needs that join, so leave those querysets alone
+    if isinstance(tree, dict) and not queryset.query.deferred_loading[0]:
+        kept = {name: subtree for name, subtree in tree.items() if usage.get(name) == 'full'}
+        if kept != tree:
+            queryset = queryset.select_related(None)
+            if kept:
+                queryset = queryset.select_related(*select_related_paths(kept))
+
+    lookups = queryset._prefetch_related_lookups
+    if lookups:
+        kept = []
+        roots = set()
+        for lookup in lookups:
+            path = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+            root = path.split('__', 1)[0]
+            if usage.get(root) == 'full':
+                kept.append(lookup)
+            elif usage.get(root) == 'pk' and root not in roots and not is_forward_key(queryset.model, root):
+                # Keys only: keep the root (and any filter on it), drop the nested lookups
+                if isinstance(lookup, Prefetch) and path == root and lookup.queryset is not None:
+                    kept.append(Prefetch(root, queryset=lookup.queryset.select_related(None).prefetch_related(None)))
+                else:
+                    kept.append(root)
+                roots.add(root)
+        if len(kept) != len(lookups) or roots:
+            queryset = queryset.prefetch_related(None).prefetch_related(*kept)
+    return queryset
+
+
+class DynamicFieldsViewMixin:
+    """
+    Prunes the view's queryset to the relations the requested fields render.
+    Applied in filter_queryset() so views' own get_queryset() stay untouched.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        only, expand = requested_selection(self.request)
+        if only is None and expand is None:
+            return queryset
+        usage = relation_usage(self.get_serializer())
+        if usage is None:
+            return queryset
+        return prune_queryset(queryset, usage)
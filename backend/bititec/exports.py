@@ -0,0 +1,225 @@
+"""
+Constant-memory CSV / NDJSON exports.
+
+Exports read flat values() rows through QuerySet.iterator() (a server-side
+cursor on Postgres) and stream them out with StreamingHttpResponse, so a
+worker never holds more than one chunk of rows no matter how large the export.
+The ``?output=`` parameter picks the format (DRF reserves ``?format=``).
+"""
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+# Column name -> values() lookup
+
+MACHINE_EXPORT_FIELDS = {
+    'id': 'id',
+    'machine_name': 'machine_name',
+    'machine_brand': 'machine_brand',
+    'machine_type': 'machine_type',
+    'serial_no': 'serial_no',
+    'unit_value': 'unit_value',
+    'quantity': 'quantity',
+    'machine_condition': 'machine_condition',
+    'color_type': 'color_type',
+    'machine_status': 'machine_status',
+    'supplier_name': 'supplier_name',
+    'store_id': 'store_id',
+    'store_name': 'store__store_name',
+    'is_transfer': 'is_transfer',
+    'created_at': 'created_at',
+}
+
+PART_EXPORT_FIELDS = {
+    'id': 'id',
+    'part_name': 'part_name',
+    'part_brand': 'part_brand',
+    'part_type': 'part_type',
+    'ref_no': 'ref_no',
+    'unit_value': 'unit_value',
+    'intial_quantity': 'intial_quantity',
+    'quantity': 'quantity',
+    'leased_quantity': 'leased_total',
+    'sold_quantity': 'sold_total',
+    'part_condition': 'part_condition',
+    'color_type': 'color_type',
+    'part_status': 'part_status',
+    'supplier_name': 'supplier_name',
+    'store_id': 'store_id',
+    'store_name': 'store__store_name',
+    'is_transfer': 'is_transfer',
+    'created_at': 'created_at',
+}
+
+ACCESSORY_EXPORT_FIELDS = {
+    'id': 'id',
+    'acc_name': 'acc_name',
+    'acc_brand': 'acc_brand',
+    'acc_type': 'acc_type',
+    'ref_no': 'ref_no',
+    'unit_value': 'unit_value',
+    'intial_quantity': 'intial_quantity',
+    'quantity': 'quantity',
+    'leased_quantity': 'leased_total',
+    'sold_quantity': 'sold_total',
+    'acc_condition': 'acc_condition',
+    'color_type': 'color_type',
+    'acc_status': 'acc_status',
+    'supplier_name': 'supplier_name',
+    'store_id': 'store_id',
+    'store_name': 'store__store_name',
+    'is_transfer': 'is_transfer',
+    'created_at': 'created_at',
+}
+
+# One row per sale item (a sale without items still gets one row)
+SALE_EXPORT_FIELDS = {
+    'sale_id': 'id',
+    'sale_no': 'sale_no',
+    'sale_date': 'sale_date',
+    'sale_type': 'sale_type',
+    'client_name': 'client__client_name',
+    'local_client_name': 'local_client_name',
+    'add_vat': 'add_vat',
+    'item_id': 'items__id',
+    'item_sale_type': 'items__sale_type',
+    'machine_serial_no': 'items__machine__serial_no',
+    'part_ref_no': 'items__part__ref_no',
+    'accessory_ref_no': 'items__accessory__ref_no',
+    'quantity': 'items__quantity',
+    'unit_price': 'items__unit_price',
+    'total_price': 'items__total_price',
+    'created_at': 'created_at',
+}
+
+CALL_EXPORT_FIELDS = {
+    'id': 'id',
+    'ticket_no': 'ticket_no',
+    'status': 'status',
+    'contract_type': 'contract_type',
+    'department': 'department',
+    'client_name': 'client__client_name',
+    'walk_in_client_name': 'client_name',
+    'machine_serial_no': 'item__serial_no',
+    'machine_name': 'item__machine_name',
+    'reported_by': 'reported_by',
+    'reported_date': 'reported_date',
+    'fault_reported': 'fault_reported',
+    'meter_reading': 'meter_reading',
+    'client_verification': 'client_verification',
+    'technician_manager_approval': 'technician_manager_approval',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+LEASE_EXPORT_FIELDS = {
+    'id': 'id',
+    'lease_no': 'lease_no',
+    'contract_type': 'contract_type',
+    'client_name': 'client__client_name',
+    'department': 'department',
+    'machine_serial_no': 'item__serial_no',
+    'machine_name': 'item__machine_name',
+    'store_name': 'store__store_name',
+    'from_date': 'from_date',
+    'to_date': 'to_date',
+    'is_active': 'is_active',
+    'add_vat': 'add_vat',
+    'add_myq': 'add_myq',
+    'billed_myq': 'billed_myq',
+    'created_at': 'created_at',
+}
+
+
+class Echo:
+    """File-like object whose write() hands back the line for streaming"""
+
+    def write(self, value):
+        return value
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def csv_lines(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([row.get(column) for column in columns])
+
+
+def ndjson_lines(rows, columns):
+    for row in rows:
+        yield json.dumps({column: row.get(column) for column in columns}, cls=DjangoJSONEncoder) + '\n'
+
+
+class StreamingExportMixin:
+    """
+    Adds an ``export`` handler streaming the view's filtered queryset.
+
+    Views set ``export_fields`` (column -> values() lookup) and
+    ``export_filename``, and may override ``enrich_export_rows`` to add
+    columns to each chunk of rows with one extra query.
+    """
+    export_fields = {}
+    export_filename = 'export'
+    export_chunk_size = EXPORT_CHUNK_SIZE
+
+    def get_export_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def get_export_columns(self):
+        return list(self.export_fields)
+
+    def enrich_export_rows(self, rows):
+        """Hook for columns that cannot come from a flat values() lookup"""
+
+    def export_rows(self, queryset):
+        lookups = self.export_fields
+        # Prefetches do not apply to values() and select_related is implied by the lookups
+        rows = queryset.prefetch_related(None).values(*lookups.values()).iterator(
+            chunk_size=self.export_chunk_size
+        )
+        for chunk in chunked(rows, self.export_chunk_size):
+            chunk = [{column: row[lookup] for column, lookup in lookups.items()} for row in chunk]
+            self.enrich_export_rows(chunk)
+            yield from chunk
+
+    def export(self, request, *args, **kwargs):
+        output = request.query_params.get('output', 'csv').lower()
+        if output not in EXPORT_FORMATS:
+            raise ValidationError({'output': f"Choose one of: {', '.join(EXPORT_FORMATS)}"})
+        content_type, extension = EXPORT_FORMATS[output]
+        writer = csv_lines if output == 'csv' else ndjson_lines
+
+        rows = self.export_rows(self.get_export_queryset())
+        response = StreamingHttpResponse(writer(rows, self.get_export_columns()), content_type=content_type)
+        filename = f"{self.export_filename}-{timezone.localdate():%Y%m%d}.{extension}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ExportView(StreamingExportMixin):
+    """Mixin for a read-only export endpoint built on a list view class"""
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request, *args, **kwargs):
+        return self.export(request, *args, **kwargs)
@@ -7,7 +7,9 @@ from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 import uuid
 import os
-from .models import message_file_path
+from .models import Store, message_file_path
+from .importers import InventoryImportError, import_inventory
+from rest_framework.parsers import FormParser, MultiPartParser
 
 class ChatFileUploadView(APIView):
     permission_classes = [IsAuthenticated]
@@ -32,4 +34,44 @@ class ChatFileUploadView(APIView):
         
         return Response({
             "file_url": file_url
-        })
\ No newline at end of file
+        })
+
+class InventoryImportView(APIView):
+    """
+    Bulk-create machines, parts or accessories from a CSV/XLSX upload.
+
+    Form fields: ``file``, ``item_type`` (machine/part/accessory), optional
+    ``store`` id for rows without a store column and ``dry_run``.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request):
+        if 'file' not in request.FILES:
+            return Response(
+                {"error": "No file uploaded"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file = request.FILES['file']
+        store = None
+        store_id = request.data.get('store')
+        if store_id:
+            store = Store.objects.filter(id=store_id).first()
+            if store is None:
+                return Response({"error": "Store not found"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = import_inventory(
+                file, file.name, request.data.get('item_type', ''),
+                store=store,
+                user=request.user,
+                dry_run=str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes'),
+            )
+        except InventoryImportError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            report.to_dict(),
+            status=status.HTTP_201_CREATED if report.created and not report.dry_run else status.HTTP_200_OK
+        )
@@ -0,0 +1,43 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+
+def date_range_bounds(start, end):
+    """
+    Half-open [lower, upper) timestamps covering the whole days ``start``..``end``
+    in the server timezone.
+    """
+    tz = timezone.get_current_timezone()
+    lower = timezone.make_aware(datetime.combine(start, time.min), tz)
+    upper = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz)
+    return lower, upper
+
+
+def filter_date_range(queryset, params, field='created_at'):
+    """
+    Apply the ``start_date`` / ``end_date`` (YYYY-MM-DD) query params to ``field``.
+
+    The column is compared against plain timestamps instead of ``__date`` so the
+    database can use the (…, created_at) composite indexes.
+    """
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    if not (start_date and end_date):
+        return queryset
+
+    try:
+        start = parse_date(start_date)
+        end = parse_date(end_date)
+    except (ValueError, TypeError) as e:
+        raise ValidationError(f"Invalid date format. Use YYYY-MM-DD: {str(e)}") from e
+
+    if not (start and end):
+        return queryset
+    if start > end:
+        raise ValidationError("End date must be after start date")
+
+    lower, upper = date_range_bounds(start, end)
+    return queryset.filter(**{f'{field}__gte': lower, f'{field}__lt': upper})
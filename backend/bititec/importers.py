@@ -0,0 +1,274 @@
+"""
+Streaming inventory import from supplier spreadsheets (CSV or XLSX).
+
+Rows are read lazily and handled a chunk at a time: each chunk is validated
+against the model fields, checked for existing serial_no / ref_no values with
+one IN lookup, written with bulk_create and given its opening 'Receipt'
+ledger entries in bulk. Only the current chunk, the keys already seen and a
+capped list of row errors are kept in memory.
+"""
+import csv
+import io
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .inventory import record_receipts
+from .models import Accessory, Machine, Part, Store
+from .store_summary import invalidate_store_summary
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_MODELS = {
+    'machine': {
+        'model': Machine,
+        'key': 'serial_no',
+        'fields': [
+            'machine_name', 'machine_brand', 'machine_type', 'serial_no', 'unit_value', 'quantity',
+            'machine_condition', 'color_type', 'supplier_name', 'machine_status',
+        ],
+        'defaults': {'machine_status': 'Available', 'quantity': '1'},
+    },
+    'part': {
+        'model': Part,
+        'key': 'ref_no',
+        'per_store': True,  # ref_no is unique per (ref_no, store)
+        'fields': [
+            'part_name', 'part_brand', 'part_type', 'ref_no', 'unit_value', 'intial_quantity', 'quantity',
+            'part_condition', 'color_type', 'supplier_name', 'part_status',
+        ],
+        'defaults': {'part_status': 'Available'},
+    },
+    'accessory': {
+        'model': Accessory,
+        'key': 'ref_no',
+        'per_store': True,
+        'fields': [
+            'acc_name', 'acc_brand', 'acc_type', 'ref_no', 'unit_value', 'intial_quantity', 'quantity',
+            'acc_condition', 'color_type', 'supplier_name', 'acc_status',
+        ],
+        'defaults': {'acc_status': 'Available'},
+    },
+}
+
+
+class InventoryImportError(Exception):
+    """The file as a whole cannot be imported (bad format, missing columns, ...)"""
+
+
+def normalise_header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def csv_rows(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.DictReader(text):
+            yield {normalise_header(key): value for key, value in row.items() if key}
+    finally:
+        text.detach()  # Leave the underlying file open for the caller
+
+
+def xlsx_rows(fileobj):
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise InventoryImportError('XLSX import needs the openpyxl package') from e
+
+    workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [normalise_header(value) for value in next(rows, ())]
+        for values in rows:
+            if any(value is not None for value in values):
+                yield {key: value for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+def read_rows(fileobj, filename):
+    """Yield one dict per data row, keyed by lower_snake_case header"""
+    fileobj = getattr(fileobj, 'file', fileobj)  # Unwrap Django's UploadedFile
+    name = filename.lower()
+    if name.endswith('.xlsx'):
+        return xlsx_rows(fileobj)
+    if name.endswith('.csv') or name.endswith('.txt'):
+        return csv_rows(fileobj)
+    raise InventoryImportError('Unsupported file type; upload a .csv or .xlsx file')
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def clean_cell(value):
+    if isinstance(value, str):
+        value = value.strip()
+    return None if value in ('', None) else value
+
+
+class ImportReport:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.total_rows = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.errors_truncated = False
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+        else:
+            self.errors_truncated = True
+
+    def to_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'total_rows': self.total_rows,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.errors_truncated,
+        }
+
+
+class InventoryImporter:
+    """
+    Import ``item_type`` ('machine', 'part' or 'accessory') rows.
+
+    ``store`` is used for rows without a store column; the column may hold a
+    store id or name. ``progress`` is called with the report after each chunk.
+    """
+
+    def __init__(self, item_type, store=None, user=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 dry_run=False, progress=None):
+        if item_type not in IMPORT_MODELS:
+            raise InventoryImportError(f"Unknown item type '{item_type}'")
+        config = IMPORT_MODELS[item_type]
+        self.model = config['model']
+        self.key = config['key']
+        self.per_store = config.get('per_store', False)
+        self.fields = config['fields']
+        self.defaults = config['defaults']
+        self.default_store = store
+        self.user = user
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.report = ImportReport(dry_run=dry_run)
+        self.seen_keys = set()
+        self.stores = {}
+        for store_id, store_name in Store.objects.values_list('id', 'store_name'):
+            self.stores[str(store_id)] = store_id
+            self.stores.setdefault(store_name.strip().lower(), store_id)
+
+    def run(self, rows):
+        # Header row is line 1, so data rows start at 2 like in a spreadsheet
+        numbered = enumerate(rows, start=2)
+        for chunk in chunked(numbered, self.chunk_size):
+            if not self.report.total_rows and self.key not in chunk[0][1]:
+                raise InventoryImportError(f"Missing required column '{self.key}'")
+            self.import_chunk(chunk)
+            if self.progress:
+                self.progress(self.report)
+        return self.report
+
+    def resolve_store(self, value):
+        if value is None:
+            return self.default_store.pk if self.default_store else None
+        return self.stores.get(str(value).strip().lower())
+
+    def build(self, raw):
+        """Return (instance, None) or (None, errors) for one row, without touching the database"""
+        values = {field: clean_cell(raw.get(field)) for field in self.fields}
+        for field, default in self.defaults.items():
+            if values.get(field) is None:
+                values[field] = default
+        if 'intial_quantity' in values and values['intial_quantity'] is None:
+            values['intial_quantity'] = values['quantity']
+
+        store_id = self.resolve_store(clean_cell(raw.get('store')))
+        if store_id is None:
+            return None, {'store': 'Unknown or missing store'}
+
+        description = clean_cell(raw.get('description'))
+        instance = self.model(
+            store_id=store_id,
+            description=[str(description)] if description is not None else [],
+            **{field: value for field, value in values.items() if value is not None}
+        )
+        try:
+            # Uniqueness is checked per chunk; store and description were built above
+            instance.full_clean(
+                exclude=['store', 'description'], validate_unique=False, validate_constraints=False
+            )
+        except ValidationError as e:
+            return None, {field: ' '.join(messages) for field, messages in e.message_dict.items()}
+        return instance, None
+
+    def unique_key(self, instance):
+        key = getattr(instance, self.key)
+        return (key, instance.store_id) if self.per_store else key
+
+    def import_chunk(self, chunk):
+        self.report.total_rows += len(chunk)
+        candidates = []
+        for row_number, raw in chunk:
+            instance, errors = self.build(raw)
+            if errors:
+                self.report.add_error(row_number, errors)
+                continue
+            key = self.unique_key(instance)
+            if key in self.seen_keys:
+                self.report.add_error(row_number, {self.key: f'Duplicate {self.key} in file'})
+                continue
+            self.seen_keys.add(key)
+            candidates.append((row_number, instance))
+
+        for attempt in range(2):
+            columns = [self.key, 'store_id'] if self.per_store else [self.key]
+            existing = set(self.model.objects.filter(
+                **{f'{self.key}__in': [getattr(instance, self.key) for _, instance in candidates]}
+            ).values_list(*columns, flat=not self.per_store))
+            fresh = []
+            for row_number, instance in candidates:
+                if self.unique_key(instance) in existing:
+                    self.report.add_error(row_number, {self.key: f'{self.key} already exists'})
+                else:
+                    fresh.append((row_number, instance))
+            candidates = fresh
+
+            if self.report.dry_run or not candidates:
+                self.report.created += len(candidates)  # "Would be created" in a dry run
+                return
+            try:
+                self.write([instance for _, instance in candidates])
+            except IntegrityError:
+                if not attempt:
+                    continue  # Another writer took some keys since the lookup; re-check once
+                # Still clashing: fail this chunk's rows and carry on with the next chunk
+                for row_number, _ in candidates:
+                    self.report.add_error(row_number, {'row': 'Not saved: the chunk clashed with a concurrent change; retry it'})
+                return
+            self.report.created += len(candidates)
+            return
+
+    def write(self, items):
+        with transaction.atomic():
+            self.model.objects.bulk_create(items, batch_size=self.chunk_size)
+            record_receipts(items, user=self.user, batch_size=self.chunk_size)
+            invalidate_store_summary(*{item.store_id for item in items})
+
+
+def import_inventory(fileobj, filename, item_type, **options):
+    """Stream ``fileobj`` through an InventoryImporter and return its report"""
+    importer = InventoryImporter(item_type, **options)
+    return importer.run(read_rows(fileobj, filename))
@@ -0,0 +1,331 @@
+"""
+Stock movement ledger.
+
+Every code path that changes an item's stock appends a StockMovement here and
+bumps the item's StockBalance in the same transaction, so available / leased /
+sold figures are a single row read and "as of" figures an indexed lookup.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.utils import timezone
+
+from .models import (
+    Accessory, LeaseAccInquiry, LeasePartInquiry, Machine, Part, SaleItem, StockBalance, StockMovement,
+)
+from .store_summary import invalidate_store_summary
+
+ITEM_FIELDS = {
+    Machine: 'machine',
+    Part: 'part',
+    Accessory: 'accessory',
+}
+
+ITEM_TYPES = {
+    'machine': 'Machine',
+    'part': 'Part',
+    'accessory': 'Accessory',
+}
+
+# Reasons whose (negated) delta also moves the sold / leased running totals
+SALE_REASONS = {'Sale', 'Sale Return'}
+LEASE_REASONS = {'Lease Issue', 'Lease Return'}
+
+# source_type of the 'Receipt' that opens the ledger of an item which had stock
+# before it; its leased_after / sold_after carry the totals from before the ledger
+OPENING_SOURCE = 'OpeningBalance'
+
+LEASE_TABLES = {
+    Part: LeasePartInquiry,
+    Accessory: LeaseAccInquiry,
+}
+
+
+def item_field(item):
+    """Name of the ledger FK ('machine', 'part' or 'accessory') for ``item``"""
+    return ITEM_FIELDS[type(item)]
+
+
+def source_reference(source):
+    """(source_type, source_id) pair identifying the document behind a movement"""
+    if source is None:
+        return '', ''
+    return type(source).__name__, str(source.pk)
+
+
+def apply_to_totals(reason, delta, on_hand, leased, sold):
+    """Return the running totals after a movement of ``delta`` for ``reason``"""
+    on_hand += delta
+    if reason in SALE_REASONS:
+        sold -= delta
+    elif reason in LEASE_REASONS:
+        leased -= delta
+    return on_hand, leased, sold
+
+
+def expected_on_hand(model):
+    """Stock implied by the stored columns (a sold machine keeps its quantity but is gone)"""
+    if model is Machine:
+        return Case(
+            When(machine_status='Sold', then=Value(0)),
+            default=F('quantity'),
+            output_field=IntegerField()
+        )
+    return F('quantity')
+
+
+def stored_totals(model, pks):
+    """{pk: [on_hand, leased, sold]} as the stock columns and the lease / sale tables have them"""
+    field = ITEM_FIELDS[model]
+    totals = {
+        pk: [on_hand, 0, 0]
+        for pk, on_hand in model.objects.filter(pk__in=pks).annotate(
+            on_hand_now=expected_on_hand(model)
+        ).values_list('pk', 'on_hand_now')
+    }
+    tables = [(SaleItem, 2)]
+    if model in LEASE_TABLES:
+        tables.append((LEASE_TABLES[model], 1))
+    for table, position in tables:
+        for pk, total in table.objects.filter(**{f'{field}__in': pks}).order_by().values(field).annotate(
+            total=Sum('quantity')
+        ).values_list(field, 'total'):
+            if pk in totals:
+                totals[pk][position] = total or 0
+    return totals
+
+
+def open_balance(item, movements):
+    """
+    Create the missing balance of ``item``, with the opening Receipt that
+    carries its stock from before the ledger, and return it locked.
+
+    Callers write the item and its lease / sale rows before recording, so the
+    stored figures already include ``movements`` ((delta, reason) pairs); the
+    opening is those figures with the movements undone.
+    """
+    field = item_field(item)
+    on_hand, leased, sold = stored_totals(type(item), [item.pk]).get(item.pk, (0, 0, 0))
+    for delta, reason in movements:
+        on_hand, leased, sold = apply_to_totals(reason, -delta, on_hand, leased, sold)
+
+    try:
+        with transaction.atomic():
+            balance = StockBalance.objects.create(
+                item_type=ITEM_TYPES[field], on_hand=on_hand, leased=leased, sold=sold, **{field: item}
+            )
+    except IntegrityError:
+        # A concurrent first movement created it; wait for that one and carry on from it
+        return StockBalance.objects.select_for_update().get(**{field: item})
+
+    if on_hand or leased or sold:
+        StockMovement.objects.create(
+            item_type=ITEM_TYPES[field], store_id=item.store_id, delta=on_hand, reason='Receipt',
+            source_type=OPENING_SOURCE, on_hand_after=on_hand, leased_after=leased, sold_after=sold,
+            **{field: item}
+        )
+    return balance
+
+
+def record_movement(item, delta, reason, source=None, user=None):
+    """Append a movement for ``item`` and update its running balance"""
+    field = item_field(item)
+    source_type, source_id = source_reference(source)
+
+    with transaction.atomic():
+        balance = StockBalance.objects.select_for_update().filter(**{field: item}).first()
+        if balance is None:
+            balance = open_balance(item, [(delta, reason)])
+        balance.on_hand, balance.leased, balance.sold = apply_to_totals(
+            reason, delta, balance.on_hand, balance.leased, balance.sold
+        )
+        balance.save(update_fields=['on_hand', 'leased', 'sold', 'updated_at'])
+
+        return StockMovement.objects.create(
+            item_type=ITEM_TYPES[field],
+            store_id=item.store_id,
+            delta=delta,
+            reason=reason,
+            source_type=source_type,
+            source_id=source_id,
+            on_hand_after=balance.on_hand,
+            leased_after=balance.leased,
+            sold_after=balance.sold,
+            created_by=user if user is not None and user.is_authenticated else None,
+            **{field: item}
+        )
+
+
+def record_receipts(items, user=None, batch_size=1000):
+    """
+    Bulk version of a 'Receipt' record_movement() for freshly created items:
+    one StockBalance and one StockMovement per item, written with bulk_create.
+    """
+    created_by = user if user is not None and user.is_authenticated else None
+    balances = []
+    movements = []
+    for item in items:
+        field = item_field(item)
+        balances.append(StockBalance(item_type=ITEM_TYPES[field], on_hand=item.quantity, **{field: item}))
+        movements.append(StockMovement(
+            item_type=ITEM_TYPES[field],
+            store_id=item.store_id,
+            delta=item.quantity,
+            reason='Receipt',
+            on_hand_after=item.quantity,
+            leased_after=0,
+            sold_after=0,
+            created_by=created_by,
+            **{field: item}
+        ))
+    with transaction.atomic():
+        StockBalance.objects.bulk_create(balances, batch_size=batch_size)
+        StockMovement.objects.bulk_create(movements, batch_size=batch_size)
+
+
+def record_bulk_movements(entries, source=None, user=None):
+    """
+    Set-based record_movement() for many items at once.
+
+    ``entries`` is a list of (item, delta, reason, store_id); an item may appear
+    more than once and its entries are applied in order. Balances are locked
+    and read with one query per item type, then written back with one
+    bulk_update next to one bulk_create of the movements.
+    """
+    source_type, source_id = source_reference(source)
+    created_by = user if user is not None and user.is_authenticated else None
+
+    with transaction.atomic():
+        balances = {}
+        for field in ITEM_TYPES:
+            pks = {entry[0].pk for entry in entries if item_field(entry[0]) == field}
+            if pks:
+                for balance in StockBalance.objects.select_for_update().filter(**{f'{field}__in': pks}):
+                    balances[(field, getattr(balance, f'{field}_id'))] = balance
+
+        # Items recorded for the first time get their opening balance one by one
+        missing = {}
+        for item, delta, reason, store_id in entries:
+            key = (item_field(item), item.pk)
+            if key not in balances:
+                missing.setdefault(key, (item, []))[1].append((delta, reason))
+        for key, (item, item_movements) in missing.items():
+            balances[key] = open_balance(item, item_movements)
+
+        movements = []
+        for item, delta, reason, store_id in entries:
+            field = item_field(item)
+            balance = balances[(field, item.pk)]
+            balance.on_hand, balance.leased, balance.sold = apply_to_totals(
+                reason, delta, balance.on_hand, balance.leased, balance.sold
+            )
+            movements.append(StockMovement(
+                item_type=ITEM_TYPES[field],
+                store_id=store_id,
+                delta=delta,
+                reason=reason,
+                source_type=source_type,
+                source_id=source_id,
+                on_hand_after=balance.on_hand,
+                leased_after=balance.leased,
+                sold_after=balance.sold,
+                created_by=created_by,
+                **{field: item}
+            ))
+
+        now = timezone.now()
+        for balance in balances.values():
+            balance.updated_at = now  # bulk_update() skips auto_now
+        StockBalance.objects.bulk_update(balances.values(), ['on_hand', 'leased', 'sold', 'updated_at'])
+        return StockMovement.objects.bulk_create(movements)
+
+
+def record_adjustment(item, old_quantity, user=None):
+    """Record a direct edit of ``item.quantity`` (no-op when it did not change)"""
+    delta = item.quantity - old_quantity
+    if delta:
+        return record_movement(item, delta, 'Adjustment', user=user)
+    return None
+
+
+class InsufficientStock(Exception):
+    """Raised by callers that cannot report a failed consume_stock() any other way (e.g. Model.save)"""
+
+
+STATUS_FIELDS = {
+    Machine: 'machine_status',
+    Part: 'part_status',
+    Accessory: 'acc_status',
+}
+
+
+def consume_stock(item, quantity, reason, source=None, user=None):
+    """
+    Take ``quantity`` of ``item`` out of stock with one conditional UPDATE.
+
+    The row only changes when enough stock is on hand, and the status flips to
+    'Out of Stock' in the same statement when the quantity reaches zero (a
+    machine flips to 'Sold' unless it already is). Returns False, without
+    writing anything, when there is not enough stock. The in-memory ``item`` is
+    adjusted rather than re-read.
+    """
+    model = type(item)
+    status_field = STATUS_FIELDS[model]
+
+    with transaction.atomic():
+        if model is Machine:
+            updated = model.objects.filter(pk=item.pk).exclude(
+                machine_status='Sold'
+            ).update(machine_status='Sold')
+        else:
+            # SET expressions see the pre-update row, so quantity == requested means "now empty"
+            updated = model.objects.filter(pk=item.pk, quantity__gte=quantity).update(
+                quantity=F('quantity') - quantity,
+                **{status_field: Case(
+                    When(quantity=quantity, then=Value('Out of Stock')),
+                    default=F(status_field)
+                )}
+            )
+        if not updated:
+            return False
+        record_movement(item, -quantity, reason, source=source, user=user)
+        invalidate_store_summary(item.store_id)
+
+    if model is Machine:
+        item.machine_status = 'Sold'
+    else:
+        item.quantity -= quantity
+        if item.quantity <= 0:
+            setattr(item, status_field, 'Out of Stock')
+    return True
+
+
+def release_stock(item, quantity, reason, source=None, user=None):
+    """
+    Put ``quantity`` of ``item`` back into stock with one UPDATE.
+
+    An item marked 'Out of Stock' (or a 'Sold' machine) becomes 'Available' again.
+    """
+    model = type(item)
+    status_field = STATUS_FIELDS[model]
+
+    with transaction.atomic():
+        if model is Machine:
+            model.objects.filter(pk=item.pk, machine_status='Sold').update(machine_status='Available')
+        else:
+            model.objects.filter(pk=item.pk).update(
+                quantity=F('quantity') + quantity,
+                **{status_field: Case(
+                    When(**{status_field: 'Out of Stock'}, then=Value('Available')),
+                    default=F(status_field)
+                )}
+            )
+        record_movement(item, quantity, reason, source=source, user=user)
+        invalidate_store_summary(item.store_id)
+
+    if model is Machine:
+        if item.machine_status == 'Sold':
+            item.machine_status = 'Available'
+    else:
+        item.quantity += quantity
+        if getattr(item, status_field) == 'Out of Stock':
+            setattr(item, status_field, 'Available')
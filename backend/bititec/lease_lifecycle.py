@@ -0,0 +1,66 @@
+"""
+Lease lifecycle sweep.
+
+expire_leases clears is_active on every active lease whose to_date has
+passed with one UPDATE. It only touches leases that are still active, so
+running it again, or from several processes at once, changes nothing.
+upcoming_expiries lists the active leases ending in the next 90 days for the
+sales team, in 30/60/90-day windows. Both are range scans on the
+(is_active, to_date) index.
+
+The sweep runs from the sweep_leases command, e.g. a daily cron job, rather
+than a thread in every web worker and manage.py process.
+"""
+import datetime
+
+from django.utils import timezone
+
+from .models import LeaseContract
+
+# Upcoming-expiry windows in days; a lease is listed under the first one it ends within
+EXPIRY_WINDOWS = (30, 60, 90)
+
+EXPIRY_COLUMNS = [
+    'id', 'lease_no', 'contract_type', 'department', 'from_date', 'to_date',
+    'client_id', 'client__client_name', 'client__client_location',
+    'item_id', 'item__machine_name', 'item__serial_no', 'store__store_name',
+]
+
+
+def expired_leases(today=None):
+    return LeaseContract.objects.filter(is_active=True, to_date__lt=today or timezone.localdate())
+
+
+def expire_leases(today=None):
+    """Deactivate every active lease that ended before ``today``; returns how many"""
+    return expired_leases(today).update(is_active=False, updated_at=timezone.now())
+
+
+def expiry_window(days_left):
+    return next(window for window in EXPIRY_WINDOWS if days_left <= window)
+
+
+def upcoming_expiries(within=EXPIRY_WINDOWS[-1], today=None):
+    """
+    Active leases ending from ``today`` to ``within`` days on, soonest first,
+    as value rows with ``days_left`` and their expiry ``window``
+    """
+    today = today or timezone.localdate()
+    rows = LeaseContract.objects.filter(
+        is_active=True, to_date__gte=today, to_date__lte=today + datetime.timedelta(days=within)
+    ).values(*EXPIRY_COLUMNS).order_by('to_date', 'lease_no')
+    for row in rows:
+        row['days_left'] = (row['to_date'] - today).days
+        row['window'] = expiry_window(row['days_left'])
+        yield row
+
+
+def expiry_counts(today=None):
+    """{window: number of active leases ending in it} for each of EXPIRY_WINDOWS"""
+    counts = dict.fromkeys(EXPIRY_WINDOWS, 0)
+    today = today or timezone.localdate()
+    for to_date in LeaseContract.objects.filter(
+        is_active=True, to_date__gte=today, to_date__lte=today + datetime.timedelta(days=EXPIRY_WINDOWS[-1])
+    ).values_list('to_date', flat=True):
+        counts[expiry_window((to_date - today).days)] += 1
+    return counts
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from bititec.call_parts import sync_call_parts
+from bititec.models import Call
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild CallPartUsage rows from every call\'s parts_required / parts_used '
+        'lists in chunks, re-linking entries to parts by ref_no.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        calls = Call.objects.only('id', 'parts_required', 'parts_used').order_by('pk')
+
+        synced = rows = 0
+        last_pk = None
+        while True:
+            chunk = calls.filter(pk__gt=last_pk) if last_pk else calls
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+            rows += sync_call_parts(chunk)
+            synced += len(chunk)
+            last_pk = chunk[-1].pk
+            self.stdout.write(f'{synced} calls synced')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} part usage rows for {synced} calls'))
@@ -0,0 +1,60 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from bititec.importers import DEFAULT_CHUNK_SIZE, IMPORT_MODELS, InventoryImportError, import_inventory
+from bititec.models import Store
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream a supplier CSV/XLSX file into machines, parts or accessories, '
+        'validating and inserting it a chunk at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('item_type', choices=sorted(IMPORT_MODELS))
+        parser.add_argument('path')
+        parser.add_argument('--store', help='Store id or name for rows without a store column.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def handle(self, *args, **options):
+        store = None
+        if options['store']:
+            store = (
+                Store.objects.filter(store_name__iexact=options['store']).first()
+                or self.store_by_id(options['store'])
+            )
+            if store is None:
+                raise CommandError(f"Store '{options['store']}' not found")
+
+        def progress(report):
+            self.stdout.write(f'{report.total_rows} rows read, {report.created} created, {report.failed} failed')
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                report = import_inventory(
+                    fileobj, options['path'], options['item_type'],
+                    store=store,
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                    progress=progress,
+                )
+        except (OSError, InventoryImportError) as e:
+            raise CommandError(str(e)) from e
+
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']}: {error['errors']}")
+        if report.errors_truncated:
+            self.stderr.write(f'... {report.failed - len(report.errors)} more failed rows not listed')
+
+        verb = 'would be created' if report.dry_run else 'created'
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created} of {report.total_rows} rows {verb}, {report.failed} failed'
+        ))
+
+    def store_by_id(self, value):
+        try:
+            return Store.objects.filter(id=value).first()
+        except ValidationError:
+            return None  # Not a UUID
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bititec.importers import DEFAULT_CHUNK_SIZE, InventoryImportError
+from bititec.reading_imports import import_meter_readings
+from bititec.readings import parse_month
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert a month's meter readings from a CSV/XLSX/JSON file, matching rows "
+        'to leases by lease_no or machine serial_no a chunk at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--month', required=True, help='Reading month as YYYY-MM.')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Validate only; write nothing.')
+
+    def handle(self, *args, **options):
+        try:
+            month = parse_month(options['month'])
+        except ValueError:
+            raise CommandError('--month must be in YYYY-MM format')
+
+        def progress(report):
+            self.stdout.write(
+                f"{report.total_rows} rows read, {report.written} written, {report.failed} failed"
+            )
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                report = import_meter_readings(
+                    fileobj, options['path'], month,
+                    chunk_size=options['chunk_size'],
+                    dry_run=options['dry_run'],
+                    progress=progress,
+                )
+        except (OSError, InventoryImportError) as e:
+            raise CommandError(str(e)) from e
+
+        for row in report.rows:
+            if row['status'] == 'failed':
+                self.stderr.write(f"Row {row['row']}: {row['errors']}")
+        if report.rows_truncated:
+            self.stderr.write('... more rows not listed')
+
+        counts = report.counts
+        verb = 'would be' if report.dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.total_rows} rows for {month:%Y-%m}: {counts['created']} {verb} created, "
+            f"{counts['updated']} {verb} updated, {counts['unchanged']} unchanged, {counts['failed']} failed"
+        ))
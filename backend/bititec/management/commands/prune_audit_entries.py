@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from bititec.audit import merge_changes
+from bititec.models import AuditEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Apply the audit retention policy: merge each object\'s older updates into '
+        'one compacted entry, and delete entries past the retention period in batches.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compact-days', type=int,
+            help='Merge the updates of each object older than this many days into one entry.'
+        )
+        parser.add_argument(
+            '--retention-days', type=int,
+            help='Delete entries older than this many days.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['compact_days'] is None and options['retention_days'] is None:
+            raise CommandError('Pass --compact-days and/or --retention-days')
+        now = timezone.now()
+
+        if options['compact_days'] is not None:
+            compacted = self.compact(now - timedelta(days=options['compact_days']))
+            self.stdout.write(f'Compacted the history of {compacted} objects')
+
+        if options['retention_days'] is not None:
+            deleted = self.prune(now - timedelta(days=options['retention_days']), options['batch_size'])
+            self.stdout.write(f'Deleted {deleted} audit entries')
+
+        self.stdout.write(self.style.SUCCESS('Audit retention applied'))
+
+    def compact(self, cutoff):
+        updates = AuditEntry.objects.filter(created_at__lt=cutoff, action__in=['updated', 'compacted'])
+        objects = updates.order_by().values_list('object_type', 'object_id').annotate(
+            entries=Count('id')
+        ).filter(entries__gt=1)
+
+        compacted = 0
+        for object_type, object_id, _ in objects.iterator():
+            with transaction.atomic():
+                entries = list(updates.filter(object_type=object_type, object_id=object_id).order_by('created_at', 'id'))
+                changes = {}
+                for entry in entries:
+                    merge_changes(changes, entry.changes)
+                actors = {entry.actor_id for entry in entries}
+                AuditEntry.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+                AuditEntry.objects.create(
+                    object_type=object_type, object_id=object_id, action='compacted', changes=changes,
+                    actor_id=actors.pop() if len(actors) == 1 else None, created_at=entries[-1].created_at,
+                )
+            compacted += 1
+        return compacted
+
+    def prune(self, cutoff, batch_size):
+        stale = AuditEntry.objects.filter(created_at__lt=cutoff)
+        deleted = 0
+        while True:
+            ids = list(stale.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += AuditEntry.objects.filter(pk__in=ids).delete()[0]
+        return deleted
@@ -0,0 +1,34 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from bititec.models import ServiceCallToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete expired and used service-call access tokens in batches, '
+        'so the sweep never holds long locks on the token table.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace-hours', type=int, default=0,
+            help='Keep tokens that expired less than this many hours ago.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        stale = ServiceCallToken.objects.filter(Q(expires_at__lt=cutoff) | Q(is_used=True))
+
+        deleted = 0
+        while True:
+            ids = list(stale.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += ServiceCallToken.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} service-call tokens'))
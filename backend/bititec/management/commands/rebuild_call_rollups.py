@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from bititec.call_rollups import rollup_rows
+from bititec.models import Call, CallRollup
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the service-call analytics rollups from the Call table, one '
+        'month at a time so each rebuild only locks that month\'s buckets.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        months = Call.objects.annotate(month=TruncMonth('created_at')).order_by('month').values_list(
+            'month', flat=True
+        ).distinct()
+
+        total = 0
+        rebuilt = set()
+        for month in months:
+            month = month.date().replace(day=1)
+            if month in rebuilt:
+                continue
+            rebuilt.add(month)
+            start, end = self.month_bounds(month)
+            calls = Call.objects.filter(created_at__gte=start, created_at__lt=end).order_by().values_list(
+                'created_at', 'department', 'client_id', 'item_id', 'status', 'completed_at'
+            )
+            with transaction.atomic():
+                CallRollup.objects.filter(month=month).delete()
+                rollups = CallRollup.objects.bulk_create(
+                    rollup_rows(calls.iterator(chunk_size=chunk_size)), batch_size=chunk_size
+                )
+            total += len(rollups)
+            self.stdout.write(f'{month:%Y-%m}: {len(rollups)} buckets')
+
+        stale = CallRollup.objects.exclude(month__in=rebuilt).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} call rollups, removed {stale} stale'))
+
+    def month_bounds(self, month):
+        start = timezone.make_aware(datetime.datetime.combine(month, datetime.time.min))
+        following = (month + datetime.timedelta(days=32)).replace(day=1)
+        end = timezone.make_aware(datetime.datetime.combine(following, datetime.time.min))
+        return start, end
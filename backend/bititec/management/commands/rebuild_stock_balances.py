@@ -0,0 +1,115 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from bititec.importers import chunked
+from bititec.inventory import (
+    ITEM_TYPES, LEASE_REASONS, OPENING_SOURCE, SALE_REASONS, expected_on_hand, stored_totals,
+)
+from bititec.models import Accessory, Machine, Part, StockBalance, StockMovement
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild StockBalance rows from the StockMovement ledger with one grouped '
+        'query per item type, then check them against the stored quantity columns.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', action='store_true',
+            help='Append an opening Receipt movement for items that have no ledger history yet.'
+        )
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help='Do not write balances; only report differences.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        mismatches = 0
+
+        for model, field in ((Machine, 'machine'), (Part, 'part'), (Accessory, 'accessory')):
+            if options['seed'] and not options['check_only']:
+                seeded = self.seed_opening_movements(model, field, batch_size)
+                self.stdout.write(f'{ITEM_TYPES[field]}: seeded {seeded} opening movements')
+
+            if not options['check_only']:
+                rebuilt = self.rebuild_balances(field, batch_size)
+                self.stdout.write(f'{ITEM_TYPES[field]}: rebuilt {rebuilt} balances')
+
+            mismatches += self.check_balances(model, field)
+
+        if mismatches:
+            raise CommandError(f'{mismatches} items disagree with their stored quantity')
+        self.stdout.write(self.style.SUCCESS('Stock ledger matches stored quantities'))
+
+    def seed_opening_movements(self, model, field, batch_size):
+        """Open the ledger of items without history at their stored stock and leased / sold totals"""
+        pks = model.objects.filter(stock_movements__isnull=True).values_list('pk', flat=True)
+
+        seeded = 0
+        for batch in chunked(pks.iterator(chunk_size=batch_size), batch_size):
+            store_ids = dict(model.objects.filter(pk__in=batch).values_list('pk', 'store_id'))
+            movements = [
+                StockMovement(
+                    item_type=ITEM_TYPES[field], store_id=store_ids[pk], delta=on_hand, reason='Receipt',
+                    source_type=OPENING_SOURCE, on_hand_after=on_hand, leased_after=leased, sold_after=sold,
+                    **{f'{field}_id': pk}
+                )
+                for pk, (on_hand, leased, sold) in stored_totals(model, batch).items()
+            ]
+            seeded += self.flush(movements)
+        return seeded
+
+    def flush(self, movements):
+        count = len(movements)
+        if count:
+            StockMovement.objects.bulk_create(movements)
+            movements.clear()
+        return count
+
+    def rebuild_balances(self, field, batch_size):
+        totals = StockMovement.objects.filter(**{f'{field}__isnull': False}).order_by().values(field).annotate(
+            on_hand=Sum('delta'),
+            # Totals from before the ledger ride on the opening movement
+            sold=Coalesce(-Sum('delta', filter=Q(reason__in=SALE_REASONS)), 0)
+            + Coalesce(Sum('sold_after', filter=Q(source_type=OPENING_SOURCE)), 0),
+            leased=Coalesce(-Sum('delta', filter=Q(reason__in=LEASE_REASONS)), 0)
+            + Coalesce(Sum('leased_after', filter=Q(source_type=OPENING_SOURCE)), 0),
+        )
+
+        balances = [
+            StockBalance(
+                item_type=ITEM_TYPES[field], on_hand=row['on_hand'],
+                leased=row['leased'], sold=row['sold'], **{f'{field}_id': row[field]}
+            )
+            for row in totals
+        ]
+        with transaction.atomic():
+            StockBalance.objects.bulk_create(
+                balances,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=[field],
+                update_fields=['on_hand', 'leased', 'sold', 'updated_at'],
+            )
+        return len(balances)
+
+    def check_balances(self, model, field):
+        differences = model.objects.annotate(
+            expected=expected_on_hand(model),
+            ledger=F('stock_balance__on_hand'),
+        ).filter(
+            Q(ledger__isnull=True) | ~Q(ledger=F('expected'))
+        ).values_list('pk', 'expected', 'ledger')
+
+        count = 0
+        for pk, expected, ledger in differences.iterator():
+            count += 1
+            self.stdout.write(self.style.WARNING(
+                f'{ITEM_TYPES[field]} {pk}: stored {expected}, ledger {"missing" if ledger is None else ledger}'
+            ))
+        return count
@@ -0,0 +1,47 @@
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bititec.billing import BILLING_BATCH_SIZE, FLAGS, run_billing
+from bititec.readings import month_start, parse_month
+
+
+class Command(BaseCommand):
+    help = (
+        'Bill every active lease for a month from its meter readings and inquiries, '
+        'storing the result as a billing run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to bill as YYYY-MM (default: last month).')
+        parser.add_argument('--copy-rate', help='Price per copy (default: BILLING_COPY_RATE).')
+        parser.add_argument('--myq-fee', help='Monthly MyQ fee (default: BILLING_MYQ_FEE).')
+        parser.add_argument('--vat-rate', help='VAT rate, e.g. 0.16 (default: BILLING_VAT_RATE).')
+        parser.add_argument('--batch-size', type=int, default=BILLING_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                month = parse_month(options['month'])
+            except ValueError:
+                raise CommandError('--month must be in YYYY-MM format')
+        else:
+            month = month_start(timezone.localdate()) - relativedelta(months=1)
+
+        def progress(run):
+            self.stdout.write(f'{run.lease_count} leases billed, {run.flagged_count} flagged')
+
+        rates = {
+            name: options[name] for name in ('copy_rate', 'myq_fee', 'vat_rate') if options[name] is not None
+        }
+        try:
+            run = run_billing(month, batch_size=options['batch_size'], progress=progress, **rates)
+        except ArithmeticError as e:  # decimal.InvalidOperation for a malformed rate
+            raise CommandError(f'Invalid rate: {e}') from e
+
+        for line in run.lines.exclude(flags=[]).order_by('lease_no'):
+            self.stderr.write(f"{line.lease_no}: {', '.join(FLAGS[flag] for flag in line.flags)}")
+        self.stdout.write(self.style.SUCCESS(
+            f'Billing run {run.pk} for {month:%Y-%m}: {run.lease_count} leases, {run.flagged_count} flagged, '
+            f'{run.total_usage} copies, total {run.total_amount}'
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from bititec.lease_lifecycle import EXPIRY_WINDOWS, expire_leases, expired_leases, expiry_counts, upcoming_expiries
+
+
+class Command(BaseCommand):
+    help = (
+        'Deactivate leases whose end date has passed (safe to run repeatedly) '
+        'and report the leases ending in the next 30/60/90 days.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Count expired leases; change nothing.')
+        parser.add_argument(
+            '--list', action='store_true', help='List every lease ending in the next 90 days.'
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f'{expired_leases().count()} expired leases would be deactivated')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Deactivated {expire_leases()} expired leases'))
+
+        if options['list']:
+            for row in upcoming_expiries():
+                self.stdout.write(
+                    f"{row['to_date']} ({row['days_left']} days) {row['lease_no']} "
+                    f"{row['client__client_name']} - {row['item__machine_name']} {row['item__serial_no']}"
+                )
+        counts = expiry_counts()
+        self.stdout.write(', '.join(f'{counts[window]} ending within {window} days' for window in EXPIRY_WINDOWS))
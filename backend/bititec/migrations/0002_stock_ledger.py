@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:14
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_type', models.CharField(choices=[('Machine', 'Machine'), ('Part', 'Part'), ('Accessory', 'Accessory')], max_length=20)),
+                ('on_hand', models.IntegerField(default=0)),
+                ('leased', models.IntegerField(default=0)),
+                ('sold', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('accessory', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_balance', to='bititec.accessory')),
+                ('machine', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_balance', to='bititec.machine')),
+                ('part', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_balance', to='bititec.part')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('item_type', models.CharField(choices=[('Machine', 'Machine'), ('Part', 'Part'), ('Accessory', 'Accessory')], max_length=20)),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('Receipt', 'Receipt'), ('Adjustment', 'Adjustment'), ('Sale', 'Sale'), ('Sale Return', 'Sale Return'), ('Lease Issue', 'Lease Issue'), ('Lease Return', 'Lease Return')], max_length=20)),
+                ('source_type', models.CharField(blank=True, max_length=50)),
+                ('source_id', models.CharField(blank=True, max_length=64)),
+                ('on_hand_after', models.IntegerField()),
+                ('leased_after', models.IntegerField()),
+                ('sold_after', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('accessory', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='bititec.accessory')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to=settings.AUTH_USER_MODEL)),
+                ('machine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='bititec.machine')),
+                ('part', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='bititec.part')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='bititec.store')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['machine', 'created_at'], name='stockmove_machine_at_idx'), models.Index(fields=['part', 'created_at'], name='stockmove_part_at_idx'), models.Index(fields=['accessory', 'created_at'], name='stockmove_accessory_at_idx'), models.Index(fields=['source_type', 'source_id'], name='stockmove_source_idx')],
+            },
+        ),
+    ]
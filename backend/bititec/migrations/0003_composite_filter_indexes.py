@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0002_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='accessory',
+            index=models.Index(fields=['store', 'acc_status', 'created_at'], name='acc_store_status_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='call',
+            index=models.Index(fields=['status', 'created_at'], name='call_status_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['store', 'machine_status', 'created_at'], name='machine_store_status_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='part',
+            index=models.Index(fields=['store', 'part_status', 'created_at'], name='part_store_status_at_idx'),
+        ),
+    ]
@@ -0,0 +1,121 @@
+"""
+Text indexes for the inventory search endpoint.
+
+Postgres gets pg_trgm GIN indexes over UPPER(column), which is the expression
+Django's icontains compiles to. SQLite (the DEBUG configuration) gets an FTS5
+trigram table kept in sync by triggers; it is skipped when the SQLite build has
+no FTS5/trigram support and search falls back to icontains.
+"""
+from django.db import DatabaseError, migrations, transaction
+
+SEARCH_COLUMNS = {
+    'machine': ('bititec_machine', ['machine_name', 'machine_brand', 'machine_type', 'serial_no']),
+    'part': ('bititec_part', ['part_name', 'part_brand', 'part_type', 'ref_no']),
+    'accessory': ('bititec_accessory', ['acc_name', 'acc_brand', 'acc_type', 'ref_no']),
+}
+
+FTS_TABLE = 'bititec_inventory_fts'
+
+
+def trigram_index_name(table, column):
+    return f'{table}_{column}_trgm'[:63]
+
+
+def fts_body(alias, columns):
+    return " || ' ' || ".join(f"COALESCE({alias}.{column}, '')" for column in columns)
+
+
+def postgres_forwards(cursor):
+    try:
+        with transaction.atomic(using=cursor.db.alias):
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        return  # The role may not be allowed to create extensions; search falls back to scans
+    for table, columns in SEARCH_COLUMNS.values():
+        for column in columns:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {trigram_index_name(table, column)} '
+                f'ON {table} USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+            )
+
+
+def postgres_backwards(cursor):
+    for table, columns in SEARCH_COLUMNS.values():
+        for column in columns:
+            cursor.execute(f'DROP INDEX IF EXISTS {trigram_index_name(table, column)}')
+
+
+def sqlite_forwards(cursor):
+    try:
+        with transaction.atomic(using=cursor.db.alias):
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(item_type UNINDEXED, item_id UNINDEXED, body, tokenize='trigram')"
+            )
+    except DatabaseError:
+        return  # No FTS5 / trigram tokenizer in this SQLite build
+
+    for item_type in SEARCH_COLUMNS:
+        sqlite_index_table(cursor, item_type)
+
+
+def sqlite_index_table(cursor, item_type):
+    """
+    Create the sync triggers for one item table and (re)load its FTS rows.
+    Later migrations that rebuild the table on SQLite, which drops its
+    triggers, call this again.
+    """
+    table, columns = SEARCH_COLUMNS[item_type]
+    insert = (
+        f"INSERT INTO {FTS_TABLE}(item_type, item_id, body) "
+        f"VALUES ('{item_type}', NEW.id, {fts_body('NEW', columns)});"
+    )
+    delete = f"DELETE FROM {FTS_TABLE} WHERE item_type = '{item_type}' AND item_id = OLD.id;"
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN {insert} END')
+    cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN {delete} END')
+    # Only edits of the searched columns re-index; quantity/status updates stay cheap
+    cursor.execute(
+        f'CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF {", ".join(columns)} ON {table} '
+        f'BEGIN {delete} {insert} END'
+    )
+    cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE item_type = '{item_type}'")
+    cursor.execute(
+        f"INSERT INTO {FTS_TABLE}(item_type, item_id, body) "
+        f"SELECT '{item_type}', t.id, {fts_body('t', columns)} FROM {table} t"
+    )
+
+
+def sqlite_backwards(cursor):
+    for table, _ in SEARCH_COLUMNS.values():
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+    cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def forwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            postgres_forwards(cursor)
+        elif vendor == 'sqlite':
+            sqlite_forwards(cursor)
+
+
+def backwards(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            postgres_backwards(cursor)
+        elif vendor == 'sqlite':
+            sqlite_backwards(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0003_composite_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0006_document_sequences'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicecalltoken',
+            index=models.Index(fields=['expires_at'], name='call_token_expires_at_idx'),
+        ),
+    ]
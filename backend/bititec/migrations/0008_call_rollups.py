@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_completed_at(apps, schema_editor):
+    # The last update of a completed call is the closest record of when it was completed
+    Call = apps.get_model('bititec', 'Call')
+    Call.objects.filter(status='Complete', completed_at__isnull=True).update(completed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0007_service_call_token_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='call',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='CallRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=255, unique=True)),
+                ('month', models.DateField()),
+                ('department', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('Open', 'Open'), ('Pending', 'Pending'), ('In Progress', 'In Progress'), ('Complete', 'Complete')], max_length=20)),
+                ('call_count', models.IntegerField(default=0)),
+                ('resolved_count', models.IntegerField(default=0)),
+                ('resolution_seconds', models.BigIntegerField(default=0)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='call_rollups', to='bititec.client')),
+                ('machine', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='call_rollups', to='bititec.machine')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['month', 'status'], name='call_rollup_month_status_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:45
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0008_call_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallPartUsage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('Required', 'Required'), ('Used', 'Used')], max_length=10)),
+                ('position', models.PositiveIntegerField()),
+                ('ref_no', models.CharField(blank=True, max_length=255)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('call', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='part_usages', to='bititec.call')),
+                ('part', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='call_usages', to='bititec.part')),
+            ],
+            options={
+                'ordering': ['call', 'kind', 'position'],
+                'indexes': [models.Index(fields=['part', 'kind'], name='call_part_usage_part_idx'), models.Index(fields=['ref_no', 'kind'], name='call_part_usage_ref_idx')],
+            },
+        ),
+    ]
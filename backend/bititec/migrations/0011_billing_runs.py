@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:59
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0010_audit_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField()),
+                ('copy_rate', models.DecimalField(decimal_places=4, max_digits=10)),
+                ('myq_fee', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('vat_rate', models.DecimalField(decimal_places=4, max_digits=5)),
+                ('lease_count', models.PositiveIntegerField(default=0)),
+                ('flagged_count', models.PositiveIntegerField(default=0)),
+                ('total_usage', models.BigIntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='billing_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BillingLine',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('lease_no', models.CharField(max_length=50)),
+                ('client_name', models.CharField(max_length=255)),
+                ('serial_no', models.CharField(blank=True, max_length=255)),
+                ('previous_month', models.DateField(blank=True, null=True)),
+                ('previous_reading', models.PositiveIntegerField(blank=True, null=True)),
+                ('current_reading', models.PositiveIntegerField(blank=True, null=True)),
+                ('usage', models.PositiveIntegerField(default=0)),
+                ('flags', models.JSONField(default=list)),
+                ('usage_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('myq_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('vat', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('parts_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('parts_vat', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('accessories_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('accessories_vat', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('lease', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='billing_lines', to='bititec.leasecontract')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='bititec.billingrun')),
+            ],
+            options={
+                'ordering': ['run', 'lease_no'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='billingrun',
+            index=models.Index(fields=['month', 'created_at'], name='billing_run_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='billingline',
+            index=models.Index(fields=['run', 'lease_no'], name='billing_line_run_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='billingline',
+            index=models.Index(fields=['lease', 'run'], name='billing_line_lease_idx'),
+        ),
+    ]
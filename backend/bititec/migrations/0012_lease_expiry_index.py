@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0011_billing_runs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leasecontract',
+            index=models.Index(fields=['is_active', 'to_date'], name='lease_active_to_date_idx'),
+        ),
+    ]
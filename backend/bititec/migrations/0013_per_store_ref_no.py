@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:13
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+# The AlterField / AddConstraint steps rebuild both tables on SQLite, dropping
+# the FTS5 sync triggers 0004_inventory_search_indexes put on them
+inventory_search = import_module('bititec.migrations.0004_inventory_search_indexes')
+
+
+def restore_search_triggers(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or inventory_search.FTS_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        for item_type in ('part', 'accessory'):
+            inventory_search.sqlite_index_table(cursor, item_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bititec', '0012_lease_expiry_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accessory',
+            name='ref_no',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='part',
+            name='ref_no',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='accessory',
+            constraint=models.UniqueConstraint(fields=('ref_no', 'store'), name='acc_ref_no_store_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='part',
+            constraint=models.UniqueConstraint(fields=('ref_no', 'store'), name='part_ref_no_store_uniq'),
+        ),
+        migrations.RunPython(restore_search_triggers, migrations.RunPython.noop),
+    ]
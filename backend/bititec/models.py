@@ -1,11 +1,11 @@
 import os
-import random
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 import uuid
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
 
 class CustomUserManager(BaseUserManager):
@@ -148,7 +148,44 @@ class Client(models.Model):
     def __str__(self):
         return f"{self.client_name} - {self.client_location}"
 
-class Machine(models.Model):
+def _quantity_total(queryset, field):
+    """Correlated SUM(quantity) subquery over ``queryset`` keyed on ``field``."""
+    totals = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        total=Sum('quantity')
+    ).values('total')
+    return Coalesce(Subquery(totals), 0, output_field=models.IntegerField())
+
+class PartQuerySet(models.QuerySet):
+    def with_stock_figures(self):
+        """Annotate leased_total and sold_total so list views avoid per-row aggregates"""
+        return self.annotate(
+            leased_total=_quantity_total(LeasePartInquiry.objects.all(), 'part'),
+            sold_total=_quantity_total(SaleItem.objects.all(), 'part'),
+        )
+
+class AccessoryQuerySet(models.QuerySet):
+    def with_stock_figures(self):
+        """Annotate leased_total and sold_total so list views avoid per-row aggregates"""
+        return self.annotate(
+            leased_total=_quantity_total(LeaseAccInquiry.objects.all(), 'accessory'),
+            sold_total=_quantity_total(SaleItem.objects.all(), 'accessory'),
+        )
+
+class StockLedgerMixin:
+    """Ledger-backed stock lookups shared by Machine, Part and Accessory"""
+
+    def get_stock_balance(self):
+        """Running balance row for this item, or None before its first movement"""
+        try:
+            return self.stock_balance
+        except StockBalance.DoesNotExist:
+            return None
+
+    def stock_as_of(self, when):
+        """Latest ledger movement at or before ``when`` (its *_after columns hold the balances)"""
+        return self.stock_movements.filter(created_at__lte=when).order_by('-created_at').first()
+
+class Machine(StockLedgerMixin, models.Model):
     MACHINE_CONDITION_CHOICES = [
         ('New', 'New'),
         ('Used', 'Used'),
@@ -191,8 +228,11 @@ class Machine(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['store', 'machine_status', 'created_at'], name='machine_store_status_at_idx'),
+        ]
 
-class Part(models.Model):
+class Part(StockLedgerMixin, models.Model):
     PART_CONDITION_CHOICES = [
         ('New', 'New'),
         ('Used', 'Used'),
@@ -210,7 +250,7 @@ class Part(models.Model):
     part_name = models.CharField(max_length=255)  
     part_brand = models.CharField(max_length=255)  
     part_type = models.CharField(max_length=255)  
-    ref_no = models.CharField(max_length=255, unique=True)  
+    ref_no = models.CharField(max_length=255)  # Unique per store; a transfer stocks the same ref_no elsewhere
     unit_value = models.PositiveIntegerField()
     intial_quantity = models.PositiveIntegerField()
     quantity = models.PositiveIntegerField()
@@ -223,6 +263,8 @@ class Part(models.Model):
     part_status = models.CharField(max_length=20, choices=PART_STATUS_CHOICES)
     is_transfer = models.BooleanField(default=False)
 
+    objects = PartQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.part_name} - {self.ref_no}"
 
@@ -236,22 +278,37 @@ class Part(models.Model):
     
     def leased_quantity(self):
         """Get the total quantity of this part that is leased"""
-        result = self.leasepartinquiry_set.aggregate(total=Sum('initial_quantity'))
+        balance = self.get_stock_balance()
+        if balance is not None:
+            return balance.leased
+        result = self.leasepartinquiry_set.aggregate(total=Sum('quantity'))
         return result['total'] or 0
     
     def sold_quantity(self):
         """Get the total quantity of this part that is sold"""
-        result = SaleItem.objects.filter(part=self).aggregate(total=Sum('initial_quantity'))
+        balance = self.get_stock_balance()
+        if balance is not None:
+            return balance.sold
+        result = SaleItem.objects.filter(part=self).aggregate(total=Sum('quantity'))
         return result['total'] or 0
     
     def available_quantity(self):
         """Get the quantity available"""
+        balance = self.get_stock_balance()
+        if balance is not None:
+            return balance.on_hand
         return self.intial_quantity - self.leased_quantity() - self.sold_quantity()
 
     class Meta:
         ordering = ['-created_at']
-
-class Accessory(models.Model):
+        indexes = [
+            models.Index(fields=['store', 'part_status', 'created_at'], name='part_store_status_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['ref_no', 'store'], name='part_ref_no_store_uniq'),
+        ]
+
+class Accessory(StockLedgerMixin, models.Model):
     ACCESSORY_CONDITION_CHOICES = [
         ('New', 'New'),
         ('Used', 'Used'),
@@ -269,7 +326,7 @@ class Accessory(models.Model):
     acc_name = models.CharField(max_length=255)
     acc_brand = models.CharField(max_length=255)
     acc_type = models.CharField(max_length=255)
-    ref_no = models.CharField(max_length=255, unique=True)
+    ref_no = models.CharField(max_length=255)  # Unique per store, like Part.ref_no
     unit_value = models.PositiveIntegerField()
     intial_quantity = models.PositiveIntegerField()
     quantity = models.PositiveIntegerField()
@@ -282,6 +339,8 @@ class Accessory(models.Model):
     acc_status = models.CharField(max_length=20, choices=ACCESSORY_STATUS_CHOICES)
     is_transfer = models.BooleanField(default=False)
 
+    objects = AccessoryQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.acc_name} - {self.ref_no}"
 
@@ -294,21 +353,36 @@ class Accessory(models.Model):
         return str(self.store.id)
     
     def leased_quantity(self):
-        """Get the total quantity of this part that is leased"""
-        result = self.leaseaccinquiry_set.aggregate(total=Sum('initial_quantity'))
+        """Get the total quantity of this accessory that is leased"""
+        balance = self.get_stock_balance()
+        if balance is not None:
+            return balance.leased
+        result = self.leaseaccinquiry_set.aggregate(total=Sum('quantity'))
         return result['total'] or 0
     
     def sold_quantity(self):
-        """Get the total quantity of this part that is sold"""
-        result = SaleItem.objects.filter(accessory=self).aggregate(total=Sum('Initial_quantity'))
+        """Get the total quantity of this accessory that is sold"""
+        balance = self.get_stock_balance()
+        if balance is not None:
+            return balance.sold
+        result = SaleItem.objects.filter(accessory=self).aggregate(total=Sum('quantity'))
         return result['total'] or 0
     
     def available_quantity(self):
         """Get the quantity available"""
+        balance = self.get_stock_balance()
+        if balance is not None:
+            return balance.on_hand
         return self.intial_quantity - self.leased_quantity() - self.sold_quantity()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['store', 'acc_status', 'created_at'], name='acc_store_status_at_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['ref_no', 'store'], name='acc_ref_no_store_uniq'),
+        ]
 
 class ClientMachine(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -358,6 +432,12 @@ class Call(models.Model):
     walk_in_machine_name = models.CharField(max_length=255, blank=True)
     walk_in_machine_type = models.CharField(max_length=255, blank=True)
     walk_in_serial_no = models.CharField(max_length=255, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='call_status_created_at_idx'),
+        ]
 
     def __str__(self):
         if self.client:
@@ -368,12 +448,20 @@ class Call(models.Model):
     def save(self, *args, **kwargs):
         if not self.ticket_no:
             self.ticket_no = self.generate_ticket_number()
+        # completed_at follows the status so resolution times can be rolled up
+        if self.status == 'Complete' and self.completed_at is None:
+            self.completed_at = timezone.now()
+        elif self.status != 'Complete':
+            self.completed_at = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'completed_at'}
         super().save(*args, **kwargs)
 
     def generate_ticket_number(self):
-        now = timezone.now()
-        random_num = random.randint(10000, 99999)
-        return f"TN-{now.month:02d}/{now.strftime('%y')}/{random_num}"
+        from .numbering import next_document_number
+
+        return next_document_number(type(self), 'ticket_no', 'TN')
     
 class StoreInquiry(models.Model):
     STATUS_CHOICES = [
@@ -408,6 +496,12 @@ class ServiceCallToken(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_used = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # purge_service_call_tokens sweeps by expiry
+            models.Index(fields=['expires_at'], name='call_token_expires_at_idx'),
+        ]
     
     def is_valid(self):
         """Check if the token is valid (not expired and not used)"""
@@ -445,6 +539,12 @@ class LeaseContract(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     store = models.ForeignKey(Store, on_delete=models.PROTECT)
 
+    class Meta:
+        indexes = [
+            # Active-lease filters and the expiry sweep (lease_lifecycle.py)
+            models.Index(fields=['is_active', 'to_date'], name='lease_active_to_date_idx'),
+        ]
+
     def __str__(self):
         return f"{self.lease_no} - {self.client.client_name}"
 
@@ -454,9 +554,9 @@ class LeaseContract(models.Model):
         super().save(*args, **kwargs)
 
     def generate_lease_number(self):
-        now = timezone.now()
-        random_num = random.randint(10000, 99999)
-        return f"LN-{now.month:02d}/{now.strftime('%y')}/{random_num}"
+        from .numbering import next_document_number
+
+        return next_document_number(type(self), 'lease_no', 'LN')
 
 class SaleItem(models.Model):
     SALE_TYPE_CHOICES = [
@@ -476,23 +576,36 @@ class SaleItem(models.Model):
     custom_item = models.JSONField(null=True, blank=True)
 
     def save(self, *args, **kwargs):
+        from .inventory import InsufficientStock, consume_stock, release_stock
+
         self.total_price = self.unit_price * self.quantity
-        super().save(*args, **kwargs)
-        
-        # Update inventory
-        if self.sale_type == 'Machine' and self.machine:
-            self.machine.machine_status = 'Sold'
-            self.machine.save()
-        elif self.sale_type == 'Part' and self.part:
-            self.part.quantity -= self.quantity
-            if self.part.quantity <= 0:
-                self.part.part_status = 'Out of Stock'
-            self.part.save()
-        elif self.sale_type == 'Accessory' and self.accessory:
-            self.accessory.quantity -= self.quantity
-            if self.accessory.quantity <= 0:
-                self.accessory.acc_status = 'Out of Stock'
-            self.accessory.save()
+        previous_quantity = 0
+        if not self._state.adding:
+            previous_quantity = SaleItem.objects.filter(pk=self.pk).values_list('quantity', flat=True).first() or 0
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # Update inventory by the quantity this save adds (or gives back)
+            delta = self.quantity - previous_quantity
+            item = self.stock_item
+            if not delta or item is None:
+                return
+            if delta < 0:
+                release_stock(item, -delta, 'Sale Return', source=self)
+            elif not consume_stock(item, delta, 'Sale', source=self):
+                raise InsufficientStock(f"Insufficient stock for {item}")
+
+    @property
+    def stock_item(self):
+        """The Machine, Part or Accessory this line takes out of stock"""
+        if self.sale_type == 'Machine':
+            return self.machine
+        if self.sale_type == 'Part':
+            return self.part
+        if self.sale_type == 'Accessory':
+            return self.accessory
+        return None
 
 class Sale(models.Model):
     SALE_TYPE_CHOICES = [
@@ -518,9 +631,9 @@ class Sale(models.Model):
         super().save(*args, **kwargs)
 
     def generate_sale_number(self):
-        now = timezone.now()
-        random_num = random.randint(10000, 99999)
-        return f"SN-{now.month:02d}/{now.strftime('%y')}/{random_num}"
+        from .numbering import next_document_number
+
+        return next_document_number(type(self), 'sale_no', 'SN')
     
 class Delivery(models.Model):
     DELIVERY_TYPE_CHOICES = [
@@ -557,9 +670,9 @@ class Delivery(models.Model):
         super().save(*args, **kwargs)
 
     def generate_delivery_number(self):
-        now = timezone.now()
-        random_num = random.randint(10000, 99999)
-        return f"DN-{now.month:02d}/{now.strftime('%y')}/{random_num}"
+        from .numbering import next_document_number
+
+        return next_document_number(type(self), 'delivery_no', 'DN')
 
     @property
     def client_name(self):
@@ -702,4 +815,270 @@ class MeterReading(models.Model):
         ordering = ['-month']
 
     def __str__(self):
-        return f"{self.lease.lease_no} - {self.month.strftime('%b %Y')}"
\ No newline at end of file
+        return f"{self.lease.lease_no} - {self.month.strftime('%b %Y')}"
+
+class StockMovement(models.Model):
+    ITEM_TYPE_CHOICES = [
+        ('Machine', 'Machine'),
+        ('Part', 'Part'),
+        ('Accessory', 'Accessory'),
+    ]
+
+    REASON_CHOICES = [
+        ('Receipt', 'Receipt'),
+        ('Adjustment', 'Adjustment'),
+        ('Sale', 'Sale'),
+        ('Sale Return', 'Sale Return'),
+        ('Lease Issue', 'Lease Issue'),
+        ('Lease Return', 'Lease Return'),
+        ('Transfer Out', 'Transfer Out'),
+        ('Transfer In', 'Transfer In'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    item_type = models.CharField(max_length=20, choices=ITEM_TYPE_CHOICES)
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_movements')
+    part = models.ForeignKey(Part, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_movements')
+    accessory = models.ForeignKey(Accessory, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_movements')
+    store = models.ForeignKey(Store, on_delete=models.PROTECT, related_name='stock_movements')
+    delta = models.IntegerField()  # Signed change to the on-hand quantity
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    source_type = models.CharField(max_length=50, blank=True)  # e.g. 'SaleItem', 'LeasePartInquiry'
+    source_id = models.CharField(max_length=64, blank=True)
+    on_hand_after = models.IntegerField()
+    leased_after = models.IntegerField()
+    sold_after = models.IntegerField()
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_movements')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['machine', 'created_at'], name='stockmove_machine_at_idx'),
+            models.Index(fields=['part', 'created_at'], name='stockmove_part_at_idx'),
+            models.Index(fields=['accessory', 'created_at'], name='stockmove_accessory_at_idx'),
+            models.Index(fields=['source_type', 'source_id'], name='stockmove_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_type} {self.reason} {self.delta:+d}"
+
+class StockBalance(models.Model):
+    """Running per-item totals maintained alongside every StockMovement"""
+    item_type = models.CharField(max_length=20, choices=StockMovement.ITEM_TYPE_CHOICES)
+    machine = models.OneToOneField(Machine, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_balance')
+    part = models.OneToOneField(Part, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_balance')
+    accessory = models.OneToOneField(Accessory, on_delete=models.CASCADE, null=True, blank=True, related_name='stock_balance')
+    on_hand = models.IntegerField(default=0)
+    leased = models.IntegerField(default=0)
+    sold = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.item_type} on hand {self.on_hand}"
+
+class StockTransfer(models.Model):
+    """A document moving stock from one store to another in a single operation"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    transfer_no = models.CharField(max_length=50, unique=True)
+    from_store = models.ForeignKey(Store, on_delete=models.PROTECT, related_name='transfers_out')
+    to_store = models.ForeignKey(Store, on_delete=models.PROTECT, related_name='transfers_in')
+    notes = models.TextField(blank=True)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_transfers')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.transfer_no}: {self.from_store.store_name} -> {self.to_store.store_name}"
+
+    def save(self, *args, **kwargs):
+        if not self.transfer_no:
+            self.transfer_no = self.generate_transfer_number()
+        super().save(*args, **kwargs)
+
+    def generate_transfer_number(self):
+        from .numbering import next_document_number
+
+        return next_document_number(type(self), 'transfer_no', 'TR')
+
+class StockTransferLine(models.Model):
+    """
+    One item on a transfer. A whole item changes store; a partial quantity of a
+    part/accessory is added to ``target_part`` / ``target_accessory`` in the
+    destination store.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    transfer = models.ForeignKey(StockTransfer, on_delete=models.CASCADE, related_name='lines')
+    item_type = models.CharField(max_length=20, choices=StockMovement.ITEM_TYPE_CHOICES)
+    machine = models.ForeignKey(Machine, on_delete=models.PROTECT, null=True, blank=True, related_name='transfer_lines')
+    part = models.ForeignKey(Part, on_delete=models.PROTECT, null=True, blank=True, related_name='transfer_lines')
+    accessory = models.ForeignKey(Accessory, on_delete=models.PROTECT, null=True, blank=True, related_name='transfer_lines')
+    target_part = models.ForeignKey(Part, on_delete=models.PROTECT, null=True, blank=True, related_name='transfer_receipts')
+    target_accessory = models.ForeignKey(Accessory, on_delete=models.PROTECT, null=True, blank=True, related_name='transfer_receipts')
+    quantity = models.PositiveIntegerField()
+    is_partial = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.item_type} x{self.quantity}"
+
+
+class DocumentSequence(models.Model):
+    """Last number handed out for a document prefix in one month (see numbering.py)"""
+    prefix = models.CharField(max_length=10)
+    period = models.CharField(max_length=5)  # 'mm/yy', as printed in the document number
+    last_value = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'period'], name='unique_document_sequence')
+        ]
+
+    def __str__(self):
+        return f"{self.prefix}-{self.period}: {self.last_value}"
+
+class CallRollup(models.Model):
+    """
+    Call counts per (month, department, client, machine, status), kept up to
+    date by call_rollups.py. ``month`` is the month the call was opened;
+    resolution totals only accrue on 'Complete' rows.
+    """
+    bucket = models.CharField(max_length=255, unique=True)  # The key below as one string
+    month = models.DateField()
+    department = models.CharField(max_length=100)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, null=True, blank=True, related_name='call_rollups')
+    machine = models.ForeignKey(Machine, on_delete=models.CASCADE, null=True, blank=True, related_name='call_rollups')
+    status = models.CharField(max_length=20, choices=Call.STATUS_CHOICES)
+    call_count = models.IntegerField(default=0)
+    resolved_count = models.IntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['month', 'status'], name='call_rollup_month_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.department} {self.status}: {self.call_count}"
+
+class CallPartUsage(models.Model):
+    """
+    One entry of a call's ``parts_required`` / ``parts_used`` list, linked to
+    the Part whose ref_no it names (see call_parts.py).
+    """
+    KIND_CHOICES = [
+        ('Required', 'Required'),
+        ('Used', 'Used'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    call = models.ForeignKey(Call, on_delete=models.CASCADE, related_name='part_usages')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    position = models.PositiveIntegerField()  # Index in the JSON list
+    part = models.ForeignKey(Part, on_delete=models.SET_NULL, null=True, blank=True, related_name='call_usages')
+    ref_no = models.CharField(max_length=255, blank=True)
+    description = models.CharField(max_length=255, blank=True)
+    quantity = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        ordering = ['call', 'kind', 'position']
+        indexes = [
+            models.Index(fields=['part', 'kind'], name='call_part_usage_part_idx'),
+            models.Index(fields=['ref_no', 'kind'], name='call_part_usage_ref_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.call.ticket_no} {self.kind}: {self.ref_no or self.description} x{self.quantity}"
+
+class AuditEntry(models.Model):
+    """
+    Append-only field-level change record for a Call or Sale, written in
+    batches by audit.py. ``changes`` maps each field to ``[old, new]``.
+    """
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+        ('compacted', 'Compacted'),  # Older updates merged by prune_audit_entries
+    ]
+
+    object_type = models.CharField(max_length=50)
+    object_id = models.UUIDField()
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    changes = models.JSONField(default=dict)
+    actor = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_entries')
+    created_at = models.DateTimeField(default=timezone.now)  # When the change was made, not when it was written
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['object_type', 'object_id', 'created_at'], name='audit_object_idx'),
+            models.Index(fields=['created_at'], name='audit_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_id} {self.action}"
+
+class BillingRun(models.Model):
+    """
+    A stored billing calculation for one month (see billing.py). The rates
+    used are kept on the run so its lines can be read back and explained
+    without recomputing anything.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    month = models.DateField()  # First day of the billed month
+    copy_rate = models.DecimalField(max_digits=10, decimal_places=4)
+    myq_fee = models.DecimalField(max_digits=10, decimal_places=2)
+    vat_rate = models.DecimalField(max_digits=5, decimal_places=4)
+    lease_count = models.PositiveIntegerField(default=0)
+    flagged_count = models.PositiveIntegerField(default=0)
+    total_usage = models.BigIntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='billing_runs')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['month', 'created_at'], name='billing_run_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"Billing {self.month:%Y-%m} ({self.created_at:%Y-%m-%d %H:%M})"
+
+class BillingLine(models.Model):
+    """
+    One lease on a billing run: its two readings, the usage between them, the
+    charges and any ``flags`` that need a look before invoicing. Lease, client
+    and machine details are copied so the line stays as billed.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    run = models.ForeignKey(BillingRun, on_delete=models.CASCADE, related_name='lines')
+    lease = models.ForeignKey(LeaseContract, on_delete=models.SET_NULL, null=True, blank=True, related_name='billing_lines')
+    lease_no = models.CharField(max_length=50)
+    client_name = models.CharField(max_length=255)
+    serial_no = models.CharField(max_length=255, blank=True)
+    previous_month = models.DateField(null=True, blank=True)
+    previous_reading = models.PositiveIntegerField(null=True, blank=True)
+    current_reading = models.PositiveIntegerField(null=True, blank=True)
+    usage = models.PositiveIntegerField(default=0)
+    flags = models.JSONField(default=list)
+    usage_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    myq_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    vat = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    parts_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    parts_vat = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    accessories_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    accessories_vat = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['run', 'lease_no']
+        indexes = [
+            models.Index(fields=['run', 'lease_no'], name='billing_line_run_idx'),
+            models.Index(fields=['lease', 'run'], name='billing_line_lease_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.lease_no} {self.run.month:%Y-%m}: {self.total}"
@@ -0,0 +1,109 @@
+"""
+Document numbers (TN-/LN-/SN-/DN-/TR-mm/yy/nnnnn).
+
+Each prefix has one counter per month in DocumentSequence. A process reserves
+a block of numbers with one locked UPDATE and hands them out from memory, so
+most allocations cost no query at all. Numbers are unique but not gap-free,
+and documents created by different workers are not numbered in creation order.
+
+A block reserved inside a transaction is only shared with other callers once
+that transaction commits; if it rolls back, the counter rolls back with it and
+the rest of the block is dropped. The first block of a month starts after the
+highest number already used for that prefix, so older random numbers do not
+collide.
+"""
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Length
+from django.utils import timezone
+
+BLOCK_SIZE = getattr(settings, 'DOCUMENT_NUMBER_BLOCK_SIZE', 50)
+
+
+def document_period(when=None):
+    when = when or timezone.now()
+    return f"{when.month:02d}/{when.strftime('%y')}"
+
+
+def format_document_number(prefix, period, value):
+    return f"{prefix}-{period}/{value:05d}"
+
+
+def highest_existing_number(model, field, prefix, period):
+    """Largest numeric suffix already stored in ``model.field`` for the prefix and month"""
+    start = f"{prefix}-{period}/"
+    # Longer suffixes are larger numbers; compare by length first, then text
+    latest = model._base_manager.filter(**{f'{field}__startswith': start}).annotate(
+        number_length=Length(field)
+    ).order_by('-number_length', f'-{field}').values_list(field, flat=True).first()
+    if latest is None:
+        return 0
+    try:
+        return int(latest[len(start):])
+    except ValueError:
+        return 0
+
+
+def reserve_block(model, field, prefix, period, size):
+    """Move the counter on by ``size`` and return the (first, last) numbers reserved"""
+    from .models import DocumentSequence
+
+    with transaction.atomic():
+        sequence = DocumentSequence.objects.select_for_update().filter(prefix=prefix, period=period).first()
+        if sequence is None:
+            DocumentSequence.objects.get_or_create(
+                prefix=prefix, period=period,
+                defaults={'last_value': highest_existing_number(model, field, prefix, period)}
+            )
+            sequence = DocumentSequence.objects.select_for_update().get(prefix=prefix, period=period)
+        first = sequence.last_value + 1
+        sequence.last_value += size
+        sequence.save(update_fields=['last_value', 'updated_at'])
+    return first, sequence.last_value
+
+
+class DocumentNumberAllocator:
+    """Per-process pool of reserved number blocks, keyed by (prefix, period)"""
+
+    def __init__(self, block_size=BLOCK_SIZE):
+        self.block_size = block_size
+        self.blocks = {}
+        self.lock = threading.Lock()
+
+    def release_block(self, key, first, last):
+        with self.lock:
+            self.blocks.setdefault(key, []).append([first, last])
+
+    def take(self, key):
+        blocks = self.blocks.get(key)
+        while blocks:
+            block = blocks[0]
+            if block[0] <= block[1]:
+                value = block[0]
+                block[0] += 1
+                return value
+            blocks.pop(0)
+        return None
+
+    def allocate(self, model, field, prefix, when=None):
+        period = document_period(when)
+        key = (prefix, period)
+        with self.lock:
+            value = self.take(key)
+        if value is not None:
+            return format_document_number(prefix, period, value)
+
+        first, last = reserve_block(model, field, prefix, period, self.block_size)
+        if first < last:
+            # Not usable by anyone else until the reservation is committed
+            transaction.on_commit(lambda: self.release_block(key, first + 1, last))
+        return format_document_number(prefix, period, first)
+
+
+allocator = DocumentNumberAllocator()
+
+
+def next_document_number(model, field, prefix, when=None):
+    return allocator.allocate(model, field, prefix, when)
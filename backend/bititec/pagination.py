@@ -0,0 +1,67 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class StandardPagination(PageNumberPagination):
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination over -created_at: constant cost per page, no COUNT(*)"""
+    ordering = '-created_at'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ChatMessagePagination(CreatedAtCursorPagination):
+    """Newest messages first; the ``next`` link pages back through older history"""
+    page_size = 50
+    max_page_size = 200
+
+
+class KeysetPagination(StandardPagination):
+    """
+    Page numbers by default; ``?pagination=cursor`` (or any ``?cursor=`` link it
+    returns) switches to keyset pagination for infinite scrolling.
+    """
+    cursor_pagination_class = CreatedAtCursorPagination
+    cursor_ordering = None  # Defaults to the cursor class ordering
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def use_cursor(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_pagination_class()
+            if self.cursor_ordering:
+                self.cursor_paginator.ordering = self.cursor_ordering
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        self.cursor_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_html_context()
+        return super().get_html_context()
+
+
+class RequestedAtKeysetPagination(KeysetPagination):
+    cursor_ordering = '-requested_at'
+
+
+class MonthKeysetPagination(KeysetPagination):
+    cursor_ordering = '-month'
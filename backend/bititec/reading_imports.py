@@ -0,0 +1,258 @@
+"""
+Bulk meter-reading ingestion for one month.
+
+Rows (from CSV/XLSX/JSON files or a JSON request body) name a lease by
+``lease_no`` or by the ``serial_no`` of its machine and give its
+``meter_reading``. Each chunk costs one LeaseContract lookup for every key
+in it and one MeterReading lookup for the readings the month already has;
+readings repeated in the file are caught with a set of the leases seen so
+far. New and changed readings are then upserted with one bulk_create on the
+(lease, month) unique key, so a reading submitted twice updates in place.
+Every row gets an outcome: created, updated, unchanged or failed.
+"""
+import json
+from decimal import Decimal, InvalidOperation
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Q
+
+from .importers import DEFAULT_CHUNK_SIZE, InventoryImportError, chunked, clean_cell, read_rows
+from .models import LeaseContract, MeterReading
+
+# Outcomes past this many are counted but not listed
+MAX_REPORTED_ROWS = 5000
+
+# PositiveIntegerField range
+MAX_METER_READING = 2147483647
+
+
+class ReadingImportReport:
+    def __init__(self, month, dry_run=False):
+        self.month = month
+        self.dry_run = dry_run
+        self.total_rows = 0
+        self.counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
+        self.rows = []
+        self.rows_truncated = False
+
+    @property
+    def failed(self):
+        return self.counts['failed']
+
+    @property
+    def written(self):
+        return self.counts['created'] + self.counts['updated']
+
+    def add(self, row_number, outcome, lease_no=None, meter_reading=None, errors=None):
+        self.counts[outcome] += 1
+        if len(self.rows) >= MAX_REPORTED_ROWS:
+            self.rows_truncated = True
+            return
+        row = {'row': row_number, 'status': outcome, 'lease_no': lease_no, 'meter_reading': meter_reading}
+        if errors:
+            row['errors'] = errors
+        self.rows.append(row)
+
+    def to_dict(self):
+        return {
+            'month': self.month.strftime('%Y-%m'),
+            'dry_run': self.dry_run,
+            'total_rows': self.total_rows,
+            **self.counts,
+            'rows': self.rows,
+            'rows_truncated': self.rows_truncated,
+        }
+
+
+def parse_reading(value):
+    """The meter reading in ``value`` as an int, or None if it is not a whole non-negative number"""
+    try:
+        number = Decimal(str(value).replace(',', ''))
+    except InvalidOperation:
+        return None
+    if not number.is_finite() or number != number.to_integral_value() or not 0 <= number <= MAX_METER_READING:
+        return None
+    return int(number)
+
+
+class MeterReadingImporter:
+    """
+    Upsert the ``month`` readings of ``rows``. ``progress`` is called with the
+    report after each chunk.
+    """
+
+    def __init__(self, month, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, progress=None):
+        self.month = month.replace(day=1)
+        self.month_end = self.month + relativedelta(months=1)
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.report = ReadingImportReport(self.month, dry_run=dry_run)
+        self.seen_leases = set()
+
+    def run(self, rows, start=2):
+        # CSV/XLSX data rows start at line 2, after the header; JSON rows pass start=1
+        for chunk in chunked(enumerate(rows, start=start), self.chunk_size):
+            if not self.report.total_rows:
+                self.check_columns(chunk[0][1])
+            self.import_chunk(chunk)
+            if self.progress:
+                self.progress(self.report)
+        return self.report
+
+    def check_columns(self, raw):
+        if not isinstance(raw, dict):
+            return  # Reported per row
+        if 'meter_reading' not in raw:
+            raise InventoryImportError("Missing required column 'meter_reading'")
+        if 'lease_no' not in raw and 'serial_no' not in raw:
+            raise InventoryImportError("Rows need a 'lease_no' or 'serial_no' column")
+
+    def parse(self, raw):
+        """((lease_no, serial_no, reading), None) or (None, errors) for one row"""
+        if not isinstance(raw, dict):
+            return None, {'row': 'Expected an object with lease_no/serial_no and meter_reading'}
+        lease_no = clean_cell(raw.get('lease_no'))
+        serial_no = clean_cell(raw.get('serial_no'))
+        errors = {}
+        if lease_no is None and serial_no is None:
+            errors['lease_no'] = 'Give a lease_no or serial_no'
+        reading = parse_reading(clean_cell(raw.get('meter_reading')))
+        if reading is None:
+            errors['meter_reading'] = 'Must be a whole number of at least 0'
+        if errors:
+            return None, errors
+        return (
+            str(lease_no) if lease_no is not None else None,
+            str(serial_no) if serial_no is not None else None,
+            reading,
+        ), None
+
+    def runs_in_month(self, lease):
+        return lease['from_date'] < self.month_end and lease['to_date'] >= self.month
+
+    def load_leases(self, lease_nos, serial_nos):
+        """({lease_no: lease}, {serial_no: [leases]}) for the keys of one chunk, in one query"""
+        by_no, by_serial = {}, {}
+        if not lease_nos and not serial_nos:
+            return by_no, by_serial
+        for lease in LeaseContract.objects.filter(
+            Q(lease_no__in=lease_nos) | Q(item__serial_no__in=serial_nos)
+        ).values('id', 'lease_no', 'item_id', 'item__serial_no', 'from_date', 'to_date', 'is_active'):
+            by_no[lease['lease_no']] = lease
+            by_serial.setdefault(lease['item__serial_no'], []).append(lease)
+        return by_no, by_serial
+
+    def resolve(self, lease_no, serial_no, by_no, by_serial):
+        """(lease, None) or (None, errors) for one row's keys"""
+        month = self.month.strftime('%Y-%m')
+        if lease_no is not None:
+            lease = by_no.get(lease_no)
+            if lease is None:
+                return None, {'lease_no': 'Unknown lease'}
+            if serial_no is not None and lease['item__serial_no'] != serial_no:
+                return None, {'serial_no': f"Lease {lease_no} is for machine {lease['item__serial_no']}"}
+            if not self.runs_in_month(lease):
+                return None, {'lease_no': f'Lease does not run in {month}'}
+            return lease, None
+
+        leases = [lease for lease in by_serial.get(serial_no, []) if self.runs_in_month(lease)]
+        if len(leases) > 1:
+            # A machine can be on an ended lease and its replacement in the same month
+            leases = [lease for lease in leases if lease['is_active']] or leases
+        if not leases:
+            return None, {'serial_no': f'No lease for this machine in {month}'}
+        if len(leases) > 1:
+            return None, {'serial_no': 'Machine is on several leases this month; give the lease_no'}
+        return leases[0], None
+
+    def import_chunk(self, chunk):
+        self.report.total_rows += len(chunk)
+        outcomes = []  # Reported in row order once the chunk is done
+        parsed = []
+        for row_number, raw in chunk:
+            values, errors = self.parse(raw)
+            if errors:
+                lease_no = clean_cell(raw.get('lease_no')) if isinstance(raw, dict) else None
+                outcomes.append((row_number, 'failed', lease_no, None, errors))
+            else:
+                parsed.append((row_number, values))
+
+        by_no, by_serial = self.load_leases(
+            {lease_no for _, (lease_no, _, _) in parsed if lease_no is not None},
+            {serial_no for _, (lease_no, serial_no, _) in parsed if lease_no is None},
+        )
+        matched = []
+        for row_number, (lease_no, serial_no, reading) in parsed:
+            lease, errors = self.resolve(lease_no, serial_no, by_no, by_serial)
+            if errors:
+                outcomes.append((row_number, 'failed', lease_no, reading, errors))
+            elif lease['id'] in self.seen_leases:
+                outcomes.append((row_number, 'failed', lease['lease_no'], reading, {
+                    'lease_no': 'Duplicate reading for this lease in the file'
+                }))
+            else:
+                self.seen_leases.add(lease['id'])
+                matched.append((row_number, lease, reading))
+
+        existing = {
+            lease_id: (machine_id, reading)
+            for lease_id, machine_id, reading in MeterReading.objects.filter(
+                lease_id__in=[lease['id'] for _, lease, _ in matched], month=self.month
+            ).values_list('lease_id', 'machine_id', 'meter_reading')
+        } if matched else {}
+
+        upserts = []
+        for row_number, lease, reading in matched:
+            current = existing.get(lease['id'])
+            if current == (lease['item_id'], reading):
+                outcome = 'unchanged'
+            else:
+                outcome = 'created' if current is None else 'updated'
+                upserts.append(MeterReading(
+                    lease_id=lease['id'], machine_id=lease['item_id'], month=self.month, meter_reading=reading,
+                ))
+            outcomes.append((row_number, outcome, lease['lease_no'], reading, None))
+
+        for row_number, outcome, lease_no, reading, errors in sorted(outcomes, key=lambda row: row[0]):
+            self.report.add(row_number, outcome, lease_no=lease_no, meter_reading=reading, errors=errors)
+        if upserts and not self.report.dry_run:
+            self.write(upserts)
+
+    def write(self, readings):
+        # bulk_create fills created_at/updated_at; a conflict only overwrites update_fields
+        with transaction.atomic():
+            MeterReading.objects.bulk_create(
+                readings,
+                batch_size=self.chunk_size,
+                update_conflicts=True,
+                unique_fields=['lease', 'month'],
+                update_fields=['meter_reading', 'machine', 'updated_at'],
+            )
+
+
+def json_rows(fileobj):
+    """The readings of a JSON file: a list of rows or {"readings": [...]}"""
+    fileobj = getattr(fileobj, 'file', fileobj)  # Unwrap Django's UploadedFile
+    try:
+        data = json.load(fileobj)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise InventoryImportError(f'Invalid JSON: {e}') from e
+    if isinstance(data, dict):
+        data = data.get('readings')
+    if not isinstance(data, list):
+        raise InventoryImportError('Expected a list of readings or {"readings": [...]}')
+    return data
+
+
+def import_meter_readings(fileobj, filename, month, **options):
+    """Stream a CSV/XLSX/JSON file through a MeterReadingImporter and return its report"""
+    importer = MeterReadingImporter(month, **options)
+    if filename.lower().endswith('.json'):
+        return importer.run(json_rows(fileobj), start=1)
+    return importer.run(read_rows(fileobj, filename))
+
+
+def ingest_meter_readings(rows, month, **options):
+    """Run a MeterReadingImporter over already-decoded rows (a JSON request body)"""
+    return MeterReadingImporter(month, **options).run(rows, start=1)
@@ -0,0 +1,98 @@
+"""
+Lease meter-reading months.
+
+A lease is due one reading per month from the month of ``from_date`` up to
+the month of ``to_date`` or the current month, whichever comes first. The
+recorded months of any number of leases come from one MeterReading query,
+so a page of leases costs one query however long the leases run.
+"""
+import datetime
+
+from dateutil.relativedelta import relativedelta
+from django.db.models import Exists, F, OuterRef, Prefetch, Q, Subquery, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import LeaseContract, MeterReading
+
+# Readings embedded in each row of the lease list (?readings= up to MAX_RECENT_READINGS)
+LEASE_RECENT_READINGS = 3
+MAX_RECENT_READINGS = 12
+
+
+def month_start(value):
+    return value.replace(day=1)
+
+
+def due_months(from_date, to_date, today=None):
+    """First days of the months a lease needs readings for, oldest first"""
+    last = month_start(min(to_date, today or timezone.localdate()))
+    month = month_start(from_date)
+    while month <= last:
+        yield month
+        month += relativedelta(months=1)
+
+
+def recorded_months(lease_ids):
+    """{lease id: {(year, month), ...}} for ``lease_ids`` in one query"""
+    recorded = {lease_id: set() for lease_id in lease_ids}
+    for lease_id, month in MeterReading.objects.filter(lease_id__in=lease_ids).order_by().values_list(
+        'lease_id', 'month'
+    ).distinct():
+        recorded[lease_id].add((month.year, month.month))
+    return recorded
+
+
+def missing_months(from_date, to_date, recorded, today=None):
+    """'YYYY-MM' of every due month without a reading"""
+    return [
+        month.strftime('%Y-%m') for month in due_months(from_date, to_date, today)
+        if (month.year, month.month) not in recorded
+    ]
+
+
+def parse_month(value):
+    """First day of the 'YYYY-MM' month ``value``; ValueError if it is not one"""
+    return datetime.datetime.strptime(str(value).strip(), '%Y-%m').date()
+
+
+def reading_cycle(params):
+    """The month ``?month=YYYY-MM`` names, defaulting to the current one"""
+    if not params.get('month'):
+        return month_start(timezone.localdate())
+    try:
+        return parse_month(params['month'])
+    except ValueError:
+        raise ValidationError({'month': 'Use YYYY-MM format'})
+
+
+def with_last_reading(queryset):
+    """Annotate leases with their latest ``last_reading`` and its ``last_reading_month``"""
+    latest = MeterReading.objects.filter(lease=OuterRef('pk')).order_by('-month')
+    return queryset.annotate(
+        last_reading=Subquery(latest.values('meter_reading')[:1]),
+        last_reading_month=Subquery(latest.values('month')[:1]),
+    )
+
+
+def recent_readings_prefetch(count):
+    """Only the latest ``count`` readings of each lease, as ``lease.recent_readings``"""
+    recent = MeterReading.objects.annotate(
+        recent_rank=Window(RowNumber(), partition_by=F('lease_id'), order_by=F('month').desc())
+    ).filter(recent_rank__lte=count).only('id', 'lease_id', 'month', 'meter_reading').order_by('lease_id', '-month')
+    return Prefetch('meter_readings', queryset=recent, to_attr='recent_readings')
+
+
+def overdue_leases(cycle):
+    """Active leases running in ``cycle`` with no reading for it, with their latest reading"""
+    cycle_end = cycle + relativedelta(months=1)
+    return with_last_reading(LeaseContract.objects.filter(
+        Q(is_active=True, from_date__lt=cycle_end, to_date__gte=cycle),
+        ~Exists(MeterReading.objects.filter(lease=OuterRef('pk'), month__gte=cycle, month__lt=cycle_end)),
+    )).values(
+        'id', 'lease_no', 'contract_type', 'department', 'from_date', 'to_date',
+        'client_id', 'client__client_name', 'client__client_location',
+        'item_id', 'item__machine_name', 'item__serial_no', 'store__store_name',
+        'last_reading_month', 'last_reading',
+    ).order_by('client__client_name', 'lease_no')
@@ -0,0 +1,192 @@
+"""
+Unified Machine / Part / Accessory search.
+
+Text matching is index backed on both database configurations (see migration
+0004_inventory_search_indexes): on Postgres the icontains lookups hit pg_trgm
+GIN indexes over UPPER(column), under the SQLite DEBUG configuration queries of
+three or more characters go through the bititec_inventory_fts FTS5 trigram
+table. Anything else falls back to plain icontains.
+"""
+import uuid
+
+from django.db import connection
+from django.db.models import CharField, Count, F, Q, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from .models import Accessory, Machine, Part
+
+FTS_TABLE = 'bititec_inventory_fts'
+FTS_MIN_LENGTH = 3  # The trigram tokenizer cannot match shorter strings
+
+# Per item type: model, text-searched fields and the columns mapped onto the
+# common result / facet shape
+SEARCH_MODELS = {
+    'machine': {
+        'model': Machine,
+        'text_fields': ['machine_name', 'machine_brand', 'machine_type', 'serial_no'],
+        'columns': {
+            'name': 'machine_name',
+            'brand': 'machine_brand',
+            'type': 'machine_type',
+            'reference': 'serial_no',
+            'condition': 'machine_condition',
+            'status': 'machine_status',
+        },
+    },
+    'part': {
+        'model': Part,
+        'text_fields': ['part_name', 'part_brand', 'part_type', 'ref_no'],
+        'columns': {
+            'name': 'part_name',
+            'brand': 'part_brand',
+            'type': 'part_type',
+            'reference': 'ref_no',
+            'condition': 'part_condition',
+            'status': 'part_status',
+        },
+    },
+    'accessory': {
+        'model': Accessory,
+        'text_fields': ['acc_name', 'acc_brand', 'acc_type', 'ref_no'],
+        'columns': {
+            'name': 'acc_name',
+            'brand': 'acc_brand',
+            'type': 'acc_type',
+            'reference': 'ref_no',
+            'condition': 'acc_condition',
+            'status': 'acc_status',
+        },
+    },
+}
+
+FACETS = ['brand', 'type', 'condition', 'status', 'store']
+
+_fts_available = None
+
+
+def fts_available():
+    """Whether the SQLite FTS5 table exists (it is skipped when FTS5 is not compiled in)"""
+    global _fts_available
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_available is None:
+        _fts_available = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available
+
+
+def text_filter(item_type, text):
+    """Q matching ``text`` against the searchable fields of ``item_type``"""
+    if not text:
+        return Q()
+    if len(text) >= FTS_MIN_LENGTH and fts_available():
+        # A quoted FTS5 string is a substring match under the trigram tokenizer
+        phrase = '"%s"' % text.replace('"', '""')
+        return Q(pk__in=RawSQL(
+            f"SELECT item_id FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND item_type = %s",
+            [phrase, item_type]
+        ))
+    condition = Q()
+    for field in SEARCH_MODELS[item_type]['text_fields']:
+        condition |= Q(**{f'{field}__icontains': text})
+    return condition
+
+
+def facet_filter(item_type, facet, value):
+    """Q for one facet value; the store facet matches on the store id"""
+    if facet == 'store':
+        return Q(store_id=value)
+    return Q(**{SEARCH_MODELS[item_type]['columns'][facet]: value})
+
+
+def column(item_type, name):
+    """Expression for a common column, cast to text so UNION arms line up on Postgres"""
+    if name == 'store':
+        return Cast('store_id', CharField())
+    return F(SEARCH_MODELS[item_type]['columns'][name])
+
+
+class InventorySearch:
+    """
+    Search across the inventory models.
+
+    ``text`` is the free-text query, ``item_types`` limits the models searched
+    and ``selected`` maps facet names to the values picked by the user.
+    """
+
+    def __init__(self, text='', item_types=None, selected=None):
+        self.text = (text or '').strip()
+        self.item_types = [t for t in (item_types or SEARCH_MODELS) if t in SEARCH_MODELS]
+        self.selected = {k: v for k, v in (selected or {}).items() if k in FACETS and v}
+
+    def base_queryset(self, item_type, exclude_facet=None):
+        queryset = SEARCH_MODELS[item_type]['model'].objects.filter(text_filter(item_type, self.text))
+        for facet, value in self.selected.items():
+            if facet != exclude_facet:
+                queryset = queryset.filter(facet_filter(item_type, facet, value))
+        return queryset.order_by()
+
+    def results(self):
+        """One UNION ALL over the three tables, newest first; slice it to paginate"""
+        querysets = [
+            self.base_queryset(item_type).values(
+                result_item_type=Value(item_type, output_field=CharField()),
+                result_id=F('id'),
+                result_name=column(item_type, 'name'),
+                result_brand=column(item_type, 'brand'),
+                result_type=column(item_type, 'type'),
+                result_reference=column(item_type, 'reference'),
+                result_condition=column(item_type, 'condition'),
+                result_status=column(item_type, 'status'),
+                result_store=F('store_id'),
+                result_store_name=F('store__store_name'),
+                result_quantity=F('quantity'),
+                result_unit_value=F('unit_value'),
+                result_created_at=F('created_at'),
+            )
+            for item_type in self.item_types
+        ]
+        if not querysets:
+            return Machine.objects.none().values()
+        first, rest = querysets[0], querysets[1:]
+        return first.union(*rest, all=True).order_by('-result_created_at', 'result_id')
+
+    def facets(self):
+        """
+        Counts per brand / type / condition / status / store in one grouped
+        UNION ALL. Each facet ignores its own selection so the other values stay
+        visible as alternatives.
+        """
+        querysets = []
+        for facet in FACETS:
+            for item_type in self.item_types:
+                label = F('store__store_name') if facet == 'store' else column(item_type, facet)
+                querysets.append(
+                    self.base_queryset(item_type, exclude_facet=facet).values(
+                        facet_name=Value(facet, output_field=CharField()),
+                        facet_value=column(item_type, facet),
+                        facet_label=label,
+                    ).annotate(facet_count=Count('id'))
+                )
+        facets = {facet: {} for facet in FACETS}
+        if not querysets:
+            return {facet: [] for facet in FACETS}
+
+        first, rest = querysets[0], querysets[1:]
+        for row in first.union(*rest, all=True):
+            value = row['facet_value']
+            if row['facet_name'] == 'store':
+                value = str(uuid.UUID(value))  # SQLite stores UUIDs as bare hex
+            entry = facets[row['facet_name']].setdefault(
+                value, {'value': value, 'label': row['facet_label'], 'count': 0}
+            )
+            entry['count'] += row['facet_count']  # Brands/types can repeat across item types
+        return {
+            facet: sorted(entries.values(), key=lambda e: (-e['count'], str(e['label'])))
+            for facet, entries in facets.items()
+        }
+
+
+def serialize_result(row):
+    """Strip the ``result_`` prefix used to keep UNION aliases clear of model fields"""
+    return {key[len('result_'):]: value for key, value in row.items()}
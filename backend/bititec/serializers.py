@@ -1,11 +1,22 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from .models import Accessory, AccessoryType, ChatGroup, ChatMessage, Client, ClientMachine, CustomUser, Delivery, LeaseAccInquiry, LeaseContract, LeasePartInquiry, MachineType, Machine, MeterReading, PartType, Part, Sale, SaleItem, Store, Call, StoreInquiry
+from .models import Accessory, AccessoryType, AuditEntry, BillingLine, BillingRun, ChatGroup, ChatMessage, Client, ClientMachine, CustomUser, Delivery, LeaseAccInquiry, LeaseContract, LeasePartInquiry, MachineType, Machine, MeterReading, PartType, Part, Sale, SaleItem, Store, Call, StockTransfer, StockTransferLine, StoreInquiry
 from django.db.models import Sum
-from dateutil.relativedelta import relativedelta
-from django.utils import timezone
+from django.db import models, transaction
+from .billing import run_billing
+from .call_parts import sync_call_parts
+from .readings import LEASE_RECENT_READINGS, missing_months, recorded_months
+from .dynamic_fields import DynamicFieldsModelSerializer
+from .inventory import InsufficientStock, record_adjustment, record_movement
+from .store_summary import get_store_summaries
+from .transfers import TRANSFER_MODELS, TransferError, create_transfer
 
-class UserSerializer(serializers.ModelSerializer):
+def request_user(serializer):
+    """User behind the serializer's request, if any (used to attribute stock movements)"""
+    request = serializer.context.get('request')
+    return getattr(request, 'user', None)
+
+class UserSerializer(DynamicFieldsModelSerializer):
     id = serializers.UUIDField(read_only=True)
     profile_image = serializers.ImageField(
         required=False, 
@@ -44,7 +55,7 @@ class UserSerializer(serializers.ModelSerializer):
         ]
         extra_kwargs = {'password': {'write_only': True}, 'role': {'read_only': True}}
         
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['email', 'password', 'firstname', 'lastname', 'phonenumber', 'role']
@@ -70,21 +81,34 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['role'] = user.role
         return token
 
-class StoreSerializer(serializers.ModelSerializer):
+class StoreListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # Summarise the whole page in one query instead of per store
+        stores = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context['store_summaries'] = get_store_summaries(stores)
+        return super().to_representation(stores)
+
+
+class StoreSerializer(DynamicFieldsModelSerializer):
     id = serializers.UUIDField(read_only=True)
     storeName = serializers.CharField(source='store_name')
     storeLocation = serializers.CharField(source='store_location')
     storeSize = serializers.IntegerField(source='store_size')
     machines_count = serializers.SerializerMethodField()
-    partsCount = serializers.IntegerField(source='parts_count', read_only=True)
-    accessoriesCount = serializers.IntegerField(source='accessories_count', read_only=True)
+    partsCount = serializers.SerializerMethodField()
+    accessoriesCount = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
 
     class Meta:
         model = Store
         fields = [
             'id', 'storeName', 'storeLocation', 'storeSize',
-            'machines_count', 'partsCount', 'accessoriesCount'
+            'machines_count', 'partsCount', 'accessoriesCount', 'summary'
         ]
+        list_serializer_class = StoreListSerializer
+        field_relations = {
+            'machines_count': (), 'partsCount': (), 'accessoriesCount': (), 'summary': ()
+        }
         extra_kwargs = {
             'store_name': {'write_only': True},
             'store_location': {'write_only': True},
@@ -100,26 +124,38 @@ class StoreSerializer(serializers.ModelSerializer):
         instance.store_size = validated_data.get('store_size', instance.store_size)
         instance.save()
         return instance
-    
+
+    def get_summary(self, obj):
+        summaries = self.context.setdefault('store_summaries', {})
+        if obj.pk not in summaries:
+            summaries.update(get_store_summaries([obj]))
+        return summaries[obj.pk]
+
     def get_machines_count(self, obj):
-        return obj.machines.count()
+        return self.get_summary(obj)['machines']['count']
+
+    def get_partsCount(self, obj):
+        return self.get_summary(obj)['parts']['count']
+
+    def get_accessoriesCount(self, obj):
+        return self.get_summary(obj)['accessories']['count']
     
-class AccessoryTypeSerializer(serializers.ModelSerializer):
+class AccessoryTypeSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = AccessoryType
         fields = ['id', 'name', 'type', 'brand', 'color']
 
-class MachineTypeSerializer(serializers.ModelSerializer):
+class MachineTypeSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = MachineType
         fields = ['id', 'name', 'type', 'brand', 'color']
 
-class PartTypeSerializer(serializers.ModelSerializer):
+class PartTypeSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = PartType
         fields = ['id', 'name', 'type', 'brand', 'color']
 
-class MachineSerializer(serializers.ModelSerializer):
+class MachineSerializer(DynamicFieldsModelSerializer):
     store_name = serializers.CharField(source='store.store_name', read_only=True)
     store_id = serializers.UUIDField(source='store.id', read_only=True)
     store = serializers.PrimaryKeyRelatedField(
@@ -160,31 +196,37 @@ class MachineSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        return Machine.objects.create(**validated_data)
+        with transaction.atomic():
+            instance = Machine.objects.create(**validated_data)
+            record_movement(instance, instance.quantity, 'Receipt', user=request_user(self))
+        return instance
 
     def update(self, instance, validated_data):
+        old_quantity = instance.quantity
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            instance.save()
+            record_adjustment(instance, old_quantity, user=request_user(self))
         return instance
 
-class ClientSerializer(serializers.ModelSerializer):
+class ClientSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Client
         fields = ['id', 'client_name', 'client_location', 'created_at']
         read_only_fields = ['created_at']
     
-class BasicPartSerializer(serializers.ModelSerializer):
+class BasicPartSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Part
         fields = ['id', 'part_name', 'ref_no']  
 
-class BasicAccessorySerializer(serializers.ModelSerializer):
+class BasicAccessorySerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = Accessory
         fields = ['id', 'acc_name', 'ref_no']  
 
-class MeterReadingSerializer(serializers.ModelSerializer):
+class MeterReadingSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = MeterReading
         fields = '__all__'
@@ -199,7 +241,28 @@ class MeterReadingSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Meter reading for this month already exists")
         return data
     
-class LeaseContractSerializer(serializers.ModelSerializer):
+class MissingReadingsListSerializer(serializers.ListSerializer):
+    """Loads the recorded reading months of every lease in the list with one query"""
+
+    def to_representation(self, data):
+        leases = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'missing_readings' in self.child.fields:
+            self.recorded_months = recorded_months([lease.pk for lease in leases])
+        return super().to_representation(leases)
+
+class MissingReadingsMixin:
+    def get_missing_readings(self, obj):
+        # MissingReadingsListSerializer loads the recorded months of a whole page at once
+        recorded = getattr(self.parent, 'recorded_months', None)
+        if recorded is not None and obj.pk in recorded:
+            return missing_months(obj.from_date, obj.to_date, recorded[obj.pk])
+        if 'meter_readings' in getattr(obj, '_prefetched_objects_cache', {}):
+            # nested under a part / accessory row: the stock querysets prefetch the readings
+            months = {(reading.month.year, reading.month.month) for reading in obj.meter_readings.all()}
+            return missing_months(obj.from_date, obj.to_date, months)
+        return missing_months(obj.from_date, obj.to_date, recorded_months([obj.pk])[obj.pk])
+
+class LeaseContractSerializer(MissingReadingsMixin, DynamicFieldsModelSerializer):
     client_name = serializers.CharField(source='client.client_name', read_only=True)
     client_location = serializers.CharField(source='client.client_location', read_only=True)
     item_name = serializers.CharField(source='item.machine_name', read_only=True)
@@ -230,25 +293,51 @@ class LeaseContractSerializer(serializers.ModelSerializer):
             'serial_no', 'store', 'store_name', 'from_date', 'to_date', 'add_vat', 'add_myq',
             'billed_myq', 'is_active', 'contract_type', 'lease_no', 'created_at', 'client', 'meter_readings', 'missing_readings'
         ]
+        field_relations = {'missing_readings': ()}
+        list_serializer_class = MissingReadingsListSerializer
         extra_kwargs = {
             'created_at': {'read_only': True},
             'lease_no': {'read_only': True}
         }
 
-    def get_missing_readings(self, obj):
-        months_missing = []
-        current_date = timezone.now().date()
-        start_date = obj.from_date
-        
-        while start_date <= current_date:
-            if not obj.meter_readings.filter(month__month=start_date.month, 
-                                           month__year=start_date.year).exists():
-                months_missing.append(start_date.strftime('%Y-%m'))
-            start_date += relativedelta(months=1)
-            
-        return months_missing
+class LeaseContractListSerializer(MissingReadingsMixin, DynamicFieldsModelSerializer):
+    """
+    Compact lease row for the list: related objects as ids and names, the
+    latest reading as annotations and only the last few readings, prefetched
+    by LeaseContractViewSet. The full history is leases/<pk>/meter-readings/.
+    """
+    client_name = serializers.CharField(source='client.client_name', read_only=True)
+    client_location = serializers.CharField(source='client.client_location', read_only=True)
+    item_name = serializers.CharField(source='item.machine_name', read_only=True)
+    serial_no = serializers.CharField(source='item.serial_no', read_only=True)
+    store_name = serializers.CharField(source='store.store_name', read_only=True)
+    last_reading = serializers.IntegerField(read_only=True)
+    last_reading_month = serializers.DateField(read_only=True)
+    recent_readings = serializers.SerializerMethodField()
+    missing_readings = serializers.SerializerMethodField()
+
+    class Meta:
+        model = LeaseContract
+        fields = [
+            'id', 'lease_no', 'contract_type', 'department', 'client', 'client_name', 'client_location',
+            'item', 'item_name', 'serial_no', 'store', 'store_name', 'from_date', 'to_date',
+            'add_vat', 'add_myq', 'billed_myq', 'is_active', 'created_at',
+            'last_reading', 'last_reading_month', 'recent_readings', 'missing_readings'
+        ]
+        read_only_fields = fields
+        field_relations = {'recent_readings': ('recent_readings',), 'missing_readings': ()}
+        list_serializer_class = MissingReadingsListSerializer
 
-class LeasePartInquirySerializer(serializers.ModelSerializer):
+    def get_recent_readings(self, obj):
+        readings = getattr(obj, 'recent_readings', None)
+        if readings is None:
+            readings = obj.meter_readings.order_by('-month')[:LEASE_RECENT_READINGS]
+        return [
+            {'id': reading.id, 'month': reading.month, 'meter_reading': reading.meter_reading}
+            for reading in readings
+        ]
+
+class LeasePartInquirySerializer(DynamicFieldsModelSerializer):
     part = BasicPartSerializer(read_only=True)
     lease = LeaseContractSerializer(read_only=True)
     part_id = serializers.PrimaryKeyRelatedField(queryset=Part.objects.all(), write_only=True, source='part')
@@ -273,7 +362,7 @@ class LeasePartInquirySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at', 'store_inquiry']
 
-class PartSerializer(serializers.ModelSerializer):
+class PartSerializer(DynamicFieldsModelSerializer):
     store_name = serializers.CharField(source='store.store_name', read_only=True)
     store_id = serializers.UUIDField(source='store.id', read_only=True)
     store = serializers.PrimaryKeyRelatedField(
@@ -316,6 +405,7 @@ class PartSerializer(serializers.ModelSerializer):
             'lease_inquiries', 
             'sold_items'
         ]
+        field_relations = {'leased_quantity': (), 'sold_quantity': (), 'sold_items': ('sale_items',)}
         extra_kwargs = {
             'store': {'write_only': True},
             'created_at': {'read_only': True}
@@ -329,26 +419,38 @@ class PartSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        return Part.objects.create(**validated_data)
+        with transaction.atomic():
+            instance = Part.objects.create(**validated_data)
+            record_movement(instance, instance.quantity, 'Receipt', user=request_user(self))
+        return instance
 
     def update(self, instance, validated_data):
+        old_quantity = instance.quantity
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            instance.save()
+            record_adjustment(instance, old_quantity, user=request_user(self))
         return instance
     
     def get_leased_quantity(self, obj):
+        # List querysets annotate this via Part.objects.with_stock_figures()
+        if hasattr(obj, 'leased_total'):
+            return obj.leased_total
         return obj.leasepartinquiry_set.aggregate(
             total=Sum('quantity')
         )['total'] or 0
 
     def get_sold_quantity(self, obj):
+        if hasattr(obj, 'sold_total'):
+            return obj.sold_total
         return SaleItem.objects.filter(part=obj).aggregate(
             total=Sum('quantity')
         )['total'] or 0
     
     def get_sold_items(self, obj):
-        sale_items = obj.sale_items.select_related('sale__client').all()
+        # Reads the rows prefetched by the view (with sale__client selected)
+        sale_items = obj.sale_items.all()
         return [{
             'id': item.id,
             'quantity': item.quantity,
@@ -364,7 +466,7 @@ class PartSerializer(serializers.ModelSerializer):
             }
         } for item in sale_items if item.sale]
         
-class LeaseAccInquirySerializer(serializers.ModelSerializer):
+class LeaseAccInquirySerializer(DynamicFieldsModelSerializer):
     accessory = BasicAccessorySerializer(read_only=True)
     lease = LeaseContractSerializer(read_only=True)
     accessory_id = serializers.PrimaryKeyRelatedField(queryset=Accessory.objects.all(), write_only=True, source='accessory')
@@ -374,7 +476,7 @@ class LeaseAccInquirySerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
     
-class AccessorySerializer(serializers.ModelSerializer):
+class AccessorySerializer(DynamicFieldsModelSerializer):
     store_name = serializers.CharField(source='store.store_name', read_only=True)
     store_id = serializers.UUIDField(source='store.id', read_only=True)
     store = serializers.PrimaryKeyRelatedField(
@@ -417,6 +519,7 @@ class AccessorySerializer(serializers.ModelSerializer):
             'lease_inquiries', 
             'sold_items'
         ]
+        field_relations = {'leased_quantity': (), 'sold_quantity': (), 'sold_items': ('sale_accessories',)}
         extra_kwargs = {
             'store': {'write_only': True},
             'created_at': {'read_only': True}
@@ -430,26 +533,38 @@ class AccessorySerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        return Accessory.objects.create(**validated_data)
+        with transaction.atomic():
+            instance = Accessory.objects.create(**validated_data)
+            record_movement(instance, instance.quantity, 'Receipt', user=request_user(self))
+        return instance
 
     def update(self, instance, validated_data):
+        old_quantity = instance.quantity
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic():
+            instance.save()
+            record_adjustment(instance, old_quantity, user=request_user(self))
         return instance
     
     def get_leased_quantity(self, obj):
+        # List querysets annotate this via Accessory.objects.with_stock_figures()
+        if hasattr(obj, 'leased_total'):
+            return obj.leased_total
         return obj.leaseaccinquiry_set.aggregate(
             total=Sum('quantity')
         )['total'] or 0
 
     def get_sold_quantity(self, obj):
+        if hasattr(obj, 'sold_total'):
+            return obj.sold_total
         return SaleItem.objects.filter(accessory=obj).aggregate(
             total=Sum('quantity')
         )['total'] or 0
     
     def get_sold_items(self, obj):
-        sale_items = obj.sale_accessories.select_related('sale__client').all()
+        # Reads the rows prefetched by the view (with sale__client selected)
+        sale_items = obj.sale_accessories.all()
         return [{
             'id': item.id,
             'quantity': item.quantity,
@@ -465,7 +580,7 @@ class AccessorySerializer(serializers.ModelSerializer):
             }
         } for item in sale_items if item.sale]
 
-class CallSerializer(serializers.ModelSerializer):
+class CallSerializer(DynamicFieldsModelSerializer):
     # Flattened fields for reading
     client_name_display = serializers.CharField(source='client.client_name', read_only=True)
     client_location_display = serializers.CharField(source='client.client_location', read_only=True)
@@ -520,6 +635,7 @@ class CallSerializer(serializers.ModelSerializer):
             'spare_description', 'created_at', 'walk_in_machine',
             'walk_in_machine_name', 'walk_in_machine_type', 'walk_in_serial_no', 'technician_manager_approval', 'client_verification'
         ]
+        field_relations = {'item_name': ('item',), 'serial_no': ('item',), 'store_name': ('item',)}
         extra_kwargs = {
             'created_at': {'read_only': True},
             'ticket_no': {'read_only': True},
@@ -543,6 +659,7 @@ class CallSerializer(serializers.ModelSerializer):
         
         call = Call.objects.create(**validated_data)
         call.technician.set(technicians)
+        sync_call_parts([call])
         return call
     
     def update(self, instance, validated_data):
@@ -563,6 +680,8 @@ class CallSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         
         instance.save()
+        if 'parts_required' in validated_data or 'parts_used' in validated_data:
+            sync_call_parts([instance])
         return instance
 
     def to_internal_value(self, data):
@@ -573,16 +692,6 @@ class CallSerializer(serializers.ModelSerializer):
             data['technician_ids'] = data.get('technician_ids') or [t.get('id') for t in data.get('technician', [])]
         return super().to_internal_value(data)
     
-    def to_representation(self, instance):
-        data = super().to_representation(instance)
-        
-        # For walk-in calls, use the stored walk-in data if client is None
-        if instance.contract_type == 'WalkIn' and not instance.client:
-            data['client_name'] = instance.client_name or ''
-            data['client_location'] = instance.client_location or ''
-        
-        return data
-    
     def validate(self, data):
         contract_type = data.get('contract_type')
         
@@ -623,14 +732,15 @@ class CallSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         data = super().to_representation(instance)
         
-        # For walk-in calls, show the stored client info
+        # For walk-in calls, show the stored client and machine info (in the fields still selected)
         if instance.contract_type == 'WalkIn':
-            data.update({
+            walk_in = {
                 'client_name': instance.client_name or '',
                 'client_location': instance.client_location or '',
                 'item_name': instance.walk_in_machine_name or '',
                 'serial_no': instance.walk_in_serial_no or ''
-            })
+            }
+            data.update({field: value for field, value in walk_in.items() if field in self.fields})
             
         return data
     
@@ -658,8 +768,97 @@ class CallSerializer(serializers.ModelSerializer):
         if obj.item and obj.item.store:
             return obj.item.store.store_name
         return ""
+
+
+class CallTechnicianSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = CustomUser
+        fields = ['id', 'firstname', 'lastname']
+
+
+class CallListSerializer(DynamicFieldsModelSerializer):
+    """
+    Compact call board row: no nested machine / client / user serializers and
+    none of the large text or JSON columns (see CallViewSet.LIST_FIELDS).
+    """
+    client_name = serializers.SerializerMethodField()
+    item_name = serializers.SerializerMethodField()
+    serial_no = serializers.SerializerMethodField()
+    technician = CallTechnicianSerializer(many=True, read_only=True)
+    reported_date = serializers.DateTimeField(format="%Y-%m-%d", read_only=True)
+
+    class Meta:
+        model = Call
+        fields = [
+            'id', 'ticket_no', 'status', 'contract_type', 'department',
+            'client_name', 'item_name', 'serial_no', 'technician',
+            'reported_date', 'is_checked', 'technician_manager_approval',
+            'client_verification', 'created_at'
+        ]
+        read_only_fields = fields
+        field_relations = {'client_name': ('client',), 'item_name': ('item',), 'serial_no': ('item',)}
+
+    def get_client_name(self, obj):
+        if obj.client_id:
+            return obj.client.client_name
+        return obj.client_name or ""
+
+    def get_item_name(self, obj):
+        if obj.item_id:
+            return obj.item.machine_name
+        return obj.walk_in_machine_name or ""
+
+    def get_serial_no(self, obj):
+        if obj.item_id:
+            return obj.item.serial_no
+        return obj.walk_in_serial_no or ""
+
+
+class CallAccessSerializer(DynamicFieldsModelSerializer):
+    """What a customer sees through a signed access link: no contact details or internal notes"""
+    client_name_display = serializers.SerializerMethodField()
+    client_location_display = serializers.SerializerMethodField()
+    item_name = serializers.SerializerMethodField()
+    serial_no = serializers.SerializerMethodField()
+    technician = CallTechnicianSerializer(many=True, read_only=True)
+    reported_date = serializers.DateTimeField(format="%Y-%m-%d", read_only=True)
+
+    class Meta:
+        model = Call
+        fields = [
+            'id', 'ticket_no', 'status', 'contract_type', 'department',
+            'client_name_display', 'client_location_display', 'item_name', 'serial_no',
+            'reported_by', 'reported_date', 'fault_reported', 'action_taken', 'technician',
+            'technician_manager_approval', 'client_verification', 'created_at'
+        ]
+        read_only_fields = fields
+        field_relations = {
+            'client_name_display': ('client',), 'client_location_display': ('client',),
+            'item_name': ('item',), 'serial_no': ('item',)
+        }
+
+    def get_client_name_display(self, obj):
+        if obj.client_id:
+            return obj.client.client_name
+        return obj.client_name or ""
+
+    def get_client_location_display(self, obj):
+        if obj.client_id:
+            return obj.client.client_location
+        return obj.client_location or ""
+
+    def get_item_name(self, obj):
+        if obj.item_id:
+            return obj.item.machine_name
+        return obj.walk_in_machine_name or ""
+
+    def get_serial_no(self, obj):
+        if obj.item_id:
+            return obj.item.serial_no
+        return obj.walk_in_serial_no or ""
+
     
-class StoreInquirySerializer(serializers.ModelSerializer):
+class StoreInquirySerializer(DynamicFieldsModelSerializer):
     requested_by = UserSerializer(read_only=True)
     lease_part_inquiries = LeasePartInquirySerializer(many=True, read_only=True)
     
@@ -687,12 +886,12 @@ class StoreInquirySerializer(serializers.ModelSerializer):
         
         return super().update(instance, validated_data)
     
-class ClientMachineSerializer(serializers.ModelSerializer):
+class ClientMachineSerializer(DynamicFieldsModelSerializer):
     class Meta:
         model = ClientMachine
         fields = '__all__'
 
-class SaleItemSerializer(serializers.ModelSerializer):
+class SaleItemSerializer(DynamicFieldsModelSerializer):
     machine = MachineSerializer(read_only=True)
     part = PartSerializer(read_only=True)
     accessory = AccessorySerializer(read_only=True)
@@ -725,11 +924,12 @@ class SaleItemSerializer(serializers.ModelSerializer):
             'machine_id', 'part_id', 'accessory_id',
             'quantity', 'unit_price', 'total_price', 'custom_item'
         ]
+        field_relations = {'total_price': ()}
     
     def get_total_price(self, obj):
         return obj.quantity * obj.unit_price
 
-class SaleSerializer(serializers.ModelSerializer):
+class SaleSerializer(DynamicFieldsModelSerializer):
     sale_type = serializers.ChoiceField(choices=Sale.SALE_TYPE_CHOICES)
     client_name = serializers.CharField(write_only=True, required=False)
     client_location = serializers.CharField(write_only=True, required=False)
@@ -760,6 +960,7 @@ class SaleSerializer(serializers.ModelSerializer):
             'sale_date', 'notes', 'created_at', 'total_price', 'items_count', 'sale_type', 'client_id', 
         ]
         read_only_fields = ['sale_no', 'created_at', 'total_price']
+        field_relations = {'client': ('client',)}
         extra_kwargs = {
             'local_client_name': {'required': False}
         }
@@ -830,69 +1031,77 @@ class SaleSerializer(serializers.ModelSerializer):
             )
             validated_data['client'] = client
 
-        # Create the sale
-        sale = Sale.objects.create(**validated_data)
-
-        # Add sale items
-        for item_data in items_data:
-            custom_data = {}
-            if item_data.get('custom_item'):
-                custom_data = {
-                    'name': item_data['custom_item']['name'],
-                    'type': item_data['sale_type'],
-                    'reference_no': item_data['custom_item'].get('reference_no', '')
-                }
-            
-            SaleItem.objects.create(
-                sale=sale,
-                sale_type=item_data['sale_type'],
-                quantity=item_data['quantity'],
-                unit_price=item_data['unit_price'],
-                custom_item=custom_data if custom_data else None,
-                **({'machine': item_data.get('machine')} if item_data.get('machine') else {}),
-                **({'part': item_data.get('part')} if item_data.get('part') else {}),
-                **({'accessory': item_data.get('accessory')} if item_data.get('accessory') else {})
-            )
+        try:
+            with transaction.atomic():
+                # Create the sale
+                sale = Sale.objects.create(**validated_data)
+
+                # Add sale items
+                for item_data in items_data:
+                    custom_data = {}
+                    if item_data.get('custom_item'):
+                        custom_data = {
+                            'name': item_data['custom_item']['name'],
+                            'type': item_data['sale_type'],
+                            'reference_no': item_data['custom_item'].get('reference_no', '')
+                        }
+                    
+                    SaleItem.objects.create(
+                        sale=sale,
+                        sale_type=item_data['sale_type'],
+                        quantity=item_data['quantity'],
+                        unit_price=item_data['unit_price'],
+                        custom_item=custom_data if custom_data else None,
+                        **({'machine': item_data.get('machine')} if item_data.get('machine') else {}),
+                        **({'part': item_data.get('part')} if item_data.get('part') else {}),
+                        **({'accessory': item_data.get('accessory')} if item_data.get('accessory') else {})
+                    )
+        except InsufficientStock as e:
+            raise serializers.ValidationError({"items": str(e)})
         return sale
     
     def update(self, instance, validated_data):
         items_data = validated_data.pop('items', [])
         
-        # Update sale fields
-        instance.sale_date = validated_data.get('sale_date', instance.sale_date)
-        instance.notes = validated_data.get('notes', instance.notes)
-        instance.add_vat = validated_data.get('add_vat', instance.add_vat)
-        instance.save()
+        try:
+            with transaction.atomic():
+                # Update sale fields
+                instance.sale_date = validated_data.get('sale_date', instance.sale_date)
+                instance.notes = validated_data.get('notes', instance.notes)
+                instance.add_vat = validated_data.get('add_vat', instance.add_vat)
+                instance.save()
 
-        # Update items
-        existing_items = {item.id: item for item in instance.items.all()}
-        
-        for item_data in items_data:
-            item_id = item_data.get('id')
-            if item_id and item_id in existing_items:
-                # Update existing item
-                item = existing_items[item_id]
-                item.quantity = item_data.get('quantity', item.quantity)
-                item.unit_price = item_data.get('unit_price', item.unit_price)
-                item.total_price = item.quantity * item.unit_price
+                # Update items
+                existing_items = {item.id: item for item in instance.items.all()}
                 
-                # Update custom item if present
-                if 'custom_item' in item_data:
-                    item.custom_item = item_data['custom_item']
+                for item_data in items_data:
+                    item_id = item_data.get('id')
+                    if item_id and item_id in existing_items:
+                        # Update existing item
+                        item = existing_items[item_id]
+                        item.quantity = item_data.get('quantity', item.quantity)
+                        item.unit_price = item_data.get('unit_price', item.unit_price)
+                        item.total_price = item.quantity * item.unit_price
+                        
+                        # Update custom item if present
+                        if 'custom_item' in item_data:
+                            item.custom_item = item_data['custom_item']
+                        
+                        item.save()
+                        del existing_items[item_id]
+                    else:
+                        # Create new item
+                        SaleItem.objects.create(sale=instance, **item_data)
                 
-                item.save()
-                del existing_items[item_id]
-            else:
-                # Create new item
-                SaleItem.objects.create(sale=instance, **item_data)
-        
-        # Delete removed items
-        for item in existing_items.values():
-            item.delete()
+                # Delete removed items
+                for item in existing_items.values():
+                    item.delete()
+        except InsufficientStock as e:
+            raise serializers.ValidationError({"items": str(e)})
 
         return instance
     
-class DeliverySerializer(serializers.ModelSerializer):
+class DeliverySerializer(DynamicFieldsModelSerializer):
     client_name = serializers.SerializerMethodField()
     client_location = serializers.SerializerMethodField()
     total_items = serializers.SerializerMethodField()
@@ -927,7 +1136,7 @@ class DeliverySerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Lease is required for Lease deliveries")
         return data
     
-class ChatMessageSerializer(serializers.ModelSerializer):
+class ChatMessageSerializer(DynamicFieldsModelSerializer):
     sender = UserSerializer(read_only=True)
     read_by = UserSerializer(many=True, read_only=True)
     is_read = serializers.SerializerMethodField()
@@ -937,6 +1146,7 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         model = ChatMessage
         fields = ['id', 'chat_group', 'sender', 'message_type', 'content', 
                  'file_url', 'created_at', 'read_by', 'is_read', 'file']
+        field_relations = {'is_read': ()}  # Queries read_by itself
     
     def get_is_read(self, obj):
         """Check if message has been read by the current user"""
@@ -945,7 +1155,7 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             return obj.read_by.filter(id=request.user.id).exists()
         return False
 
-class ChatGroupSerializer(serializers.ModelSerializer):
+class ChatGroupSerializer(DynamicFieldsModelSerializer):
     members = UserSerializer(many=True, read_only=True)
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.IntegerField(read_only=True)
@@ -954,6 +1164,7 @@ class ChatGroupSerializer(serializers.ModelSerializer):
         model = ChatGroup
         fields = ['id', 'name', 'members', 'created_at', 'updated_at', 
                  'last_message', 'unread_count']
+        field_relations = {'last_message': ()}
     
     def get_last_message(self, obj):
         """Get the most recent message in the group"""
@@ -971,7 +1182,7 @@ class ChatGroupSerializer(serializers.ModelSerializer):
             }
         return None
 
-class LeaseAccInquirySerializer(serializers.ModelSerializer):
+class LeaseAccInquirySerializer(DynamicFieldsModelSerializer):
     accessory = AccessorySerializer(read_only=True)
     accessory_id = serializers.PrimaryKeyRelatedField(queryset=Accessory.objects.all(), write_only=True, source='accessory')
     
@@ -980,3 +1191,132 @@ class LeaseAccInquirySerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
 
+
+class CallBulkUpdateSerializer(serializers.Serializer):
+    """The same changes for every call in ``calls``; see call_bulk.py"""
+    calls = serializers.ListField(child=serializers.UUIDField(), min_length=1, max_length=500)
+    status = serializers.ChoiceField(choices=Call.STATUS_CHOICES, required=False)
+    technician_manager_approval = serializers.BooleanField(required=False)
+    client_verification = serializers.BooleanField(required=False)
+    is_checked = serializers.BooleanField(required=False)
+    director_comment = serializers.CharField(required=False, allow_blank=True)
+    technician_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    add_technician_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    remove_technician_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+
+    def validate(self, data):
+        if 'technician_ids' in data and ('add_technician_ids' in data or 'remove_technician_ids' in data):
+            raise serializers.ValidationError("Use either technician_ids or add/remove_technician_ids")
+        if len(data) == 1:
+            raise serializers.ValidationError("No changes given")
+
+        users = {
+            *data.get('technician_ids', []), *data.get('add_technician_ids', []), *data.get('remove_technician_ids', [])
+        }
+        known = set(CustomUser.objects.filter(pk__in=users).values_list('pk', flat=True))
+        if users - known:
+            raise serializers.ValidationError({'technician_ids': f"Unknown users: {', '.join(sorted(map(str, users - known)))}"})
+        return data
+
+class AuditEntrySerializer(DynamicFieldsModelSerializer):
+    actor_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AuditEntry
+        fields = ['id', 'action', 'changes', 'actor', 'actor_name', 'created_at']
+        field_relations = {'actor_name': ('actor',)}
+
+    def get_actor_name(self, obj):
+        if obj.actor:
+            return f"{obj.actor.firstname} {obj.actor.lastname}".strip()
+        return None
+
+class BillingRunSerializer(DynamicFieldsModelSerializer):
+    month = serializers.DateField(input_formats=['%Y-%m', '%Y-%m-%d'])
+    created_by_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BillingRun
+        fields = [
+            'id', 'month', 'copy_rate', 'myq_fee', 'vat_rate', 'lease_count', 'flagged_count',
+            'total_usage', 'total_amount', 'created_by', 'created_by_name', 'created_at',
+        ]
+        read_only_fields = [
+            'lease_count', 'flagged_count', 'total_usage', 'total_amount', 'created_by', 'created_at',
+        ]
+        extra_kwargs = {
+            'copy_rate': {'required': False},
+            'myq_fee': {'required': False},
+            'vat_rate': {'required': False},
+        }
+        field_relations = {'created_by_name': ('created_by',)}
+
+    def get_created_by_name(self, obj):
+        if obj.created_by:
+            return f"{obj.created_by.firstname} {obj.created_by.lastname}".strip()
+        return None
+
+    def create(self, validated_data):
+        # Rates left out fall back to the BILLING_* settings
+        return run_billing(user=request_user(self), **validated_data)
+
+class BillingLineSerializer(DynamicFieldsModelSerializer):
+    class Meta:
+        model = BillingLine
+        exclude = ['run']
+
+class StockTransferItemSerializer(serializers.Serializer):
+    """One requested line; ``quantity`` and ``target`` only apply to parts and accessories"""
+    item_type = serializers.ChoiceField(choices=list(TRANSFER_MODELS))
+    id = serializers.UUIDField()
+    quantity = serializers.IntegerField(min_value=1, required=False)
+    target = serializers.UUIDField(required=False)
+
+class StockTransferLineSerializer(DynamicFieldsModelSerializer):
+    item_id = serializers.SerializerMethodField()
+    reference = serializers.SerializerMethodField()
+    target_id = serializers.SerializerMethodField()
+
+    class Meta:
+        model = StockTransferLine
+        fields = ['id', 'item_type', 'item_id', 'reference', 'quantity', 'is_partial', 'target_id']
+
+    def get_item_id(self, obj):
+        return obj.machine_id or obj.part_id or obj.accessory_id
+
+    def get_reference(self, obj):
+        if obj.machine_id:
+            return obj.machine.serial_no
+        return (obj.part or obj.accessory).ref_no
+
+    def get_target_id(self, obj):
+        return obj.target_part_id or obj.target_accessory_id
+
+class StockTransferSerializer(DynamicFieldsModelSerializer):
+    from_store = serializers.PrimaryKeyRelatedField(queryset=Store.objects.all())
+    to_store = serializers.PrimaryKeyRelatedField(queryset=Store.objects.all())
+    from_store_name = serializers.CharField(source='from_store.store_name', read_only=True)
+    to_store_name = serializers.CharField(source='to_store.store_name', read_only=True)
+    items = StockTransferItemSerializer(many=True, write_only=True)
+    lines = StockTransferLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = StockTransfer
+        fields = [
+            'id', 'transfer_no', 'from_store', 'from_store_name', 'to_store', 'to_store_name',
+            'notes', 'items', 'lines', 'created_by', 'created_at'
+        ]
+        read_only_fields = ['transfer_no', 'created_by', 'created_at']
+
+    def create(self, validated_data):
+        try:
+            return create_transfer(
+                validated_data['from_store'],
+                validated_data['to_store'],
+                validated_data['items'],
+                user=request_user(self),
+                notes=validated_data.get('notes', '')
+            )
+        except TransferError as e:
+            raise serializers.ValidationError(e.errors)
+
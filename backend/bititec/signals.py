@@ -1,7 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import ChatGroup
+from .audit import SALE_FIELDS, SALE_ITEM_FIELDS, compact_value, diff, record_audit, snapshot
+from .call_rollups import update_call_rollups
+from .call_events import TRACKED_FIELDS, VALUE_FIELDS, changed_fields, record_call_event, snapshot_call
+from .models import Accessory, Call, ChatGroup, Machine, Part, Sale, SaleItem, Store
+from .store_summary import invalidate_store_summary
+from .workload import invalidate_technician_workload
 
 User = get_user_model()
 
@@ -26,4 +31,162 @@ def add_user_to_global_chat(sender, instance, created, **kwargs):
     """Add new users to the global chat group"""
     if created:  # Only for newly created users
         global_chat = get_or_create_global_chat()
-        global_chat.members.add(instance)
\ No newline at end of file
+        global_chat.members.add(instance)
+
+
+@receiver(post_init, sender=Machine)
+@receiver(post_init, sender=Part)
+@receiver(post_init, sender=Accessory)
+def remember_item_store(sender, instance, **kwargs):
+    """Keep the store the item was loaded with so a move invalidates both summaries"""
+    instance._loaded_store_id = instance.__dict__.get('store_id')
+
+
+@receiver(post_save, sender=Machine)
+@receiver(post_save, sender=Part)
+@receiver(post_save, sender=Accessory)
+@receiver(post_delete, sender=Machine)
+@receiver(post_delete, sender=Part)
+@receiver(post_delete, sender=Accessory)
+def invalidate_item_store_summary(sender, instance, **kwargs):
+    store_id = instance.__dict__.get('store_id')
+    invalidate_store_summary(store_id, getattr(instance, '_loaded_store_id', store_id))
+    instance._loaded_store_id = store_id
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_own_store_summary(sender, instance, **kwargs):
+    invalidate_store_summary(instance.pk)
+
+
+@receiver(post_init, sender=Call)
+def remember_call_values(sender, instance, **kwargs):
+    snapshot_call(instance)
+
+
+@receiver(post_save, sender=Call)
+def call_saved(sender, instance, created, **kwargs):
+    if created:
+        values = instance.__dict__
+        record_call_event(instance.pk, instance.ticket_no, 'created',
+                          changes={field: values.get(field) for field in VALUE_FIELDS})
+        record_audit('Call', instance.pk, 'created', {
+            field: [None, compact_value(values[field])] for field in VALUE_FIELDS if values.get(field) not in (None, '')
+        })
+        invalidate_technician_workload()
+    else:
+        changed = changed_fields(instance)
+        if changed:
+            record_call_event(instance.pk, instance.ticket_no, 'updated', changed=changed, changes={
+                field: instance.__dict__[field] for field in changed if field in VALUE_FIELDS
+            })
+            record_audit('Call', instance.pk, 'updated', diff(instance._loaded_values, instance, TRACKED_FIELDS))
+        if 'status' in changed:
+            invalidate_technician_workload()
+    update_call_rollups([instance], created=created)
+    snapshot_call(instance)
+
+
+@receiver(pre_delete, sender=Call)
+def remember_call_technicians(sender, instance, **kwargs):
+    # The through rows are gone by post_delete
+    instance._deleted_technicians = [str(pk) for pk in instance.technician.values_list('id', flat=True)]
+
+
+@receiver(post_delete, sender=Call)
+def call_deleted(sender, instance, **kwargs):
+    record_call_event(instance.pk, instance.ticket_no, 'deleted',
+                      removed=getattr(instance, '_deleted_technicians', []))
+    record_audit('Call', instance.pk, 'deleted', {'ticket_no': [instance.ticket_no, None]})
+    invalidate_technician_workload()
+    update_call_rollups([instance], deleted=True)
+
+
+@receiver(m2m_changed, sender=Call.technician.through)
+def call_technicians_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear', 'post_clear'):
+        return
+    if action == 'pre_clear':
+        # pk_set is empty for clear(); note who is being removed before the rows go
+        instance._cleared_pks = set(
+            instance.calls.values_list('id', flat=True) if reverse else instance.technician.values_list('id', flat=True)
+        )
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_pks', set())
+    invalidate_technician_workload()
+
+    key = 'added' if action == 'post_add' else 'removed'
+    if reverse:
+        # user.calls.add(...): one event per call for this technician
+        calls = dict(Call.objects.filter(pk__in=pk_set).values_list('id', 'ticket_no'))
+        for call_id, ticket_no in calls.items():
+            record_call_event(call_id, ticket_no, 'updated', **{key: [str(instance.pk)]})
+        changes = {call_id: {instance.pk} for call_id in calls}
+    elif pk_set:
+        record_call_event(instance.pk, instance.ticket_no, 'updated', **{key: [str(pk) for pk in pk_set]})
+        changes = {instance.pk: set(pk_set)}
+    else:
+        return
+    audit_technician_changes(changes, added=action == 'post_add')
+
+
+def audit_technician_changes(changes, added):
+    """Audit technician lists as [before, after] from the through rows as they are now"""
+    current = {}
+    for call_id, user_id in Call.technician.through.objects.filter(
+        call_id__in=list(changes)
+    ).values_list('call_id', 'customuser_id'):
+        current.setdefault(call_id, set()).add(user_id)
+    for call_id, user_ids in changes.items():
+        after = current.get(call_id, set())
+        before = after - user_ids if added else after | user_ids
+        record_audit('Call', call_id, 'updated', {
+            'technician': [sorted(map(str, before)), sorted(map(str, after))]
+        })
+
+
+@receiver(post_init, sender=Sale)
+def remember_sale_values(sender, instance, **kwargs):
+    instance._audit_values = snapshot(instance, SALE_FIELDS)
+
+
+@receiver(post_init, sender=SaleItem)
+def remember_sale_item_values(sender, instance, **kwargs):
+    instance._audit_values = snapshot(instance, SALE_ITEM_FIELDS)
+
+
+@receiver(post_save, sender=Sale)
+def audit_sale(sender, instance, created, **kwargs):
+    if created:
+        record_audit('Sale', instance.pk, 'created', {
+            field: [None, compact_value(value)] for field, value in snapshot(instance, SALE_FIELDS).items()
+            if value not in (None, '')
+        })
+    else:
+        record_audit('Sale', instance.pk, 'updated', diff(instance._audit_values, instance, SALE_FIELDS))
+    instance._audit_values = snapshot(instance, SALE_FIELDS)
+
+
+@receiver(post_delete, sender=Sale)
+def audit_sale_deleted(sender, instance, **kwargs):
+    record_audit('Sale', instance.pk, 'deleted', {'sale_no': [instance.sale_no, None]})
+
+
+@receiver(post_save, sender=SaleItem)
+@receiver(post_delete, sender=SaleItem)
+def audit_sale_item(sender, instance, created=False, **kwargs):
+    """Item changes go on the sale's history as ``items.<item id>`` entries"""
+    item = f'items.{instance.pk}'
+    values = snapshot(instance, SALE_ITEM_FIELDS)
+    if created:
+        changes = {item: [None, compact_value(values)]}
+    elif kwargs['signal'] is post_delete:
+        changes = {item: [compact_value(instance._audit_values), None]}
+    else:
+        changes = {
+            f'{item}.{field}': old_new for field, old_new in diff(instance._audit_values, instance, SALE_ITEM_FIELDS).items()
+        }
+    record_audit('Sale', instance.sale_id, 'updated', changes)
+    instance._audit_values = values
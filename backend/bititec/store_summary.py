@@ -0,0 +1,128 @@
+"""
+Per-store stock summaries.
+
+All requested stores are summarised with one grouped UNION ALL over the
+machine, part and accessory tables and the result is cached per store.
+Anything that changes an item's store, status, condition, quantity or value
+must call invalidate_store_summary() (model saves/deletes do so through
+signals; set-based .update() paths call it explicitly). Summaries are only
+cached with STORE_SUMMARY_CACHE set, i.e. in a cache shared by every worker;
+otherwise each request computes them.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BigIntegerField, CharField, Count, F, Sum, Value
+from django.db.models.functions import Cast
+
+from .models import Accessory, Machine, Part
+
+CACHE_KEY = 'bititec:store-summary:{}'
+CACHE_TIMEOUT = 60 * 10
+
+# kind -> (model, status field, condition field)
+SUMMARY_MODELS = {
+    'machines': (Machine, 'machine_status', 'machine_condition'),
+    'parts': (Part, 'part_status', 'part_condition'),
+    'accessories': (Accessory, 'acc_status', 'acc_condition'),
+}
+
+# Machines in these states are not physically in the store
+OFF_SITE_STATUSES = {'Sold', 'Leased'}
+
+
+def cache_key(store_id):
+    return CACHE_KEY.format(store_id)
+
+
+def invalidate_store_summary(*store_ids):
+    """Drop the cached summaries once the current transaction commits"""
+    keys = [cache_key(store_id) for store_id in store_ids if store_id]
+    if keys and settings.STORE_SUMMARY_CACHE:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def empty_totals():
+    return {'count': 0, 'units': 0, 'value': 0}
+
+
+def empty_summary():
+    summary = {
+        kind: {**empty_totals(), 'by_status': {}, 'by_condition': {}}
+        for kind in SUMMARY_MODELS
+    }
+    summary['total'] = empty_totals()
+    summary['units_in_store'] = 0
+    return summary
+
+
+def add_totals(totals, items, units, value):
+    totals['count'] += items
+    totals['units'] += units
+    totals['value'] += value
+
+
+def grouped_stock(store_ids):
+    """One row per (store, kind, status, condition) with item count, units and stock value"""
+    querysets = [
+        model.objects.filter(store_id__in=store_ids).order_by().values(
+            summary_store=F('store_id'),
+            summary_kind=Value(kind, output_field=CharField()),
+            summary_status=F(status_field),
+            summary_condition=F(condition_field),
+        ).annotate(
+            summary_items=Count('id'),
+            summary_units=Sum('quantity'),
+            summary_value=Sum(Cast('unit_value', BigIntegerField()) * F('quantity')),
+        )
+        for kind, (model, status_field, condition_field) in SUMMARY_MODELS.items()
+    ]
+    first, rest = querysets[0], querysets[1:]
+    return first.union(*rest, all=True)
+
+
+def compute_store_summaries(stores):
+    """Build summaries for ``stores`` (Store instances) in a single query"""
+    summaries = {store.pk: empty_summary() for store in stores}
+
+    for row in grouped_stock(list(summaries)):
+        summary = summaries[row['summary_store']]
+        kind = summary[row['summary_kind']]
+        items, units, value = row['summary_items'], row['summary_units'] or 0, row['summary_value'] or 0
+
+        add_totals(kind, items, units, value)
+        add_totals(kind['by_status'].setdefault(row['summary_status'], empty_totals()), items, units, value)
+        add_totals(kind['by_condition'].setdefault(row['summary_condition'], empty_totals()), items, units, value)
+        add_totals(summary['total'], items, units, value)
+        if not (row['summary_kind'] == 'machines' and row['summary_status'] in OFF_SITE_STATUSES):
+            summary['units_in_store'] += units
+
+    for store in stores:
+        summary = summaries[store.pk]
+        summary['store_size'] = store.store_size
+        summary['utilisation'] = (
+            round(summary['units_in_store'] * 100 / store.store_size, 2) if store.store_size > 0 else None
+        )
+    return summaries
+
+
+def get_store_summaries(stores):
+    """Summaries keyed by store id, served from cache where possible"""
+    stores = list(stores)
+    if not settings.STORE_SUMMARY_CACHE:
+        return compute_store_summaries(stores)
+    cached = cache.get_many([cache_key(store.pk) for store in stores])
+    summaries = {}
+    missing = []
+    for store in stores:
+        summary = cached.get(cache_key(store.pk))
+        if summary is None:
+            missing.append(store)
+        else:
+            summaries[store.pk] = summary
+
+    if missing:
+        computed = compute_store_summaries(missing)
+        cache.set_many({cache_key(pk): summary for pk, summary in computed.items()}, CACHE_TIMEOUT)
+        summaries.update(computed)
+    return summaries
@@ -1,3 +1,984 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+import time
+import uuid
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .audit import audit_batch
+from .billing import run_billing
+from .call_bulk import bulk_update_calls
+from .call_parts import sync_call_parts
+from .filters import filter_date_range
+from .importers import InventoryImporter
+from .inventory import consume_stock, record_movement
+from .lease_lifecycle import expire_leases, expiry_counts, upcoming_expiries
+from .models import (
+    Accessory, AuditEntry, Call, CallRollup, ChatGroup, ChatMessage, Client, CustomUser, DocumentSequence, LeaseContract,
+    LeaseAccInquiry, LeasePartInquiry, Machine, MeterReading, Part, Sale, SaleItem, StockTransfer, Store,
+    StoreInquiry,
+)
+from .numbering import DocumentNumberAllocator, document_period
+from .reading_imports import ingest_meter_readings
+from .readings import missing_months
+from .serializers import LeaseContractSerializer, StockTransferSerializer
+from .store_summary import cache_key, get_store_summaries
+from .transfers import TransferError, create_transfer
+from . import workload
+
+
+def run_with_lock_retry(func, attempts=200):
+    """SQLite's shared-cache test database reports lock contention instead of waiting"""
+    for _ in range(attempts):
+        try:
+            return func()
+        except OperationalError as e:
+            if connection.vendor != 'sqlite' or 'locked' not in str(e):
+                raise
+            time.sleep(0.005)
+    raise AssertionError('gave up waiting for the database lock')
+
+
+def create_user(role):
+    return CustomUser.objects.create_user(
+        f"{role.lower().replace(' ', '.')}@example.com", 'pw', firstname=role, lastname='User',
+        phonenumber=700000000, role=role, active=True
+    )
+
+
+def api_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class ConsumeStockConcurrencyTests(TransactionTestCase):
+    threads = 25
+    stock = 10
+
+    def setUp(self):
+        store = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        self.part = Part.objects.create(
+            part_name='Toner', part_brand='Kyocera', part_type='Toner', ref_no='TK-1150',
+            unit_value=50, intial_quantity=self.stock, quantity=self.stock, part_condition='New',
+            color_type='Black', store=store, supplier_name='Supplier', part_status='Available'
+        )
+        record_movement(self.part, self.stock, 'Receipt')
+
+    def test_parallel_consumers_never_oversell(self):
+        results = []
+        barrier = threading.Barrier(self.threads)
+
+        def worker():
+            try:
+                part = Part.objects.get(pk=self.part.pk)
+                barrier.wait()
+                results.append(run_with_lock_retry(lambda: consume_stock(part, 1, 'Sale')))
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.part.refresh_from_db()
+        self.assertEqual(results.count(True), self.stock)
+        self.assertEqual(results.count(False), self.threads - self.stock)
+        self.assertEqual(self.part.quantity, 0)
+        self.assertEqual(self.part.part_status, 'Out of Stock')
+        self.assertEqual(self.part.stock_balance.on_hand, 0)
+        self.assertEqual(self.part.stock_balance.sold, self.stock)
+
+
+class ConsumeStockTests(TestCase):
+    def setUp(self):
+        store = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        self.part = Part.objects.create(
+            part_name='Drum', part_brand='Kyocera', part_type='Drum', ref_no='DK-1150',
+            unit_value=80, intial_quantity=3, quantity=3, part_condition='New',
+            color_type='Black', store=store, supplier_name='Supplier', part_status='Available'
+        )
+
+    def test_refuses_without_writing_when_stock_is_short(self):
+        self.assertFalse(consume_stock(self.part, 4, 'Sale'))
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 3)
+        self.assertFalse(self.part.stock_movements.exists())
+
+    def test_status_flips_only_when_emptied(self):
+        self.assertTrue(consume_stock(self.part, 2, 'Sale'))
+        self.part.refresh_from_db()
+        self.assertEqual((self.part.quantity, self.part.part_status), (1, 'Available'))
+        self.assertTrue(consume_stock(self.part, 1, 'Sale'))
+        self.part.refresh_from_db()
+        self.assertEqual((self.part.quantity, self.part.part_status), (0, 'Out of Stock'))
+
+
+class StockLedgerOpeningTests(TestCase):
+    """Items that had stock before the ledger existed have no StockBalance yet"""
+
+    def setUp(self):
+        store = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        self.part = Part.objects.create(
+            part_name='Drum', part_brand='Kyocera', part_type='Drum', ref_no='DK-1150',
+            unit_value=80, intial_quantity=12, quantity=10, part_condition='New',
+            color_type='Black', store=store, supplier_name='Supplier', part_status='Available'
+        )
+        self.sale = Sale.objects.create(local_client_name='Walk-in', sale_type='Local')
+        # Sold before the ledger: the row exists but no movement does
+        SaleItem.objects.bulk_create([
+            SaleItem(sale=self.sale, sale_type='Part', part=self.part, quantity=2, unit_price=80, total_price=160)
+        ])
+
+    def test_first_movement_opens_at_the_stored_figures(self):
+        SaleItem(sale=self.sale, sale_type='Part', part=self.part, quantity=2, unit_price=80).save()
+
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 8)
+        self.assertEqual(
+            (self.part.available_quantity(), self.part.sold_quantity(), self.part.leased_quantity()), (8, 4, 0)
+        )
+        opening, sale = self.part.stock_movements.order_by('created_at')
+        self.assertEqual((opening.delta, opening.sold_after, sale.delta, sale.sold_after), (10, 2, -2, 4))
+        call_command('rebuild_stock_balances', '--check-only', stdout=io.StringIO())
+
+    def test_seeded_opening_keeps_earlier_sales(self):
+        call_command('rebuild_stock_balances', '--seed', stdout=io.StringIO())
+        self.part.refresh_from_db()
+        self.assertEqual((self.part.available_quantity(), self.part.sold_quantity()), (10, 2))
+
+        consume_stock(self.part, 1, 'Adjustment')
+        call_command('rebuild_stock_balances', stdout=io.StringIO())
+        self.part.stock_balance.refresh_from_db()
+        self.assertEqual((self.part.stock_balance.on_hand, self.part.stock_balance.sold), (9, 2))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class InventorySearchTests(TestCase):
+    def test_items_created_after_migrating_are_found(self):
+        store = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        Part.objects.create(
+            part_name='Drum', part_brand='Kyocera', part_type='Drum', ref_no='DK-1150',
+            unit_value=80, intial_quantity=5, quantity=5, part_condition='New',
+            color_type='Black', store=store, supplier_name='Supplier', part_status='Available'
+        )
+        Accessory.objects.create(
+            acc_name='Paper feeder', acc_brand='Kyocera', acc_type='Feeder', ref_no='PF-5150',
+            unit_value=120, intial_quantity=2, quantity=2, acc_condition='New',
+            color_type='Black', store=store, supplier_name='Supplier', acc_status='Available'
+        )
+        client = api_client(create_user('Director'))
+
+        for query, item_type in (('1150', 'part'), ('feeder', 'accessory')):
+            with self.subTest(query=query):
+                results = client.get(f'/api/inventory/search/?q={query}').data['results']
+                self.assertEqual([row['item_type'] for row in results], [item_type])
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_fts_ai'")
+                self.assertEqual(len(cursor.fetchall()), 3)
+
+
+class InventoryImportTests(TestCase):
+    def setUp(self):
+        self.main = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        self.branch = Store.objects.create(store_name='Branch', store_location='Town', store_size=50)
+        Part.objects.create(
+            part_name='Drum', part_brand='Kyocera', part_type='Drum', ref_no='DK-1150',
+            unit_value=80, intial_quantity=5, quantity=5, part_condition='New',
+            color_type='Black', store=self.main, supplier_name='Supplier', part_status='Available'
+        )
+
+    def row(self, ref_no, store='Main'):
+        return {
+            'part_name': 'Toner', 'part_brand': 'Kyocera', 'part_type': 'Toner', 'ref_no': ref_no, 'unit_value': '50',
+            'quantity': '4', 'part_condition': 'New', 'color_type': 'Black', 'supplier_name': 'Supplier',
+            'store': store,
+        }
+
+    def test_ref_nos_are_unique_per_store(self):
+        report = InventoryImporter('part').run([
+            self.row('DK-1150'), self.row('DK-1150', store='Branch'), self.row('TK-1150'), self.row('TK-1150'),
+        ])
+        self.assertEqual((report.created, report.failed), (2, 2))
+        self.assertEqual(sorted(error['row'] for error in report.errors), [2, 5])
+        self.assertEqual(Part.objects.get(ref_no='DK-1150', store=self.branch).stock_balance.on_hand, 4)
+
+    def test_a_chunk_that_keeps_clashing_is_reported_not_raised(self):
+        write = InventoryImporter.write
+
+        def clashing_write(importer, items):
+            if any(item.ref_no == 'CLASH' for item in items):
+                raise IntegrityError('UNIQUE constraint failed')
+            return write(importer, items)
+
+        with mock.patch.object(InventoryImporter, 'write', autospec=True, side_effect=clashing_write):
+            report = InventoryImporter('part', chunk_size=2).run([
+                self.row('TK-1'), self.row('CLASH'), self.row('TK-2'),
+            ])
+
+        self.assertEqual((report.total_rows, report.created, report.failed), (3, 1, 2))
+        self.assertEqual([error['row'] for error in report.errors], [2, 3])
+        self.assertEqual(
+            list(Part.objects.filter(ref_no__startswith='TK-').values_list('ref_no', flat=True)), ['TK-2']
+        )
+
+
+class StockTransferTests(TestCase):
+    def setUp(self):
+        self.main = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        self.branch = Store.objects.create(store_name='Branch', store_location='Town', store_size=50)
+        self.part = Part.objects.create(
+            part_name='Drum', part_brand='Kyocera', part_type='Drum', ref_no='DK-1150',
+            unit_value=80, intial_quantity=5, quantity=5, part_condition='New',
+            color_type='Black', store=self.main, supplier_name='Supplier', part_status='Available'
+        )
+        record_movement(self.part, 5, 'Receipt')
+
+    def transfer(self, quantity=None):
+        line = {'item_type': 'part', 'id': self.part.pk, 'quantity': quantity}
+        return create_transfer(self.main, self.branch, [line])
+
+    def branch_copy(self):
+        return Part.objects.get(ref_no='DK-1150', store=self.branch)
+
+    def test_whole_move_changes_store(self):
+        self.transfer()
+        self.part.refresh_from_db()
+        self.assertEqual((self.part.store_id, self.part.quantity, self.part.is_transfer), (self.branch.pk, 5, True))
+        self.assertEqual(Part.objects.filter(ref_no='DK-1150').count(), 1)
+
+    def test_partial_move_stocks_the_same_ref_no_in_the_destination(self):
+        transfer = self.transfer(2)
+        self.part.refresh_from_db()
+        copy = self.branch_copy()
+        self.assertEqual((self.part.quantity, copy.quantity, copy.is_transfer), (3, 2, True))
+        self.assertEqual(copy.stock_balance.on_hand, 2)
+        line = transfer.lines.get()
+        self.assertEqual((line.is_partial, line.target_part_id), (True, copy.pk))
+
+    def test_repeat_transfers_add_to_the_existing_copy(self):
+        self.transfer(2)
+        self.transfer(1)
+        self.assertEqual(self.branch_copy().quantity, 3)
+
+        # Moving the rest merges into the copy instead of clashing with its ref_no
+        self.transfer()
+        self.part.refresh_from_db()
+        self.assertEqual(
+            (self.part.store_id, self.part.quantity, self.part.part_status), (self.main.pk, 0, 'Out of Stock')
+        )
+        self.assertEqual(self.branch_copy().quantity, 5)
+
+    def test_invalid_line_writes_nothing(self):
+        with self.assertRaises(TransferError) as raised:
+            self.transfer(6)
+        self.assertEqual(raised.exception.errors, {'items': {0: 'Only 5 in stock'}})
+        self.part.refresh_from_db()
+        self.assertEqual(self.part.quantity, 5)
+        self.assertFalse(Part.objects.filter(store=self.branch).exists())
+        self.assertEqual(self.part.stock_movements.count(), 1)
+
+
+@override_settings(STORE_SUMMARY_CACHE=True)
+class StoreSummaryCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.main = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        self.branch = Store.objects.create(store_name='Branch', store_location='Town', store_size=50)
+        self.part = Part.objects.create(
+            part_name='Drum', part_brand='Kyocera', part_type='Drum', ref_no='DK-1150',
+            unit_value=80, intial_quantity=5, quantity=5, part_condition='New',
+            color_type='Black', store=self.main, supplier_name='Supplier', part_status='Available'
+        )
+
+    def test_moving_an_item_invalidates_both_stores(self):
+        get_store_summaries([self.main, self.branch])
+        self.assertIsNotNone(cache.get(cache_key(self.branch.pk)))
+
+        # post_init remembers the store the part was loaded with
+        part = Part.objects.get(pk=self.part.pk)
+        part.store = self.branch
+        with self.captureOnCommitCallbacks(execute=True):
+            part.save()
+
+        self.assertIsNone(cache.get(cache_key(self.main.pk)))
+        self.assertIsNone(cache.get(cache_key(self.branch.pk)))
+        summaries = get_store_summaries([self.main, self.branch])
+        self.assertEqual(
+            (summaries[self.main.pk]['parts']['units'], summaries[self.branch.pk]['parts']['units']), (0, 5)
+        )
+
+    @override_settings(STORE_SUMMARY_CACHE=False)
+    def test_process_local_cache_is_left_alone(self):
+        self.assertEqual(get_store_summaries([self.main])[self.main.pk]['parts']['units'], 5)
+        self.assertIsNone(cache.get(cache_key(self.main.pk)))
+
+
+@override_settings(AUDIT_WRITE_BEHIND=False)
+class WorkloadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.technician = create_user('Technician')
+
+    def outstanding(self):
+        return workload.get_technician_workload()['technicians'][0]['outstanding']
+
+    @override_settings(STORE_SUMMARY_CACHE=True)
+    def test_shared_cache_is_invalidated_by_assignments(self):
+        self.assertEqual(self.outstanding(), 0)
+        self.assertIsNotNone(cache.get(workload.CACHE_KEY))
+        call = Call.objects.create(
+            contract_type='Lease', reported_by='Reception', fault_reported='Paper jam', status='Open'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            call.technician.add(self.technician)
+        self.assertEqual(self.outstanding(), 1)
+
+    @override_settings(STORE_SUMMARY_CACHE=False)
+    def test_process_local_cache_is_left_alone(self):
+        self.assertEqual(self.outstanding(), 0)
+        self.assertIsNone(cache.get(workload.CACHE_KEY))
+
+
+class DateRangeIndexTests(TestCase):
+    dates = {'start_date': '2024-01-01', 'end_date': '2024-01-31'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        Part.objects.bulk_create([
+            Part(
+                part_name=f'Toner {i}', part_brand='Kyocera', part_type='Toner', ref_no=f'TK-{i}',
+                unit_value=50, intial_quantity=5, quantity=5, part_condition='New', color_type='Black',
+                store=cls.store, supplier_name='Supplier',
+                part_status='Available' if i % 3 else 'Out of Stock'
+            )
+            for i in range(200)
+        ])
+        Call.objects.bulk_create([
+            Call(
+                contract_type='Lease', reported_by='Reception', fault_reported='Paper jam',
+                department='Service', ticket_no=f'TN-01/24/{i:05d}',
+                status='Complete' if i % 4 else 'Open'
+            )
+            for i in range(200)
+        ])
+
+    def assertUsesIndex(self, queryset, index_name):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables are cheaper to scan; make the planner show its index choice
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        self.assertIn(index_name, plan)
+
+    def test_filter_is_a_half_open_timestamp_range(self):
+        sql = str(filter_date_range(Part.objects.all(), self.dates).query)
+        self.assertNotIn('django_datetime_cast_date', sql)
+        self.assertNotIn('::date', sql)
+        self.assertIn('created_at" >=', sql)
+        self.assertIn('created_at" <', sql)
+
+    def test_inventory_filters_use_composite_indexes(self):
+        cases = [
+            (Machine.objects.filter(store=self.store, machine_status='Available'), 'machine_store_status_at_idx'),
+            (Part.objects.filter(store=self.store, part_status='Available'), 'part_store_status_at_idx'),
+            (Accessory.objects.filter(store=self.store, acc_status='Available'), 'acc_store_status_at_idx'),
+        ]
+        for queryset, index_name in cases:
+            with self.subTest(index=index_name):
+                self.assertUsesIndex(filter_date_range(queryset, self.dates), index_name)
+
+    def test_call_filters_use_status_index(self):
+        queryset = filter_date_range(Call.objects.filter(status='Open'), self.dates)
+        self.assertUsesIndex(queryset, 'call_status_created_at_idx')
+
+
+class DocumentNumberConcurrencyTests(TransactionTestCase):
+    workers = 8
+    numbers_per_worker = 2500
+
+    def test_parallel_workers_never_collide(self):
+        numbers = []
+        barrier = threading.Barrier(self.workers)
+
+        def worker():
+            # One allocator per thread stands in for one worker process
+            allocator = DocumentNumberAllocator(block_size=100)
+            allocated = []
+            try:
+                barrier.wait()
+                for _ in range(self.numbers_per_worker):
+                    allocated.append(run_with_lock_retry(lambda: allocator.allocate(Call, 'ticket_no', 'TN')))
+            finally:
+                numbers.extend(allocated)
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total = self.workers * self.numbers_per_worker
+        self.assertEqual(len(numbers), total)
+        self.assertEqual(len(set(numbers)), total)
+        sequence = DocumentSequence.objects.get(prefix='TN', period=document_period())
+        self.assertEqual(sequence.last_value, total)
+
+
+class DocumentNumberTests(TestCase):
+    def test_new_month_continues_after_existing_numbers(self):
+        period = document_period()
+        Call.objects.bulk_create([
+            Call(contract_type='Lease', reported_by='Reception', fault_reported='Paper jam',
+                 department='Service', ticket_no=f'TN-{period}/{number}')
+            for number in (4321, 99990, 12345)
+        ])
+        call = Call.objects.create(
+            contract_type='Lease', reported_by='Reception', fault_reported='Paper jam', department='Service'
+        )
+        self.assertEqual(call.ticket_no, f'TN-{period}/99991')
+
+
+@override_settings(AUDIT_WRITE_BEHIND=False)
+class AuditTrailTests(TestCase):
+    def setUp(self):
+        self.call = Call.objects.create(
+            contract_type='Lease', reported_by='Reception', fault_reported='Paper jam', department='Service'
+        )
+
+    def test_changes_in_one_batch_become_one_entry(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with audit_batch():
+                self.call.status = 'Pending'
+                self.call.save()
+                self.call.status = 'Complete'
+                self.call.director_comment = 'Done'
+                self.call.save()
+                self.call.director_comment = ''
+                self.call.save()
+
+        entry = AuditEntry.objects.get(object_id=self.call.pk, action='updated')
+        self.assertEqual(entry.changes['status'], ['Open', 'Complete'])
+        self.assertNotIn('director_comment', entry.changes)
+
+    def test_nothing_is_written_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.call.status = 'Pending'
+            self.call.save()
+        self.assertFalse(AuditEntry.objects.exists())
+
+
+def rollup_counts():
+    """{bucket: (calls, resolved, seconds)} for every bucket still holding calls"""
+    return {
+        row[0]: row[1:] for row in CallRollup.objects.filter(call_count__gt=0).values_list(
+            'bucket', 'call_count', 'resolved_count', 'resolution_seconds'
+        )
+    }
+
+
+@override_settings(AUDIT_WRITE_BEHIND=False)
+class CallBulkUpdateTests(TestCase):
+    def setUp(self):
+        self.technician = create_user('Technician')
+        self.other = create_user('Technician Manager')
+        self.calls = [
+            Call.objects.create(
+                contract_type='Lease', reported_by='Reception', fault_reported='Paper jam', department='Service'
+            )
+            for _ in range(2)
+        ]
+        for call in self.calls:
+            call.technician.add(self.technician)
+        self.ids = [call.pk for call in self.calls]
+
+    def bulk_update(self, changes, **technicians):
+        """Run bulk_update_calls and return the events it sent, keyed by call id"""
+        with mock.patch('bititec.call_events.send_call_events') as send:
+            with self.captureOnCommitCallbacks(execute=True):
+                result = bulk_update_calls(self.ids, changes, **technicians)
+        events = [event for call in send.call_args_list for event in call.args[0]]
+        self.assertEqual(len(events), len({event['call_id'] for event in events}))
+        return result, {event['call_id']: event for event in events}
+
+    def audits(self):
+        return {entry.object_id: entry for entry in AuditEntry.objects.filter(action='updated')}
+
+    def test_both_approvals_complete_the_calls(self):
+        _, events = self.bulk_update({'technician_manager_approval': True, 'client_verification': True})
+
+        for call in Call.objects.filter(pk__in=self.ids):
+            self.assertEqual(call.status, 'Complete')
+            self.assertIsNotNone(call.completed_at)
+            self.assertEqual(events[str(call.pk)]['changes']['status'], 'Complete')
+        self.assertEqual(set(self.audits()), set(self.ids))
+        self.assertEqual(self.audits()[self.ids[0]].changes['status'], ['Open', 'Complete'])
+
+        (bucket, (calls, resolved, _)), = rollup_counts().items()
+        self.assertTrue(bucket.endswith('|Complete'))
+        self.assertEqual((calls, resolved), (2, 2))
+
+    def test_status_change_moves_rollups_and_reopening_clears_completed_at(self):
+        self.bulk_update({'status': 'Complete'})
+        self.bulk_update({'status': 'In Progress'})
+
+        self.assertFalse(Call.objects.filter(pk__in=self.ids, completed_at__isnull=False).exists())
+        (bucket, counts), = rollup_counts().items()
+        self.assertEqual((bucket.rsplit('|', 1)[1], counts), ('In Progress', (2, 0, 0)))
+        self.assertEqual(AuditEntry.objects.filter(action='updated').count(), 4)
+
+    def test_technicians_added_and_removed(self):
+        (calls, results, missing), events = self.bulk_update(
+            {}, add_technicians=[self.other.pk], remove_technicians=[self.technician.pk]
+        )
+
+        self.assertEqual((len(calls), missing), (2, []))
+        for call in Call.objects.filter(pk__in=self.ids).prefetch_related('technician'):
+            self.assertEqual(list(call.technician.all()), [self.other])
+            self.assertEqual(results[call.pk]['technicians_added'], [str(self.other.pk)])
+            event = events[str(call.pk)]
+            self.assertEqual(
+                (event['technicians_added'], event['technicians_removed']),
+                ([str(self.other.pk)], [str(self.technician.pk)])
+            )
+            self.assertEqual(
+                self.audits()[call.pk].changes['technician'],
+                [[str(self.technician.pk)], [str(self.other.pk)]]
+            )
+
+        # Calls already in that state change nothing and send nothing
+        (_, results, _), events = self.bulk_update({}, add_technicians=[self.other.pk])
+        self.assertEqual(events, {})
+        self.assertEqual(results[self.ids[0]]['technicians_added'], [])
+
+
+class CallRollupTests(TestCase):
+    def test_incremental_rollups_match_a_rebuild(self):
+        client = Client.objects.create(client_name='Acme', client_location='Town')
+        calls = [
+            Call.objects.create(
+                contract_type='Lease', reported_by='Reception', fault_reported='Paper jam', department=department
+            )
+            for department in ('Service', 'Service', 'Sales', 'Service')
+        ]
+        calls[0].status = 'Complete'
+        calls[0].save()
+        calls[1].client = client
+        calls[1].status = 'In Progress'
+        calls[1].save()
+        calls[2].department = 'Service'
+        calls[2].save()
+        calls[3].status = 'Complete'
+        calls[3].save()
+        calls[3].status = 'Pending'  # Reopened; its resolution leaves the Complete bucket
+        calls[3].save()
+        Call.objects.get(pk=calls[2].pk).delete()
+
+        incremental = rollup_counts()
+        self.assertEqual(sum(count for count, _, _ in incremental.values()), 3)
+        call_command('rebuild_call_rollups', stdout=io.StringIO())
+        self.assertEqual(rollup_counts(), incremental)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ExportPermissionTests(TestCase):
+    EXPORTS = [
+        '/api/machines/export/', '/api/parts/export/', '/api/accessories/export/',
+        '/api/service-calls/export/', '/api/leases/export/', '/api/sales/export/',
+    ]
+
+    def test_only_directors_can_export(self):
+        technician, director = api_client(create_user('Technician')), api_client(create_user('Director'))
+        for url in self.EXPORTS:
+            with self.subTest(url=url):
+                self.assertEqual(APIClient().get(url).status_code, 401)
+                self.assertEqual(technician.get(url).status_code, 403)
+                self.assertEqual(director.get(url).status_code, 200)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class DynamicFieldsTests(TestCase):
+    def setUp(self):
+        self.main = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        branch = Store.objects.create(store_name='Branch', store_location='Town', store_size=50)
+        part = Part.objects.create(
+            part_name='Drum', part_brand='Kyocera', part_type='Drum', ref_no='DK-1150',
+            unit_value=80, intial_quantity=9, quantity=9, part_condition='New',
+            color_type='Black', store=self.main, supplier_name='Supplier', part_status='Available'
+        )
+        for _ in range(3):
+            create_transfer(self.main, branch, [{'item_type': 'part', 'id': part.pk, 'quantity': 1}])
+        self.client = api_client(create_user('Director'))
+
+    def get(self, query=''):
+        """(results, SQL of the queries run) for the transfer list"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/stock-transfers/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results'], [query['sql'] for query in queries.captured_queries]
+
+    def test_full_response_by_default(self):
+        results, queries = self.get()
+        self.assertIn('from_store_name', results[0])
+        self.assertEqual(set(results[0]['lines'][0]), {
+            'id', 'item_type', 'item_id', 'reference', 'quantity', 'is_partial', 'target_id'
+        })
+        self.assertEqual(len(queries), 3)  # Count, transfers with both stores, lines with their items
+        self.assertIn('JOIN', queries[1])
+        self.assertIn('JOIN', queries[2])
+
+    def test_fields_drop_unused_joins_and_prefetches(self):
+        results, queries = self.get('?fields=id,transfer_no')
+        self.assertEqual([set(row) for row in results], [{'id', 'transfer_no'}] * 3)
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('JOIN', queries[1])
+
+    def test_unexpanded_nested_lists_render_keys_only(self):
+        results, queries = self.get('?fields=id,lines')
+        self.assertEqual(len(results[0]['lines']), 1)
+        self.assertIsInstance(results[0]['lines'][0], uuid.UUID)
+        # The lines are still fetched, without the item joins their serializer needed
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('JOIN', queries[2])
+
+    def test_expand_keeps_nested_objects(self):
+        results, queries = self.get('?fields=id&expand=lines')
+        self.assertEqual(set(results[0]), {'id', 'lines'})
+        self.assertEqual(results[0]['lines'][0]['reference'], 'DK-1150')
+        self.assertEqual(len(queries), 3)
+
+    def test_walk_in_call_values_respect_the_selection(self):
+        call = Call.objects.create(
+            contract_type='WalkIn', reported_by='Reception', fault_reported='Paper jam', department='Service',
+            client_name='Jane Doe', client_location='Town', walk_in_machine_name='TASKalfa', walk_in_serial_no='W-1',
+        )
+        url = f'/api/service-calls/{call.pk}/'
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(f'{url}?fields=id,status').data
+        self.assertEqual(set(data), {'id', 'status'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+
+        data = self.client.get(f'{url}?fields=client_name,item_name,serial_no').data
+        self.assertEqual(data, {'client_name': 'Jane Doe', 'item_name': 'TASKalfa', 'serial_no': 'W-1'})
+
+    def test_constructor_selection_only_applies_to_the_root(self):
+        transfer = StockTransfer.objects.first()
+        data = StockTransferSerializer(transfer, fields=['transfer_no', 'lines'], expand=['lines']).data
+        self.assertEqual(set(data), {'transfer_no', 'lines'})
+        self.assertIn('reference', data['lines'][0])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PartsUsageTests(TestCase):
+    def test_cursor_mode_still_pages_the_grouped_rows(self):
+        call = Call.objects.create(
+            contract_type='Lease', reported_by='Reception', fault_reported='Faint print', department='Service',
+            walk_in_machine_name='TASKalfa 2553ci', parts_used=[{'ref_no': 'DK-1150', 'quantity': 2}, 'Drum unit'],
+        )
+        sync_call_parts([call])
+
+        response = api_client(create_user('Director')).get('/api/service-calls/parts-usage/?pagination=cursor')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            (response.data['results'][0]['ref_no'], response.data['results'][0]['quantity']), ('DK-1150', 2)
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ChatMessagePaginationTests(TestCase):
+    def setUp(self):
+        self.user = create_user('Technician')
+        self.group = ChatGroup.objects.create(name='Service')
+        self.group.members.add(self.user)
+        start = datetime.datetime(2026, 1, 1, 9, tzinfo=datetime.timezone.utc)
+        for minute in range(60):
+            message = ChatMessage.objects.create(chat_group=self.group, sender=self.user, content=f'Message {minute}')
+            ChatMessage.objects.filter(pk=message.pk).update(created_at=start + datetime.timedelta(minutes=minute))
+
+    def test_group_messages_open_at_the_newest(self):
+        client = api_client(self.user)
+        page = client.get(f'/api/chat-groups/{self.group.pk}/messages/').data
+        self.assertEqual(len(page['results']), 50)
+        self.assertEqual(page['results'][0]['content'], 'Message 59')
+
+        older = client.get(page['next']).data
+        self.assertEqual(
+            [message['content'] for message in older['results']], [f'Message {n}' for n in range(9, -1, -1)]
+        )
+
+    def test_message_list_is_newest_first(self):
+        results = api_client(self.user).get('/api/chat-messages/?page_size=2').data['results']
+        self.assertEqual([message['content'] for message in results], ['Message 59', 'Message 58'])
+
+
+class LeaseTestCase(TestCase):
+    """A store and client to lease machines from"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.store = Store.objects.create(store_name='Main', store_location='HQ', store_size=100)
+        cls.lease_client = Client.objects.create(client_name='Acme', client_location='HQ')
+
+    @classmethod
+    def create_machine(cls, serial_no):
+        return Machine.objects.create(
+            machine_name='TASKalfa', machine_brand='Kyocera', machine_type='Copier', serial_no=serial_no,
+            unit_value=1000, quantity=1, machine_condition='New', color_type='Colour', store=cls.store,
+            supplier_name='Supplier', machine_status='Leased'
+        )
+
+    @classmethod
+    def create_lease(cls, machine, from_date, to_date, **fields):
+        return LeaseContract.objects.create(
+            client=cls.lease_client, department='Finance', item=machine, store=cls.store, contract_type='Lease',
+            from_date=from_date, to_date=to_date, **fields
+        )
+
+
+class MissingReadingTests(LeaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.machine = cls.create_machine('SN-1')
+        cls.leases = [
+            cls.create_lease(cls.machine, datetime.date(2020, 1, 15), datetime.date(2020, 6, 30))
+            for _ in range(3)
+        ]
+        MeterReading.objects.bulk_create([
+            MeterReading(lease=lease, machine=cls.machine, month=datetime.date(2020, month, 1), meter_reading=month)
+            for lease in cls.leases for month in (2, 3, 5)
+        ])
+
+    def test_months_stop_at_the_end_of_the_lease(self):
+        recorded = {(2020, 2), (2020, 3), (2020, 5)}
+        missing = missing_months(datetime.date(2020, 1, 15), datetime.date(2020, 6, 30), recorded)
+        self.assertEqual(missing, ['2020-01', '2020-04', '2020-06'])
+
+    def test_list_loads_recorded_months_in_one_query(self):
+        leases = LeaseContract.objects.filter(pk__in=[lease.pk for lease in self.leases])
+        serializer = LeaseContractSerializer(leases, many=True, fields=['id', 'missing_readings'])
+        with self.assertNumQueries(2):  # The leases, then every recorded month
+            data = serializer.data
+        self.assertEqual([row['missing_readings'] for row in data], [['2020-01', '2020-04', '2020-06']] * 3)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class StockListQueryTests(LeaseTestCase):
+    """The part and accessory lists cost the same number of queries however many rows and relations a page has"""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        machine = cls.create_machine('SN-1')
+        cls.lease = cls.create_lease(machine, datetime.date(2020, 1, 1), datetime.date(2099, 12, 31))
+        MeterReading.objects.create(
+            lease=cls.lease, machine=machine, month=datetime.date(2020, 1, 1), meter_reading=1
+        )
+        cls.user = create_user('Director')
+        call = Call.objects.create(
+            contract_type='Lease', reported_by='Reception', fault_reported='Faint print', department='Service'
+        )
+        cls.store_inquiry = StoreInquiry.objects.create(
+            service_call=call, part_name='Drum', quantity=1, requested_by=cls.user
+        )
+        cls.sale = Sale.objects.create(local_client_name='Walk-in', sale_type='Local')
+
+    def add_stock(self, number):
+        """A part and an accessory, each leased and sold once"""
+        part = Part.objects.create(
+            part_name='Drum', part_brand='Kyocera', part_type='Drum', ref_no=f'DK-{number}',
+            unit_value=80, intial_quantity=5, quantity=3, part_condition='New',
+            color_type='Black', store=self.store, supplier_name='Supplier', part_status='Available'
+        )
+        accessory = Accessory.objects.create(
+            acc_name='Feeder', acc_brand='Kyocera', acc_type='Feeder', ref_no=f'PF-{number}',
+            unit_value=120, intial_quantity=5, quantity=3, acc_condition='New',
+            color_type='Black', store=self.store, supplier_name='Supplier', acc_status='Available'
+        )
+        # bulk_create skips the stock signals; only the related rows matter here
+        inquiry = {'lease': self.lease, 'quantity': 1, 'amount': 80, 'vat': 0, 'date': datetime.date(2020, 2, 1)}
+        LeasePartInquiry.objects.bulk_create([
+            LeasePartInquiry(store_inquiry=self.store_inquiry, part=part, **inquiry)
+        ])
+        LeaseAccInquiry.objects.bulk_create([LeaseAccInquiry(accessory=accessory, **inquiry)])
+        SaleItem.objects.bulk_create([
+            SaleItem(sale=self.sale, sale_type='Part', part=part, quantity=1, unit_price=80, total_price=80),
+            SaleItem(sale=self.sale, sale_type='Accessory', accessory=accessory, quantity=1, unit_price=120,
+                     total_price=120),
+        ])
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        client = api_client(self.user)
+        urls = ['/api/parts/', '/api/accessories/']
+        self.add_stock(0)
+        baselines = {}
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(client.get(url).data['results']), 1)
+            baselines[url] = len(queries)
+
+        for number in range(1, 6):
+            self.add_stock(number)
+        for url in urls:
+            with self.subTest(url=url), self.assertNumQueries(baselines[url]):
+                results = client.get(url).data['results']
+            self.assertEqual(len(results), 6)
+            self.assertEqual(
+                {(row['leased_quantity'], row['sold_quantity'], len(row['sold_items'])) for row in results}, {(1, 1, 1)}
+            )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class OverdueReadingTests(LeaseTestCase):
+    def test_cursor_mode_still_pages_by_client_and_lease_no(self):
+        today = timezone.localdate()
+        leases = [
+            self.create_lease(
+                self.create_machine(f'SN-{number}'), today.replace(day=1), today + datetime.timedelta(days=365)
+            )
+            for number in range(11)
+        ]
+        lease_nos = sorted(lease.lease_no for lease in leases)
+
+        client = api_client(create_user('Director'))
+        response = client.get('/api/leases/missing-readings/?pagination=cursor')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['lease_no'] for row in response.data['results']], lease_nos[:10])
+        self.assertEqual(response.data['results'][0]['missing_months'], [f'{today:%Y-%m}'])
+        second = client.get(response.data['next']).data
+        self.assertEqual(
+            ([row['lease_no'] for row in second['results']], second['cycle']), (lease_nos[10:], f'{today:%Y-%m}')
+        )
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LeaseMeterReadingTests(LeaseTestCase):
+    def test_cursor_mode_keeps_newest_month_first(self):
+        machine = self.create_machine('SN-1')
+        lease = self.create_lease(machine, datetime.date(2020, 1, 1), datetime.date(2020, 12, 31))
+        # Back-filled: the oldest months are recorded last
+        for month in (12, 11, 10, 1, 2, 3):
+            MeterReading.objects.create(
+                lease=lease, machine=machine, month=datetime.date(2020, month, 1), meter_reading=month
+            )
+
+        client = api_client(create_user('Director'))
+        url = f'/api/leases/{lease.pk}/meter-readings/'
+        for query in ('?page_size=4', '?page_size=4&pagination=cursor'):
+            with self.subTest(query=query):
+                response = client.get(url + query).data
+                months = [row['month'] for row in response['results'] + client.get(response['next']).data['results']]
+                self.assertEqual(months, [f'2020-{month:02}-01' for month in (12, 11, 10, 3, 2, 1)])
+
+
+class MeterReadingImportTests(LeaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.leases = [
+            cls.create_lease(
+                cls.create_machine(f'SN-{number}'), datetime.date(2020, 1, 1), datetime.date(2020, 12, 31)
+            )
+            for number in range(3)
+        ]
+        MeterReading.objects.create(
+            lease=cls.leases[1], machine=cls.leases[1].item, month=datetime.date(2020, 3, 1), meter_reading=10
+        )
+
+    def test_rows_are_matched_and_upserted_per_batch(self):
+        rows = [
+            {'serial_no': 'SN-0', 'meter_reading': 100},
+            {'lease_no': self.leases[1].lease_no, 'meter_reading': '1,500'},
+            {'lease_no': self.leases[0].lease_no, 'meter_reading': 101},
+            {'lease_no': 'missing', 'meter_reading': 5},
+        ]
+        with self.assertNumQueries(5):  # Leases, existing readings, then one upsert in a transaction
+            report = ingest_meter_readings(rows, datetime.date(2020, 3, 1))
+
+        self.assertEqual([row['status'] for row in report.rows], ['created', 'updated', 'failed', 'failed'])
+        self.assertIn('Duplicate', report.rows[2]['errors']['lease_no'])
+        readings = dict(MeterReading.objects.filter(month=datetime.date(2020, 3, 1)).values_list(
+            'lease__lease_no', 'meter_reading'
+        ))
+        self.assertEqual(readings, {self.leases[0].lease_no: 100, self.leases[1].lease_no: 1500})
+
+
+class BillingRunTests(LeaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.machines = [cls.create_machine(f'SN-{number}') for number in range(4)]
+        cls.leases = [
+            cls.create_lease(machine, datetime.date(2020, 1, 1), datetime.date(2020, 12, 31), add_vat=True)
+            for machine in cls.machines[:3]
+        ]
+        readings = [
+            (cls.leases[0], cls.machines[0], 2, 1000), (cls.leases[0], cls.machines[0], 3, 1600),
+            (cls.leases[1], cls.machines[1], 2, 1000), (cls.leases[1], cls.machines[1], 3, 400),
+            (cls.leases[2], cls.machines[3], 2, 9000), (cls.leases[2], cls.machines[2], 3, 250),
+        ]
+        MeterReading.objects.bulk_create([
+            MeterReading(lease=lease, machine=machine, month=datetime.date(2020, month, 1), meter_reading=value)
+            for lease, machine, month, value in readings
+        ])
+
+    def test_usage_is_the_difference_between_readings(self):
+        run = run_billing(datetime.date(2020, 3, 1), copy_rate='0.50', myq_fee='0', vat_rate='0.16')
+        lines = {line.lease_id: line for line in run.lines.all()}
+
+        normal, negative, reset = (lines[lease.pk] for lease in self.leases)
+        self.assertEqual((normal.usage, normal.flags, normal.total), (600, [], Decimal('348.00')))
+        self.assertEqual((negative.usage, negative.flags), (0, ['negative_delta']))
+        self.assertEqual((reset.usage, reset.flags), (250, ['meter_reset']))
+        self.assertEqual((run.lease_count, run.flagged_count, run.total_usage), (3, 2, 850))
+
+
+class LeaseLifecycleTests(LeaseTestCase):
+    today = datetime.date(2020, 6, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        machine = cls.create_machine('SN-1')
+        for days in (-10, -1, 0, 30, 31, 90, 91):
+            cls.create_lease(machine, datetime.date(2019, 1, 1), cls.today + datetime.timedelta(days=days))
+
+    def test_expired_leases_are_deactivated_once(self):
+        self.assertEqual(expire_leases(self.today), 2)
+        self.assertEqual(expire_leases(self.today), 0)
+        self.assertEqual(LeaseContract.objects.filter(is_active=True).count(), 5)
+
+    def test_upcoming_expiries_fall_into_windows(self):
+        rows = list(upcoming_expiries(today=self.today))
+        self.assertEqual([(row['days_left'], row['window']) for row in rows], [(0, 30), (30, 30), (31, 60), (90, 90)])
+        self.assertEqual(expiry_counts(self.today), {30: 2, 60: 1, 90: 1})
+
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_expiring_endpoint_pages_by_number_in_cursor_mode(self):
+        today = timezone.localdate()
+        machine = self.create_machine('SN-2')
+        for days in range(12):
+            self.create_lease(machine, datetime.date(2019, 1, 1), today + datetime.timedelta(days=days))
+
+        client = api_client(create_user('Director'))
+        response = client.get('/api/leases/expiring/?within=30&pagination=cursor')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['count'], response.data['counts'][30]), (12, 12))
+        second = client.get(response.data['next']).data['results']
+        self.assertEqual([row['days_left'] for row in second], [10, 11])
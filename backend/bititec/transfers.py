@@ -0,0 +1,248 @@
+"""
+Store-to-store stock transfers.
+
+A transfer moves any number of items in one transaction with a fixed number
+of statements per item type: whole items change store with one UPDATE, partial
+quantities are taken off the source rows with one CASE UPDATE and added to the
+destination store's rows for the same ref_no with another (missing destination
+rows are created with one bulk_create). Parts and accessories are unique per
+(ref_no, store), so each store keeps its own row under the same ref_no. The
+ledger gets a 'Transfer Out' / 'Transfer In' pair per line and both store
+summaries are invalidated once.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .inventory import ITEM_TYPES, STATUS_FIELDS, record_bulk_movements
+from .models import Accessory, Machine, Part, StockTransfer, StockTransferLine
+from .store_summary import invalidate_store_summary
+
+TRANSFER_MODELS = {
+    'machine': Machine,
+    'part': Part,
+    'accessory': Accessory,
+}
+
+# Statuses that mean the item is not sitting on a shelf in its store
+NOT_TRANSFERABLE = {
+    'machine': {'Sold', 'Leased'},
+    'part': {'Out of Stock'},
+    'accessory': {'Out of Stock'},
+}
+
+# Fields copied onto a destination row created for a partial transfer
+CLONE_FIELDS = {
+    'part': ['part_name', 'part_brand', 'part_type', 'unit_value', 'description', 'part_condition', 'color_type', 'supplier_name'],
+    'accessory': ['acc_name', 'acc_brand', 'acc_type', 'unit_value', 'description', 'acc_condition', 'color_type', 'supplier_name'],
+}
+
+
+class TransferError(Exception):
+    """The transfer request cannot be carried out; ``errors`` maps lines to messages"""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def case_by_pk(values, output_field):
+    """CASE expression picking a per-row value by primary key"""
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in values.items()],
+        output_field=output_field
+    )
+
+
+class TransferPlan:
+    """Lines of one item type, validated against the locked source rows"""
+
+    def __init__(self, item_type, from_store, to_store):
+        self.item_type = item_type
+        self.model = TRANSFER_MODELS[item_type]
+        self.from_store = from_store
+        self.to_store = to_store
+        self.whole = {}    # pk -> item moving in full
+        self.partial = {}  # pk -> (item, quantity, target pk or None)
+
+    def load(self, lines, errors):
+        items = self.model.objects.select_for_update().in_bulk([line['id'] for _, line in lines])
+        status_field = STATUS_FIELDS[self.model]
+
+        for index, line in lines:
+            item = items.get(line['id'])
+            if item is None or item.store_id != self.from_store.pk:
+                errors[index] = f"{ITEM_TYPES[self.item_type]} not found in {self.from_store.store_name}"
+                continue
+            if item.pk in self.whole or item.pk in self.partial:
+                errors[index] = 'Item listed more than once'
+                continue
+            if getattr(item, status_field) in NOT_TRANSFERABLE[self.item_type]:
+                errors[index] = f"Item is {getattr(item, status_field)}"
+                continue
+
+            quantity = line.get('quantity') or item.quantity
+            if self.item_type == 'machine' or quantity == item.quantity:
+                self.whole[item.pk] = item
+            elif quantity > item.quantity:
+                errors[index] = f"Only {item.quantity} in stock"
+            else:
+                self.partial[item.pk] = (item, quantity, line.get('target'))
+
+    def resolve_targets(self, errors):
+        """
+        Find the destination row for every partial line: an explicit ``target``
+        or the destination store's row with the same ref_no. Whole lines whose
+        ref_no the destination already stocks become partial lines into that
+        row. Returns (targets by source pk, copies to create).
+        """
+        if self.item_type == 'machine' or not (self.partial or self.whole):
+            return {}, []
+        explicit = {target for _, _, target in self.partial.values() if target}
+        refs = {item.ref_no for item, _, target in self.partial.values() if not target}
+        refs.update(item.ref_no for item in self.whole.values())
+
+        found = self.model.objects.select_for_update().filter(pk__in=explicit) | \
+            self.model.objects.select_for_update().filter(ref_no__in=refs, store=self.to_store)
+        by_pk = {row.pk: row for row in found}
+        by_ref = {row.ref_no: row for row in by_pk.values() if row.store_id == self.to_store.pk}
+
+        # The destination already stocks this ref_no, so the whole quantity joins its row
+        for pk, item in list(self.whole.items()):
+            if item.ref_no in by_ref:
+                del self.whole[pk]
+                self.partial[pk] = (item, item.quantity, None)
+
+        targets = {}
+        copies = []
+        for pk, (item, quantity, target) in self.partial.items():
+            if target:
+                row = by_pk.get(target)
+                if row is None or row.store_id != self.to_store.pk:
+                    errors[pk] = f"Target not found in {self.to_store.store_name}"
+                    continue
+                targets[pk] = row
+                continue
+
+            row = by_ref.get(item.ref_no)
+            if row is None:
+                row = self.model(
+                    ref_no=item.ref_no,
+                    store=self.to_store,
+                    intial_quantity=0,
+                    quantity=0,
+                    is_transfer=True,
+                    **{STATUS_FIELDS[self.model]: 'Available'},
+                    **{field: getattr(item, field) for field in CLONE_FIELDS[self.item_type]}
+                )
+                by_ref[row.ref_no] = row
+                copies.append(row)
+            targets[pk] = row
+        return targets, copies
+
+    def apply(self, targets, copies):
+        """Run the set-based updates and return ledger entries and transfer lines"""
+        entries = []
+        lines = []
+        status_field = STATUS_FIELDS[self.model]
+
+        if self.whole:
+            self.model.objects.filter(pk__in=self.whole).update(store=self.to_store, is_transfer=True)
+            for item in self.whole.values():
+                quantity = item.quantity
+                entries.append((item, -quantity, 'Transfer Out', self.from_store.pk))
+                entries.append((item, quantity, 'Transfer In', self.to_store.pk))
+                lines.append(StockTransferLine(item_type=ITEM_TYPES[self.item_type], quantity=quantity,
+                                               **{self.item_type: item}))
+
+        if self.partial:
+            taken = {pk: quantity for pk, (_, quantity, _) in self.partial.items()}
+            emptied = [pk for pk, (item, quantity, _) in self.partial.items() if quantity == item.quantity]
+            self.model.objects.filter(pk__in=taken).update(
+                quantity=F('quantity') - case_by_pk(taken, IntegerField()),
+                **{status_field: Case(
+                    When(pk__in=emptied, then=Value('Out of Stock')),
+                    default=F(status_field)
+                )}
+            )
+
+            added = {}
+            for pk, row in targets.items():
+                added[row.pk] = added.get(row.pk, 0) + taken[pk]
+            for copy in copies:
+                copy.intial_quantity = added[copy.pk]
+            self.model.objects.bulk_create(copies)
+            self.model.objects.filter(pk__in=added).update(
+                quantity=F('quantity') + case_by_pk(added, IntegerField()),
+                **{status_field: Case(
+                    When(**{status_field: 'Out of Stock'}, then=Value('Available')),
+                    default=F(status_field)
+                )}
+            )
+
+            for pk, (item, quantity, _) in self.partial.items():
+                target = targets[pk]
+                entries.append((item, -quantity, 'Transfer Out', self.from_store.pk))
+                entries.append((target, quantity, 'Transfer In', self.to_store.pk))
+                lines.append(StockTransferLine(
+                    item_type=ITEM_TYPES[self.item_type], quantity=quantity, is_partial=True,
+                    **{self.item_type: item, f'target_{self.item_type}': target}
+                ))
+        return entries, lines
+
+
+def create_transfer(from_store, to_store, items, user=None, notes=''):
+    """
+    Move ``items`` (dicts with ``item_type``, ``id`` and, for parts and
+    accessories, an optional ``quantity`` and ``target``) from ``from_store``
+    to ``to_store``. Raises TransferError without writing anything when any
+    line is invalid.
+    """
+    if from_store.pk == to_store.pk:
+        raise TransferError({'to_store': 'Choose a different destination store'})
+    if not items:
+        raise TransferError({'items': 'Nothing to transfer'})
+
+    errors = {}
+    grouped = {}
+    for index, line in enumerate(items):
+        if line.get('item_type') not in TRANSFER_MODELS:
+            errors[index] = f"Unknown item type '{line.get('item_type')}'"
+        else:
+            grouped.setdefault(line['item_type'], []).append((index, line))
+
+    with transaction.atomic():
+        plans = []
+        for item_type, lines in grouped.items():
+            plan = TransferPlan(item_type, from_store, to_store)
+            plan.load(lines, errors)
+            plans.append(plan)
+
+        resolved = []
+        for plan in plans:
+            target_errors = {}
+            targets, copies = plan.resolve_targets(target_errors)
+            for pk, message in target_errors.items():
+                errors[next(i for i, line in grouped[plan.item_type] if line['id'] == pk)] = message
+            resolved.append((plan, targets, copies))
+        if errors:
+            raise TransferError({'items': errors})
+
+        transfer = StockTransfer.objects.create(
+            from_store=from_store,
+            to_store=to_store,
+            notes=notes,
+            created_by=user if user is not None and user.is_authenticated else None
+        )
+        entries = []
+        lines = []
+        for plan, targets, copies in resolved:
+            plan_entries, plan_lines = plan.apply(targets, copies)
+            entries.extend(plan_entries)
+            lines.extend(plan_lines)
+
+        for line in lines:
+            line.transfer = transfer
+        StockTransferLine.objects.bulk_create(lines)
+        record_bulk_movements(entries, source=transfer, user=user)
+        invalidate_store_summary(from_store.pk, to_store.pk)
+    return transfer
@@ -2,7 +2,7 @@ from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from . import views
-from .file_views import ChatFileUploadView
+from .file_views import ChatFileUploadView, InventoryImportView
 from django.conf.urls.static import static
 
 
@@ -23,22 +23,41 @@ urlpatterns = [
     path('part-types/', views.PartTypeListCreate.as_view()),
     path('part-types/<uuid:pk>/', views.PartTypeRetrieveUpdateDestroy.as_view()),
     path('machines/', views.MachineListCreate.as_view()),
+    path('machines/export/', views.MachineExport.as_view(), name='machine-export'),
     path('machines/<uuid:id>/', views.MachineRetrieveUpdateDestroy.as_view()),
     path('clients/', views.ClientListCreate.as_view()),
     path('clients/<uuid:id>/', views.ClientRetrieveUpdateDestroy.as_view()),
     path('accessories/', views.AccessoryListCreate.as_view()),
+    path('accessories/export/', views.AccessoryExport.as_view(), name='accessory-export'),
     path('accessories/<uuid:id>/', views.AccessoryRetrieveUpdateDestroy.as_view()),
     path('parts/', views.PartListCreate.as_view()),
+    path('parts/export/', views.PartExport.as_view(), name='part-export'),
     path('parts/<uuid:id>/', views.PartRetrieveUpdateDestroy.as_view()),
+    path('inventory/search/', views.InventorySearchView.as_view(), name='inventory-search'),
+    path('inventory/import/', InventoryImportView.as_view(), name='inventory-import'),
+    path('stock-transfers/', views.StockTransferViewSet.as_view({'get': 'list', 'post': 'create'})),
+    path('stock-transfers/<uuid:pk>/', views.StockTransferViewSet.as_view({'get': 'retrieve'})),
     path('service-calls/', views.CallViewSet.as_view({'get': 'list', 'post': 'create'})),
+    path('service-calls/export/', views.CallViewSet.as_view({'get': 'export'}), name='service-call-export'),
+    path('service-calls/analytics/', views.CallViewSet.as_view({'get': 'analytics'}), name='service-call-analytics'),
+    path('service-calls/bulk/', views.CallViewSet.as_view({'post': 'bulk_update'}), name='service-call-bulk-update'),
+    path('service-calls/by-part/', views.CallViewSet.as_view({'get': 'by_part'}), name='service-call-by-part'),
+    path('service-calls/parts-usage/', views.CallViewSet.as_view({'get': 'parts_usage'}), name='service-call-parts-usage'),
+    path('service-calls/workload/', views.CallViewSet.as_view({'get': 'workload'}), name='service-call-workload'),
     path('service-calls/<uuid:pk>/', views.CallViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
+    path('service-calls/<uuid:pk>/history/', views.CallViewSet.as_view({'get': 'history'}), name='service-call-history'),
     path('service-calls/<uuid:pk>/create_access_token/', views.CallViewSet.as_view({'post': 'create_access_token'}), name='create-access-token'),
     path('service-calls/validate_token/',  views.CallViewSet.as_view({'get': 'validate_token'}), name='validate-token'),
     path('service-calls/<uuid:pk>/verify/', views.CallViewSet.as_view({'post': 'verify'}), name='verify-call'),
     path('service-calls/<uuid:pk>/update_approval/', views.CallViewSet.as_view({'patch': 'update_approval'})),
     path('leases/', views.LeaseContractViewSet.as_view({'get': 'list', 'post': 'create'})),
+    path('leases/missing-readings/', views.LeaseContractViewSet.as_view({'get': 'missing_readings'}), name='lease-missing-readings'),
+    path('leases/expiring/', views.LeaseContractViewSet.as_view({'get': 'expiring'}), name='lease-expiring'),
+    path('leases/export/', views.LeaseContractViewSet.as_view({'get': 'export'}), name='lease-export'),
     path('leases/<uuid:pk>/', views.LeaseContractViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
     path('sales/', views.SaleViewSet.as_view({'get': 'list', 'post': 'create'})),
+    path('sales/export/', views.SaleViewSet.as_view({'get': 'export'}), name='sale-export'),
+    path('sales/<uuid:pk>/history/', views.SaleViewSet.as_view({'get': 'history'}), name='sale-history'),
     path('sales/<uuid:pk>/', views.SaleViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'})),
     path('deliveries/', views.DeliveryViewSet.as_view({'get': 'list', 'post': 'create'})),
     path('deliveries/<uuid:pk>/', views.DeliveryViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
@@ -56,7 +75,11 @@ urlpatterns = [
     path('lease-part-inquiries/<uuid:pk>/', views.LeasePartInquiryViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
     path('lease-acc-inquiries/', views.LeaseAccInquiryViewSet.as_view({'get': 'list', 'post': 'create'})),
     path('lease-acc-inquiries/<uuid:pk>/', views.LeaseAccInquiryViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
+    path('billing-runs/', views.BillingRunViewSet.as_view({'get': 'list', 'post': 'create'})),
+    path('billing-runs/<uuid:pk>/', views.BillingRunViewSet.as_view({'get': 'retrieve', 'delete': 'destroy'})),
+    path('billing-runs/<uuid:pk>/lines/', views.BillingRunViewSet.as_view({'get': 'lines'})),
     path('meter-readings/', views.MeterReadingViewSet.as_view({'get': 'list', 'post': 'create'})),
+    path('meter-readings/import/', views.MeterReadingViewSet.as_view({'post': 'bulk_import'})),
     path('meter-readings/<uuid:pk>/', views.MeterReadingViewSet.as_view({'get': 'retrieve', 'put': 'update', 'delete': 'destroy'})),
     path('leases/<uuid:pk>/meter-readings/', views.LeaseContractViewSet.as_view({'get': 'meter_readings'})),
     path('store-inquiries/', views.StoreInquiryViewSet.as_view({'get': 'list', 'post': 'create'})),
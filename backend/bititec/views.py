@@ -1,37 +1,59 @@
-import re
 from rest_framework import generics, permissions, status, filters, viewsets
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.response import Response
-from .models import Accessory, AccessoryType, ChatGroup, ChatMessage, Client, ClientMachine, CustomUser, Delivery, LeaseAccInquiry, LeaseContract, LeasePartInquiry, MachineType, Machine, MeterReading, PartType, Part, Sale, SaleItem, Store, Call, ServiceCallToken, StoreInquiry
-from .serializers import AccessorySerializer, AccessoryTypeSerializer, CallSerializer, ChatGroupSerializer, ChatMessageSerializer, ClientMachineSerializer, ClientSerializer, DeliverySerializer, LeaseAccInquirySerializer, LeaseContractSerializer, LeasePartInquirySerializer, MachineSerializer, MachineTypeSerializer, MeterReadingSerializer, PartSerializer, PartTypeSerializer, SaleSerializer, StoreInquirySerializer, UserSerializer, RegisterSerializer, StoreSerializer
+from .models import Accessory, AccessoryType, BillingRun, ChatGroup, ChatMessage, Client, ClientMachine, CustomUser, Delivery, LeaseAccInquiry, LeaseContract, LeasePartInquiry, MachineType, Machine, MeterReading, PartType, Part, Sale, SaleItem, Store, Call, ServiceCallToken, StockTransfer, StockTransferLine, StoreInquiry
+from .serializers import AccessorySerializer, AccessoryTypeSerializer, BillingLineSerializer, BillingRunSerializer, CallAccessSerializer, CallBulkUpdateSerializer, CallListSerializer, CallSerializer, ChatGroupSerializer, ChatMessageSerializer, ClientMachineSerializer, ClientSerializer, DeliverySerializer, LeaseAccInquirySerializer, LeaseContractListSerializer, LeaseContractSerializer, LeasePartInquirySerializer, MachineSerializer, MachineTypeSerializer, MeterReadingSerializer, PartSerializer, PartTypeSerializer, SaleSerializer, StockTransferSerializer, StoreInquirySerializer, UserSerializer, RegisterSerializer, StoreSerializer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes, action
-from django.db.models import Q, Count, Max, Prefetch, Sum
+from django.db.models import Q, Count, Exists, Max, OuterRef, Prefetch, Sum
 from django.db import transaction
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.contrib.auth import update_session_auth_hash
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
 from django.core.exceptions import PermissionDenied
-from rest_framework.pagination import PageNumberPagination
+from .audit import AuditHistoryMixin, audit_batch
+from .access_tokens import InvalidAccessToken, make_access_token, read_access_token
+from .call_events import call_event_batch
+from .dynamic_fields import DynamicFieldsViewMixin
+from .pagination import (
+    ChatMessagePagination, KeysetPagination, MonthKeysetPagination, RequestedAtKeysetPagination, StandardPagination,
+)
 from django.utils import timezone
-from django.utils.dateparse import parse_date
 from rest_framework.exceptions import ValidationError
 from decimal import Decimal, InvalidOperation  # Add this line
-
-
-
-class UserListCreate(generics.ListCreateAPIView):
+from .inventory import consume_stock, release_stock
+from .filters import filter_date_range
+from .search import FACETS, InventorySearch, serialize_result
+from .workload import get_technician_workload
+from .call_rollups import call_analytics
+from .call_bulk import BULK_FIELDS, bulk_update_calls
+from .call_parts import part_usages, usage_by_machine_model
+from .readings import (
+    LEASE_RECENT_READINGS, MAX_RECENT_READINGS, missing_months, overdue_leases, parse_month, reading_cycle,
+    recent_readings_prefetch, recorded_months, with_last_reading,
+)
+from .importers import InventoryImportError
+from .lease_lifecycle import EXPIRY_WINDOWS, expiry_counts, upcoming_expiries
+from .reading_imports import import_meter_readings, ingest_meter_readings
+from .exports import (
+    ACCESSORY_EXPORT_FIELDS, CALL_EXPORT_FIELDS, LEASE_EXPORT_FIELDS, MACHINE_EXPORT_FIELDS,
+    PART_EXPORT_FIELDS, SALE_EXPORT_FIELDS, ExportView, StreamingExportMixin,
+)
+
+
+
+class UserListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
 
     def get_queryset(self):
         role = self.request.query_params.get('role')
         if role:
-            return CustomUser.objects.filter(role=role)
-        return CustomUser.objects.all()
+            return CustomUser.objects.filter(role=role).order_by('email')
+        return CustomUser.objects.all().order_by('email')
 
-class UserRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class UserRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -93,7 +115,7 @@ def change_password(request):
     
     return Response({'detail': 'Password changed successfully'})
 
-class UserByIdView(generics.RetrieveAPIView):
+class UserByIdView(DynamicFieldsViewMixin, generics.RetrieveAPIView):
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
     lookup_field = 'id'
@@ -144,90 +166,87 @@ def post(self, request, *args, **kwargs):
         "message": "User created successfully",
     }, status=status.HTTP_201_CREATED)
 
-class StoreListCreate(generics.ListCreateAPIView):
-    queryset = Store.objects.all()
+class StoreListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
+    queryset = Store.objects.all().order_by('store_name')
     serializer_class = StoreSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class StoreRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class StoreRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Store.objects.all()
     serializer_class = StoreSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
 
-class AccessoryTypeListCreate(generics.ListCreateAPIView):
-    queryset = AccessoryType.objects.all()
+class AccessoryTypeListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
+    queryset = AccessoryType.objects.all().order_by('name')
     serializer_class = AccessoryTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class AccessoryTypeRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class AccessoryTypeRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = AccessoryType.objects.all()
     serializer_class = AccessoryTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class MachineTypeListCreate(generics.ListCreateAPIView):
-    queryset = MachineType.objects.all()
+class MachineTypeListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
+    queryset = MachineType.objects.all().order_by('name')
     serializer_class = MachineTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class MachineTypeRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class MachineTypeRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = MachineType.objects.all()
     serializer_class = MachineTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class PartTypeListCreate(generics.ListCreateAPIView):
-    queryset = PartType.objects.all()
+class PartTypeListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
+    queryset = PartType.objects.all().order_by('name')
     serializer_class = PartTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class PartTypeRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class PartTypeRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = PartType.objects.all()
     serializer_class = PartTypeSerializer
     permission_classes = [permissions.IsAuthenticated]
 
-class StandardPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-
-class MachineViewSet(viewsets.ModelViewSet):
+def part_stock_queryset(active_leases_only=False):
+    """Parts with leased/sold totals annotated and nested rows prefetched"""
+    inquiries = LeasePartInquiry.objects.select_related(
+        'part', 'lease__client', 'lease__item__store', 'lease__store'
+    ).prefetch_related('lease__meter_readings')
+    if active_leases_only:
+        inquiries = inquiries.filter(lease__is_active=True)
+    return Part.objects.with_stock_figures().select_related('store').prefetch_related(
+        Prefetch('leasepartinquiry_set', queryset=inquiries),
+        Prefetch('sale_items', queryset=SaleItem.objects.select_related('sale__client'))
+    )
+
+def accessory_stock_queryset(active_leases_only=False):
+    """Accessories with leased/sold totals annotated and nested rows prefetched"""
+    inquiries = LeaseAccInquiry.objects.select_related(
+        'accessory', 'lease__client', 'lease__item__store', 'lease__store'
+    ).prefetch_related('lease__meter_readings')
+    if active_leases_only:
+        inquiries = inquiries.filter(lease__is_active=True)
+    return Accessory.objects.with_stock_figures().select_related('store').prefetch_related(
+        Prefetch('leaseaccinquiry_set', queryset=inquiries),
+        Prefetch('sale_accessories', queryset=SaleItem.objects.select_related('sale__client'))
+    )
+
+class MachineViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = MachineSerializer
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardPagination
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
         store_id = self.request.query_params.get('store')
         status = self.request.query_params.get('machine_status')
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
         
-        queryset = Machine.objects.all()
+        queryset = Machine.objects.select_related('store')
         
         if store_id:
             queryset = queryset.filter(store=store_id)
         if status:
             queryset = queryset.filter(machine_status=status)
-            
-        if start_date and end_date:
-            try:
-                # Parse dates and ensure they are in datetime format
-                start = parse_date(start_date)
-                end = parse_date(end_date)
-                
-                if start and end:
-                    if start > end:
-                        raise ValidationError("End date must be after start date")
-                    
-                    # Create a query that explicitly filters by created_at date
-                    queryset = queryset.filter(created_at__date__gte=start, created_at__date__lte=end)
-                    
-                    # Debug logging - check the exact SQL query 
-                    sql_query = str(queryset.query)
-
-                    sample_data = list(queryset[:5].values('id', 'created_at'))
-            except (ValueError, TypeError) as e:
-                error_msg = f"Invalid date format. Use YYYY-MM-DD: {str(e)}"
-                raise ValidationError(error_msg) from e
+        queryset = filter_date_range(queryset, self.request.query_params)
 
         return queryset.order_by('-created_at')
     
@@ -243,108 +262,59 @@ class MachineViewSet(viewsets.ModelViewSet):
         self.perform_update(serializer)
         return Response(serializer.data)
     
-class PartViewSet(viewsets.ModelViewSet):
+class PartViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = PartSerializer  
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardPagination
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         part_status = self.request.query_params.get('part_status')
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-
-        queryset = Part.objects.prefetch_related(
-            Prefetch('leasepartinquiry_set', 
-                queryset=LeasePartInquiry.objects.select_related(
-                    'lease__client', 'part'
-                ).filter(lease__is_active=True)  # Only show active leases
-            ),
-            Prefetch('saleitem_set', 
-                queryset=SaleItem.objects.select_related('sale__client')
-            )
-        )
+
+        queryset = part_stock_queryset(active_leases_only=True)  # Only show active leases
         
         store_id = self.request.query_params.get('store')
         if store_id:
             queryset = queryset.filter(store=store_id)
         if part_status:  
             queryset = queryset.filter(part_status=part_status)
-            
-        if start_date and end_date:
-            try:
-                # Parse dates and ensure they are in datetime format
-                start = parse_date(start_date)
-                end = parse_date(end_date)
-                
-                if start and end:
-                    if start > end:
-                        raise ValidationError("End date must be after start date")
-                    
-                    # Using __date correctly for comparing date fields
-                    queryset = queryset.filter(created_at__date__gte=start, created_at__date__lte=end)
-                    
-            except (ValueError, TypeError) as e:
-                raise ValidationError(f"Invalid date format. Use YYYY-MM-DD: {str(e)}") from e
+        queryset = filter_date_range(queryset, self.request.query_params)
 
         return queryset.order_by('-created_at')
     
 
-class AccessoryViewSet(viewsets.ModelViewSet):
+class AccessoryViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = AccessorySerializer  
     permission_classes = [permissions.IsAuthenticated]
-    pagination_class = StandardPagination
+    pagination_class = KeysetPagination
     
     def get_queryset(self):
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
         acc_status = self.request.query_params.get('acc_status')
         
-        queryset = Accessory.objects.prefetch_related(
-            Prefetch('leaseaccinquiry_set', 
-                queryset=LeaseAccInquiry.objects.select_related(
-                    'lease__client', 'accessory'
-                ).filter(lease__is_active=True)  
-            ),
-            Prefetch('saleitem_set', 
-                queryset=SaleItem.objects.select_related('sale__client')
-            )
-        )
+        queryset = accessory_stock_queryset(active_leases_only=True)
         
         store_id = self.request.query_params.get('store')
         if store_id:
             queryset = queryset.filter(store=store_id)
         if acc_status:  
             queryset = queryset.filter(acc_status=acc_status)
-            
-        if start_date and end_date:
-            try:
-                # Parse dates and ensure they are in datetime format
-                start = parse_date(start_date)
-                end = parse_date(end_date)
-                
-                if start and end:
-                    if start > end:
-                        raise ValidationError("End date must be after start date")
-                    
-                    # Using __date correctly for comparing date fields
-                    queryset = queryset.filter(created_at__date__gte=start, created_at__date__lte=end)
-                    
-            except (ValueError, TypeError) as e:
-                raise ValidationError(f"Invalid date format. Use YYYY-MM-DD: {str(e)}") from e
+        queryset = filter_date_range(queryset, self.request.query_params)
 
         return queryset.order_by('-created_at')
     
-class MachineListCreate(generics.ListCreateAPIView):
+class MachineListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
     queryset = Machine.objects.all().select_related('store')
     serializer_class = MachineSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['machine_name', 'machine_brand', 'serial_no', 'store__store_name']
     ordering_fields = ['machine_name', 'created_at', 'unit_value']
+    ordering = ['-created_at']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         store_id = self.request.query_params.get('store')
         machine_status = self.request.query_params.get('machine_status')  # Add this line
-        queryset = Machine.objects.all()
+        queryset = Machine.objects.select_related('store')
         
         if store_id:
             queryset = queryset.filter(store=store_id)
@@ -353,67 +323,167 @@ class MachineListCreate(generics.ListCreateAPIView):
             
         return queryset
 
-class MachineRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class MachineRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Machine.objects.all().select_related('store')
     serializer_class = MachineSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
 
-class PartListCreate(generics.ListCreateAPIView):
+class PartListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
     queryset = Part.objects.all().select_related('store')
     serializer_class = PartSerializer
     permission_classes = [permissions.IsAuthenticated]
-    search_fields = ['part_name', 'part_brand', 'serial_no', 'store__store_name']
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['part_name', 'part_brand', 'ref_no', 'store__store_name']
     ordering_fields = ['part_name', 'created_at', 'unit_value']
+    ordering = ['-created_at']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
+        queryset = part_stock_queryset()
         store_id = self.request.query_params.get('store')
         if store_id:
-            return Part.objects.filter(store=store_id)
-        return Part.objects.all()
+            return queryset.filter(store=store_id)
+        return queryset
 
-class PartRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Part.objects.all().select_related('store')
+class PartRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = part_stock_queryset()
     serializer_class = PartSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
 
-class AccessoryListCreate(generics.ListCreateAPIView):
+class AccessoryListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
     queryset = Accessory.objects.all().select_related('store')
     serializer_class = AccessorySerializer
     permission_classes = [permissions.IsAuthenticated]
-    search_fields = ['acc_name', 'acc_brand', 'serial_no', 'store__store_name']
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['acc_name', 'acc_brand', 'ref_no', 'store__store_name']
     ordering_fields = ['acc_name', 'created_at', 'unit_value']
+    ordering = ['-created_at']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
+        queryset = accessory_stock_queryset()
         store_id = self.request.query_params.get('store')
         if store_id:
-            return Accessory.objects.filter(store=store_id)
-        return Accessory.objects.all()
+            return queryset.filter(store=store_id)
+        return queryset
 
-class AccessoryRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Accessory.objects.all().select_related('store')
+class AccessoryRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = accessory_stock_queryset()
     serializer_class = AccessorySerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
 
-class ClientListCreate(generics.ListCreateAPIView):
-    queryset = Client.objects.all()
+class MachineExport(ExportView, MachineListCreate):
+    permission_classes = [permissions.IsAuthenticated, IsDirectorOrSuperAdmin]
+    export_fields = MACHINE_EXPORT_FIELDS
+    export_filename = 'machines'
+
+class PartExport(ExportView, PartListCreate):
+    permission_classes = [permissions.IsAuthenticated, IsDirectorOrSuperAdmin]
+    export_fields = PART_EXPORT_FIELDS
+    export_filename = 'parts'
+
+class AccessoryExport(ExportView, AccessoryListCreate):
+    permission_classes = [permissions.IsAuthenticated, IsDirectorOrSuperAdmin]
+    export_fields = ACCESSORY_EXPORT_FIELDS
+    export_filename = 'accessories'
+
+class StockTransferViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
+    """Create and browse store-to-store transfers (transfers are not edited once made)"""
+    serializer_class = StockTransferSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    http_method_names = ['get', 'post', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = StockTransfer.objects.select_related('from_store', 'to_store').prefetch_related(
+            Prefetch('lines', queryset=StockTransferLine.objects.select_related('machine', 'part', 'accessory'))
+        )
+        store_id = self.request.query_params.get('store')
+        if store_id:
+            queryset = queryset.filter(Q(from_store=store_id) | Q(to_store=store_id))
+        queryset = filter_date_range(queryset, self.request.query_params)
+        return queryset.order_by('-created_at')
+
+class BillingRunViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
+    """
+    Monthly billing runs. POST {"month": "YYYY-MM"} (optionally copy_rate,
+    myq_fee, vat_rate) bills every active lease and stores the result; runs
+    and their lines are then read back as stored.
+    """
+    serializer_class = BillingRunSerializer
+    permission_classes = [permissions.IsAuthenticated, IsDirectorOrSuperAdmin]
+    pagination_class = StandardPagination
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        queryset = BillingRun.objects.select_related('created_by')
+        month = self.request.query_params.get('month')
+        if self.action == 'list' and month:
+            queryset = queryset.filter(month=reading_cycle(self.request.query_params))
+        return queryset.order_by('-created_at')
+
+    @action(detail=True, methods=['get'])
+    def lines(self, request, pk=None):
+        """The run's lines by lease_no; ?flagged=true for lines needing review, ?search= on lease/client/serial"""
+        run = self.get_object()
+        lines = run.lines.all()
+        if request.query_params.get('flagged', '').lower() in ('1', 'true', 'yes'):
+            lines = lines.exclude(flags=[])
+        search = request.query_params.get('search')
+        if search:
+            lines = lines.filter(
+                Q(lease_no__icontains=search) | Q(client_name__icontains=search) | Q(serial_no__icontains=search)
+            )
+        lines = lines.order_by('lease_no')
+        page = self.paginate_queryset(lines)
+        if page is not None:
+            return self.get_paginated_response(BillingLineSerializer(page, many=True).data)
+        return Response(BillingLineSerializer(lines, many=True).data)
+
+class InventorySearchView(generics.GenericAPIView):
+    """
+    Search machines, parts and accessories in one list with facet counts.
+
+    ``?q=`` free text, ``?item_type=machine,part`` limits the models, and
+    ``?brand= / type= / condition= / status= / store=`` select facet values.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = StandardPagination
+
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        item_types = params.get('item_type')
+        search = InventorySearch(
+            text=params.get('q') or params.get('search', ''),
+            item_types=item_types.split(',') if item_types else None,
+            selected={facet: params.get(facet) for facet in FACETS},
+        )
+        page = self.paginate_queryset(search.results())
+        response = self.get_paginated_response([serialize_result(row) for row in page])
+        response.data['facets'] = search.facets()
+        return response
+
+class ClientListCreate(DynamicFieldsViewMixin, generics.ListCreateAPIView):
+    queryset = Client.objects.all().order_by('client_name')
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['client_name', 'client_location']
     ordering_fields = ['client_name', 'created_at']
 
-class ClientRetrieveUpdateDestroy(generics.RetrieveUpdateDestroyAPIView):
+class ClientRetrieveUpdateDestroy(DynamicFieldsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = 'id'
 
-class StoreInquiryViewSet(viewsets.ModelViewSet):
+class StoreInquiryViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = StoreInquirySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = RequestedAtKeysetPagination
     requested_by = UserSerializer(read_only=True)
     lease_part_inquiries = LeasePartInquirySerializer(many=True, read_only=True)
     lookup_field = 'pk'
@@ -449,7 +519,7 @@ class StoreInquiryViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(requested_by=self.request.user)
 
-class ClientMachineViewSet(viewsets.ModelViewSet):
+class ClientMachineViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = ClientMachineSerializer
     permission_classes = [IsAuthenticated]
     
@@ -461,25 +531,75 @@ class ClientMachineViewSet(viewsets.ModelViewSet):
             return ClientMachine.objects.filter(
                 client_name=client_name,
                 client_location=client_location
-            )
-        return ClientMachine.objects.all()
+            ).order_by('-created_at')
+        return ClientMachine.objects.all().order_by('-created_at')
 
-class CallViewSet(viewsets.ModelViewSet):
+class CallViewSet(AuditHistoryMixin, DynamicFieldsViewMixin, StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Call.objects.all()  
     serializer_class = CallSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    export_fields = CALL_EXPORT_FIELDS
+    export_filename = 'service-calls'
+    audit_object_type = 'Call'
+
+    # Columns CallListSerializer needs; fault/comments/JSON columns stay on the detail route
+    LIST_FIELDS = [
+        'id', 'ticket_no', 'status', 'contract_type', 'department', 'reported_date',
+        'is_checked', 'technician_manager_approval', 'client_verification', 'created_at',
+        'client_name', 'walk_in_machine_name', 'walk_in_serial_no',
+        'client__id', 'client__client_name', 'item__id', 'item__machine_name', 'item__serial_no',
+    ]
+
+    def get_permissions(self):
+        # The urls map actions by hand, so @action(permission_classes=...) would not apply
+        if self.action in ('workload', 'history'):
+            return [permissions.IsAuthenticated()]
+        if self.action in ('analytics', 'export'):
+            return [permissions.IsAuthenticated(), IsDirectorOrSuperAdmin()]
+        if self.action in ('validate_token', 'verify'):
+            # Customers hold a signed access token instead of an account
+            return [permissions.AllowAny()]
+        return super().get_permissions()
+
+    # Actions that return call lists with the light serializer
+    LIST_ACTIONS = ('list', 'by_part')
+
+    def get_serializer_class(self):
+        if self.action in self.LIST_ACTIONS:
+            return CallListSerializer
+        return super().get_serializer_class()
+
+    def get_export_columns(self):
+        return super().get_export_columns() + ['technicians']
+
+    def enrich_export_rows(self, rows):
+        # One through-table query per chunk instead of a row per technician
+        names = {}
+        assignments = Call.technician.through.objects.filter(
+            call_id__in=[row['id'] for row in rows]
+        ).values_list('call_id', 'customuser__firstname', 'customuser__lastname')
+        for call_id, firstname, lastname in assignments:
+            names.setdefault(call_id, []).append(f"{firstname} {lastname}".strip())
+        for row in rows:
+            row['technicians'] = '; '.join(names.get(row['id'], []))
     
     def get_queryset(self):
         status = self.request.query_params.get('status')
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
         technician_id = self.request.query_params.get('technician')
         
-        queryset = super().get_queryset().select_related(
-            'client', 
-            'item', 
-            'item__store'
-        ).prefetch_related('technician')
+        if self.action in self.LIST_ACTIONS:
+            queryset = super().get_queryset().select_related('client', 'item').only(
+                *self.LIST_FIELDS
+            ).prefetch_related(
+                Prefetch('technician', queryset=CustomUser.objects.only('id', 'firstname', 'lastname'))
+            )
+        else:
+            queryset = super().get_queryset().select_related(
+                'client', 
+                'item', 
+                'item__store'
+            ).prefetch_related('technician')
         
         # Status filtering
         if status:
@@ -497,22 +617,7 @@ class CallViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(technician__id=technician_id)
 
         # Date range filtering
-        if start_date and end_date:
-            try:
-                start = parse_date(start_date)
-                end = parse_date(end_date)
-                
-                if start and end:
-                    if start > end:
-                        raise ValidationError("End date must be after start date")
-                    
-                    queryset = queryset.filter(
-                        created_at__date__gte=start,
-                        created_at__date__lte=end
-                    )
-                    
-            except (ValueError, TypeError) as e:
-                raise ValidationError(f"Invalid date format. Use YYYY-MM-DD: {str(e)}") from e
+        queryset = filter_date_range(queryset, self.request.query_params)
 
         return queryset.order_by('-created_at')
     
@@ -532,6 +637,58 @@ class CallViewSet(viewsets.ModelViewSet):
         self.perform_update(serializer)
         return Response(serializer.data)
 
+    # Writes run in call_event_batch() so each request pushes one change event per call
+    def perform_create(self, serializer):
+        with call_event_batch():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with call_event_batch():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with call_event_batch():
+            instance.delete()
+
+    @action(detail=False, methods=['get'])
+    def workload(self, request):
+        """Open / pending / in-progress counts per technician for the dispatch board"""
+        return Response(get_technician_workload())
+
+    @action(detail=False, methods=['get'])
+    def analytics(self, request):
+        """
+        MTTR, call volumes and repeat-fault machines from the monthly rollups.
+        ?from=YYYY-MM&to=YYYY-MM (default: last 12 months), ?group_by=client|machine|department,
+        ?min_calls= (default 3) for repeat faults.
+        """
+        return Response(call_analytics(request.query_params))
+
+    @action(detail=False, methods=['get'])
+    def by_part(self, request):
+        """
+        Calls whose parts list names a part: ?part=<part id> or ?ref_no=, with
+        ?kind=used (default) or required. Takes the list filters as well.
+        """
+        if not (request.query_params.get('part') or request.query_params.get('ref_no')):
+            return Response({"error": "Pass 'part' or 'ref_no'"}, status=status.HTTP_400_BAD_REQUEST)
+        usages = part_usages(request.query_params).filter(call=OuterRef('pk'))
+        queryset = self.filter_queryset(self.get_queryset()).filter(Exists(usages))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def parts_usage(self, request):
+        """Part quantities per machine model (?kind=, ?part=, ?ref_no=, ?start_date=&end_date=)"""
+        rows = usage_by_machine_model(request.query_params)
+        # Grouped rows have no created_at to take a cursor from, so always page by number
+        paginator = StandardPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        return paginator.get_paginated_response(page)
+
     @action(detail=True, methods=['post'])
     def create_access_token(self, request, pk=None):
         """
@@ -550,9 +707,9 @@ class CallViewSet(viewsets.ModelViewSet):
             expires_at=timezone.now() + timezone.timedelta(hours=1)
         )
         
-        # Return the token ID that will be used in the URL
+        # Return the signed token that will be used in the URL
         return Response({
-            'token': str(token.id),
+            'token': make_access_token(token),
             'expires_at': token.expires_at
         })
 
@@ -569,48 +726,89 @@ class CallViewSet(viewsets.ModelViewSet):
             response['Access-Control-Max-Age'] = '86400'  # 24 hours
             return response
         
-        token_id = request.query_params.get('token')
+        token = request.query_params.get('token')
         
-        if not token_id:
+        if not token:
             return Response({'error': 'Token is required'}, status=400)
         
+        # The signature and expiry are checked without a query
         try:
-            if not re.match(r'^[a-f0-9]{8}-[a-f0-9]{4}-4[a-f0-9]{3}-[89ab][a-f0-9]{3}-[a-f0-9]{12}$', token_id):
-                return Response({'error': 'Invalid token format'}, status=400)
-            token = ServiceCallToken.objects.get(id=token_id)
-        except ServiceCallToken.DoesNotExist:
-            return Response({'error': 'Invalid token'}, status=404)
+            payload = read_access_token(token)
+        except InvalidAccessToken as e:
+            if e.expired:
+                return Response({'error': 'Token has expired or has been used', 'expired': True}, status=403)
+            return Response({'error': str(e)}, status=404)
         
-        if not token.is_valid():
-            return Response({
-                'error': 'Token has expired or has been used',
-                'expired': True
-            }, status=403)
+        call = Call.objects.select_related('client', 'item').prefetch_related(
+            Prefetch('technician', queryset=CustomUser.objects.only('id', 'firstname', 'lastname'))
+        ).filter(pk=payload['call']).first()
+        if call is None:
+            return Response({'error': 'Invalid token'}, status=404)
         
         # Return the service call data
-        serializer = self.get_serializer(token.service_call)
+        serializer = CallAccessSerializer(call, context=self.get_serializer_context())
         return Response(serializer.data) 
 
     @action(detail=True, methods=['post'], permission_classes=[permissions.AllowAny])
     def verify(self, request, pk=None):
-        call = self.get_object()
-        token = request.data.get('token')
-        
         try:
-            service_token = ServiceCallToken.objects.get(
-                id=token,
+            payload = read_access_token(request.data.get('token') or '')
+        except InvalidAccessToken:
+            return Response({'error': 'Invalid or expired token'}, status=400)
+        if str(payload['call']) != str(pk):
+            return Response({'error': 'Invalid or expired token'}, status=400)
+        
+        call = self.get_object()
+        with call_event_batch():
+            # Single use: only the first request flips is_used
+            claimed = ServiceCallToken.objects.filter(
+                id=payload['id'],
                 service_call=call,
                 is_used=False,
                 expires_at__gt=timezone.now()
-            )
+            ).update(is_used=True)
+            if not claimed:
+                return Response({'error': 'Invalid or expired token'}, status=400)
             call.client_verification = True
             call.save()
-            service_token.is_used = True
-            service_token.save()
-            return Response({'status': 'verified'})
-        except ServiceCallToken.DoesNotExist:
-            return Response({'error': 'Invalid or expired token'}, status=400)
+        return Response({'status': 'verified'})
         
+    @action(detail=False, methods=['post'])
+    def bulk_update(self, request):
+        """
+        Apply status, approval, is_checked/director_comment and technician
+        changes to many calls at once. Calls whose approvals both end up true
+        are completed, as in update_approval.
+        """
+        serializer = CallBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        calls, results, missing = bulk_update_calls(
+            data['calls'],
+            {field: data[field] for field in BULK_FIELDS if field in data},
+            technicians=data.get('technician_ids'),
+            add_technicians=data.get('add_technician_ids', ()),
+            remove_technicians=data.get('remove_technician_ids', ()),
+        )
+        return Response({
+            'updated': len(calls),
+            'missing': missing,
+            'results': [
+                {
+                    'id': call.pk,
+                    'ticket_no': call.ticket_no,
+                    'status': call.status,
+                    'technician_manager_approval': call.technician_manager_approval,
+                    'client_verification': call.client_verification,
+                    'is_checked': call.is_checked,
+                    'completed_at': call.completed_at,
+                    **results[call.pk],
+                }
+                for call in calls
+            ],
+        })
+
     @action(detail=True, methods=['patch'])
     def update_approval(self, request, pk=None):
         """Dedicated endpoint for approval updates"""
@@ -634,33 +832,119 @@ class CallViewSet(viewsets.ModelViewSet):
             call.status = 'Complete'
         
         # Save the changes
-        call.save()
+        with call_event_batch():
+            call.save()
         
         # Return serialized response
         serializer = self.get_serializer(call)
         return Response(serializer.data)
 
-class LeaseContractViewSet(viewsets.ModelViewSet):
+class LeaseContractViewSet(DynamicFieldsViewMixin, StreamingExportMixin, viewsets.ModelViewSet):
     serializer_class = LeaseContractSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    export_fields = LEASE_EXPORT_FIELDS
+    export_filename = 'leases'
+
+    def get_permissions(self):
+        if self.action == 'export':
+            return [permissions.IsAuthenticated(), IsDirectorOrSuperAdmin()]
+        return super().get_permissions()
 
     @action(detail=True, methods=['get'])
     def meter_readings(self, request, pk=None):
+        """Every reading of the lease, newest month first, a page at a time"""
         lease = self.get_object()
         readings = lease.meter_readings.all().order_by('-month')
-        serializer = MeterReadingSerializer(readings, many=True)
-        return Response(serializer.data)
+        # A lease has one reading per month, so cursor mode can key on month instead of created_at
+        paginator = MonthKeysetPagination()
+        page = paginator.paginate_queryset(readings, request, view=self)
+        return paginator.get_paginated_response(MeterReadingSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def missing_readings(self, request):
+        """
+        Active leases with no meter reading for the cycle month (?month=YYYY-MM,
+        default this month), with their machine, latest reading and every month
+        still missing.
+        """
+        cycle = reading_cycle(request.query_params)
+        rows = overdue_leases(cycle)
+        client_id = request.query_params.get('client')
+        if client_id:
+            rows = rows.filter(client=client_id)
+
+        # Value rows ordered by client and lease_no have no created_at to take a cursor from
+        paginator = StandardPagination()
+        leases = paginator.paginate_queryset(rows, request, view=self)
+        recorded = recorded_months([row['id'] for row in leases])
+        for row in leases:
+            row['missing_months'] = missing_months(row['from_date'], row['to_date'], recorded[row['id']])
+        response = paginator.get_paginated_response(leases)
+        response.data['cycle'] = cycle.strftime('%Y-%m')
+        return response
+
+    @action(detail=False, methods=['get'])
+    def expiring(self, request):
+        """
+        Active leases ending in the next ?within= 30, 60 or 90 days (default 90),
+        soonest first, with days left and their 30/60/90-day window, plus the
+        count in each window.
+        """
+        try:
+            within = int(request.query_params.get('within', EXPIRY_WINDOWS[-1]))
+        except ValueError:
+            within = None
+        if within not in EXPIRY_WINDOWS:
+            return Response(
+                {"error": f"within must be one of {', '.join(map(str, EXPIRY_WINDOWS))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = list(upcoming_expiries(within))
+        # Rows are sorted by expiry with no created_at to take a cursor from, so always page by number
+        paginator = StandardPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        response = paginator.get_paginated_response(page)
+        response.data['counts'] = expiry_counts()
+        return response
     
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return LeaseContractListSerializer
+        return super().get_serializer_class()
+
+    def recent_readings_count(self):
+        try:
+            count = int(self.request.query_params.get('readings', LEASE_RECENT_READINGS))
+        except ValueError:
+            count = LEASE_RECENT_READINGS
+        return min(max(count, 0), MAX_RECENT_READINGS)
+
     def get_queryset(self):
         client_id = self.request.query_params.get('client')
+        queryset = LeaseContract.objects.all().select_related('client', 'item', 'store')
         if client_id:
-            return LeaseContract.objects.filter(client=client_id).select_related('client', 'item', 'store')
-        return LeaseContract.objects.all().select_related('client', 'item', 'store')
+            queryset = queryset.filter(client=client_id)
+        if self.action == 'list':
+            queryset = with_last_reading(queryset).prefetch_related(
+                recent_readings_prefetch(self.recent_readings_count())
+            )
+        return queryset.order_by('-created_at')
 
     
-class SaleViewSet(viewsets.ModelViewSet):
+class SaleViewSet(AuditHistoryMixin, DynamicFieldsViewMixin, StreamingExportMixin, viewsets.ModelViewSet):
     serializer_class = SaleSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    export_fields = SALE_EXPORT_FIELDS
+    export_filename = 'sales'
+    audit_object_type = 'Sale'
+
+    def get_permissions(self):
+        if self.action == 'export':
+            return [permissions.IsAuthenticated(), IsDirectorOrSuperAdmin()]
+        return super().get_permissions()
     
     def get_queryset(self):
         queryset = Sale.objects.all().select_related('client').prefetch_related(
@@ -698,14 +982,28 @@ class SaleViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
         return Response(serializer.data)
+
+    # Writes run in audit_batch() so each request appends one audit entry per sale
+    def perform_create(self, serializer):
+        with audit_batch():
+            serializer.save()
+
+    def perform_update(self, serializer):
+        with audit_batch():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with audit_batch():
+            instance.delete()
     
-class DeliveryViewSet(viewsets.ModelViewSet):
+class DeliveryViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     queryset = Delivery.objects.all()
     serializer_class = DeliverySerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['delivery_no', 'sale__sale_no', 'lease__lease_no']
     ordering_fields = ['delivery_date', 'created_at']
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         delivery_type = self.request.query_params.get('type')
@@ -722,7 +1020,7 @@ class DeliveryViewSet(viewsets.ModelViewSet):
             'sale__items',
             'lease__part_inquiries',
             'lease__acc_inquiries'
-        )
+        ).order_by('-created_at')
 
     @action(detail=False, methods=['post'])
     def create_delivery(self, request):
@@ -762,7 +1060,7 @@ class DeliveryViewSet(viewsets.ModelViewSet):
             {'value': 'Lease', 'label': 'Lease Delivery'}
         ])
         
-class ChatGroupViewSet(viewsets.ModelViewSet):
+class ChatGroupViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     queryset = ChatGroup.objects.all()
     serializer_class = ChatGroupSerializer
     permission_classes = [IsAuthenticated]
@@ -793,14 +1091,11 @@ class ChatGroupViewSet(viewsets.ModelViewSet):
                 chat_group=group
             ).select_related('sender').prefetch_related('read_by')
             
-            # Paginate results if needed
-            page = self.paginate_queryset(messages)
-            if page is not None:
-                serializer = ChatMessageSerializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
-            
-            serializer = ChatMessageSerializer(messages, many=True)
-            return Response(serializer.data)
+            # Newest first, so opening a chat loads its latest messages
+            paginator = ChatMessagePagination()
+            page = paginator.paginate_queryset(messages, request, view=self)
+            serializer = ChatMessageSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
             
         except ChatGroup.DoesNotExist:
             return Response(
@@ -903,10 +1198,11 @@ class ChatGroupViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class ChatMessageViewSet(viewsets.ModelViewSet):
+class ChatMessageViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     queryset = ChatMessage.objects.all()
     serializer_class = ChatMessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ChatMessagePagination
     
     def get_queryset(self):
         """Only return messages from groups the user is a member of"""
@@ -953,7 +1249,7 @@ class ChatMessageViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-class LeasePartInquiryViewSet(viewsets.ModelViewSet):
+class LeasePartInquiryViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = LeasePartInquirySerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -979,20 +1275,16 @@ class LeasePartInquiryViewSet(viewsets.ModelViewSet):
             # Save the lease part inquiry
             instance = serializer.save()
             
-            # Update the part inventory
+            # Take the parts out of stock (conditional update, no read-modify-write)
             part = instance.part
-            if part.quantity >= instance.quantity:
-                part.quantity -= instance.quantity
-                part.save()
-            else:
-                raise serializer.ValidationError(
+            if not consume_stock(part, instance.quantity, 'Lease Issue', source=instance, user=self.request.user):
+                raise ValidationError(
                     f"Insufficient stock. Only {part.quantity} units available."
                 )
 
     def perform_update(self, serializer):
         with transaction.atomic():
-            old_instance = self.get_object()
-            old_quantity = old_instance.quantity
+            old_quantity = serializer.instance.quantity
             
             # Save the updated instance
             instance = serializer.save()
@@ -1003,29 +1295,23 @@ class LeasePartInquiryViewSet(viewsets.ModelViewSet):
             
             if quantity_difference > 0:
                 # More parts needed - reduce inventory
-                if part.quantity >= quantity_difference:
-                    part.quantity -= quantity_difference
-                    part.save()
-                else:
-                    raise serializers.ValidationError(
+                if not consume_stock(part, quantity_difference, 'Lease Issue', source=instance, user=self.request.user):
+                    raise ValidationError(
                         f"Insufficient stock for increase. Only {part.quantity} additional units available."
                     )
             elif quantity_difference < 0:
                 # Fewer parts needed - restore inventory
-                part.quantity += abs(quantity_difference)
-                part.save()
+                release_stock(part, abs(quantity_difference), 'Lease Return', source=instance, user=self.request.user)
 
     def perform_destroy(self, instance):
         with transaction.atomic():
             # Restore inventory when deleting
-            part = instance.part
-            part.quantity += instance.quantity
-            part.save()
+            release_stock(instance.part, instance.quantity, 'Lease Return', source=instance, user=self.request.user)
             
             # Delete the instance
             instance.delete()
 
-class LeaseAccInquiryViewSet(viewsets.ModelViewSet):
+class LeaseAccInquiryViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     serializer_class = LeaseAccInquirySerializer
     permission_classes = [permissions.IsAuthenticated]
     
@@ -1035,10 +1321,45 @@ class LeaseAccInquiryViewSet(viewsets.ModelViewSet):
             return LeaseAccInquiry.objects.filter(lease=lease_id).select_related('accessory', 'lease')
         return LeaseAccInquiry.objects.all()
     
-class MeterReadingViewSet(viewsets.ModelViewSet):
+class MeterReadingViewSet(DynamicFieldsViewMixin, viewsets.ModelViewSet):
     queryset = MeterReading.objects.all()
     serializer_class = MeterReadingSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['lease__lease_no', 'machine__serial_no']
-    ordering_fields = ['month', 'created_at']
\ No newline at end of file
+    ordering_fields = ['month', 'created_at']
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, MultiPartParser, FormParser])
+    def bulk_import(self, request):
+        """
+        Upsert one month's readings, matched to leases by lease_no or machine
+        serial_no. Send JSON {"month": "YYYY-MM", "readings": [{"lease_no" or
+        "serial_no", "meter_reading"}, ...]} or a multipart CSV/XLSX/JSON
+        ``file`` with ``month``; ``dry_run`` reports without writing. The
+        response has an outcome for every row.
+        """
+        try:
+            month = parse_month(request.data.get('month', ''))
+        except ValueError:
+            return Response({"error": "month is required in YYYY-MM format"}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+
+        try:
+            if 'file' in request.FILES:
+                file = request.FILES['file']
+                report = import_meter_readings(file, file.name, month, dry_run=dry_run)
+            else:
+                readings = request.data.get('readings')
+                if not isinstance(readings, list):
+                    return Response(
+                        {"error": "Upload a file or send a readings list"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                report = ingest_meter_readings(readings, month, dry_run=dry_run)
+        except InventoryImportError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            report.to_dict(),
+            status=status.HTTP_201_CREATED if report.written and not report.dry_run else status.HTTP_200_OK
+        )
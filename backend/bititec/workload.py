@@ -0,0 +1,78 @@
+"""
+Technician workload for the dispatch board.
+
+Per-technician call counts come from one grouped query over the
+Call.technician through table and are cached briefly when STORE_SUMMARY_CACHE
+says the cache is shared by every worker; otherwise each request computes them.
+Call saves that change the status, call deletes and technician (re)assignments
+invalidate the cache through signals; set-based Call updates must call
+invalidate_technician_workload() themselves.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, Min, OuterRef, Q
+from django.utils import timezone
+
+from .models import Call, CustomUser
+
+CACHE_KEY = 'bititec:call-workload'
+CACHE_TIMEOUT = 60
+
+# Technicians with no calls still get a row on the board
+TECHNICIAN_ROLES = ['Technician']
+
+
+def invalidate_technician_workload():
+    if settings.STORE_SUMMARY_CACHE:
+        transaction.on_commit(lambda: cache.delete(CACHE_KEY))
+
+
+def week_start(today=None):
+    """Aware local midnight on the Monday of the current week"""
+    today = today or timezone.localdate()
+    monday = today - datetime.timedelta(days=today.weekday())
+    return timezone.make_aware(datetime.datetime.combine(monday, datetime.time.min))
+
+
+def compute_technician_workload():
+    since = week_start()
+    assigned = Call.technician.through.objects.filter(customuser_id=OuterRef('pk'))
+    rows = CustomUser.objects.filter(
+        Q(role__in=TECHNICIAN_ROLES) | Exists(assigned)
+    ).values('id', 'firstname', 'lastname', 'role').annotate(
+        open=Count('calls', filter=Q(calls__status='Open')),
+        pending=Count('calls', filter=Q(calls__status='Pending')),
+        in_progress=Count('calls', filter=Q(calls__status='In Progress')),
+        oldest_open_call_at=Min('calls__created_at', filter=~Q(calls__status='Complete')),
+        completed_this_week=Count('calls', filter=Q(calls__status='Complete', calls__completed_at__gte=since)),
+    ).order_by('firstname', 'lastname')
+
+    technicians = []
+    for row in rows:
+        row['outstanding'] = row['open'] + row['pending'] + row['in_progress']
+        technicians.append(row)
+    return {'week_start': since, 'technicians': technicians}
+
+
+def get_technician_workload():
+    """Cached workload with call ages worked out at read time"""
+    if not settings.STORE_SUMMARY_CACHE:
+        workload = compute_technician_workload()
+    else:
+        workload = cache.get(CACHE_KEY)
+        if workload is None:
+            workload = compute_technician_workload()
+            cache.set(CACHE_KEY, workload, CACHE_TIMEOUT)
+
+    now = timezone.now()
+    technicians = []
+    for row in workload['technicians']:
+        oldest = row['oldest_open_call_at']
+        technicians.append({
+            **row,
+            'oldest_open_call_age_hours': round((now - oldest).total_seconds() / 3600, 1) if oldest else None,
+        })
+    return {'generated_at': now, 'week_start': workload['week_start'], 'technicians': technicians}